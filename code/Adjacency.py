@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the Adjacency class for architectural_plan_generator.
+
+Author: Xian Lai
+Date: Feb.18, 2018
+"""
+
+
+from collections import Counter
+
+import numpy as np
+from Grid import OUTSIDE, NGBRS
+
+
+class Adjacency(object):
+
+    """
+    The adjacency class implements the room adjacency graph of a plan. The
+    nodes are rids and the weight of an edge is the length of the wall shared
+    by 2 rooms, namely the number of unit edges between their grids. The
+    grids outside boundary or not assigned are the node OUTSIDE, so the edges
+    to it are the exterior walls of rooms.
+
+    The graph is kept up to date while grids change owner: the unit edges
+    touching the changing grids are detached before relabeling and attached
+    again after it. So a move costs O(changing grids) instead of rescanning
+    the boundary of every room.
+
+    Inputs:
+    -------
+    - grids (LabelGrid): the label grid of plan
+
+    Attributes:
+    -----------
+    - edges: the shared lengths keyed by rid then by the rid of neighbor,
+        {rid: {ngbr_rid: length}}. It's symmetric and has no zero entries.
+
+    Methods:
+    --------
+    - rebuild: Count all the edges from the label grid again.
+    - detach: Remove the unit edges touching given xys.
+    - attach: Add the unit edges touching given xys.
+    - neighbors: The rooms adjacent to given room with the shared lengths.
+    - shared_length: The length of wall shared by 2 rooms.
+    - perimeter: The total length of walls of given room.
+    - pairs: All pairs of adjacent rooms.
+    """
+
+    def __init__(self, grids):
+        """
+        """
+        self.grids   = grids
+        self.edges   = {}
+        self._marked = np.zeros(grids.labels.shape, dtype=bool)
+        self.rebuild()
+
+
+    def rebuild(self,):
+        """ Count all the edges from the label grid again. It's used when the
+        whole label grid is replaced.
+        """
+        labels = self.grids.labels
+        a = np.concatenate([labels[:-1, :].ravel(), labels[:, :-1].ravel()])
+        b = np.concatenate([labels[1:, :].ravel(), labels[:, 1:].ravel()])
+        diff = a != b
+
+        self.edges = {}
+        self._update(a[diff], b[diff], 1)
+
+
+    def _unit_edges(self, xys):
+        """ Find the rids on both sides of every unit edge touching given xys.
+        An edge between 2 given xys is counted once.
+
+        Returns:
+            a, b (np.ndarray): the rids on both sides of each edge
+        """
+        ix, iy = self.grids.to_indices(xys)
+        labels = self.grids.labels
+        self._marked[ix, iy] = True
+
+        a, b = [], []
+        for dx, dy in NGBRS:
+            nx, ny = ix + dx, iy + dy
+            # both directions of an edge between 2 given xys are visited,
+            # only the positive one is kept.
+            keep = ~self._marked[nx, ny] | (dx + dy > 0)
+            a.append(labels[ix[keep], iy[keep]])
+            b.append(labels[nx[keep], ny[keep]])
+        self._marked[ix, iy] = False
+        a, b = np.concatenate(a), np.concatenate(b)
+        diff = a != b
+
+        return a[diff], b[diff]
+
+
+    def _update(self, a, b, sign):
+        """ Add(sign=1) or remove(sign=-1) the unit edges between rids a and b.
+        """
+        for (r, s), n in Counter(zip(a.tolist(), b.tolist())).items():
+            for u, v in ((r, s), (s, r)):
+                ngbrs = self.edges.setdefault(u, {})
+                length = ngbrs.get(v, 0) + sign * n
+                if length: ngbrs[v] = length
+                else: del ngbrs[v]
+                if not ngbrs: del self.edges[u]
+
+
+    def detach(self, xys):
+        """ Remove the unit edges touching given xys. Called before they are
+        relabeled.
+        """
+        self._update(*self._unit_edges(xys), -1)
+
+
+    def attach(self, xys):
+        """ Add the unit edges touching given xys. Called after they are
+        relabeled.
+        """
+        self._update(*self._unit_edges(xys), 1)
+
+
+    def neighbors(self, rid):
+        """ The rooms adjacent to given room with the shared lengths as a
+        dictionary {ngbr_rid: length}. The OUTSIDE is not included.
+        """
+        return {r:n for r, n in self.edges.get(rid, {}).items() if r != OUTSIDE}
+
+
+    def shared_length(self, rid_1, rid_2):
+        """ The length of wall shared by 2 rooms.
+        """
+        return self.edges.get(rid_1, {}).get(rid_2, 0)
+
+
+    def perimeter(self, rid):
+        """ The total length of walls of given room, including exterior walls.
+        """
+        return sum(self.edges.get(rid, {}).values())
+
+
+    def pairs(self,):
+        """ All pairs of adjacent rooms (rid_1, rid_2, length) with
+        rid_1 < rid_2, sorted by rids.
+        """
+        return sorted((r, s, n) for r, ngbrs in self.edges.items() \
+            if r != OUTSIDE for s, n in ngbrs.items() if r < s)
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the batch running of plan jobs for
+architectural_plan_generator. A manifest lists the jobs, each with its own
+boundary grids, function params, number of seeds and budget. Every seed of
+every job is a task run in a pool of worker processes. The best plan of each
+task is saved as a plan file, and the results are streamed as JSON lines as
+soon as the tasks finish.
+
+A manifest is a JSON file of a list of jobs, or of {"defaults": {...},
+"jobs": [...]} where the defaults apply to every job:
+
+    {
+        "defaults": {"function_params": "../data/function_params.pickle",
+                     "max_iters": 5000, "n_seeds": 8},
+        "jobs": [
+            {"name": "floor_1", "grid_coords": "../data/grid_coords.npy"},
+            {"name": "floor_2", "grid_coords": {"width": 40, "height": 30},
+             "seeding": "grow", "max_time": 60, "scheduler": "pursuit"}
+        ]
+    }
+
+Author: Xian Lai
+Date: Feb.24, 2018
+"""
+
+
+import os
+import sys
+import json
+import time
+import pickle
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import PlanIO
+from Plan import Plan
+from Search import SimulatedAnnealing
+from Transition import Transition
+from Scheduler import SCHEDULERS
+
+
+# the settings of a job if not given in manifest
+JOB_DEFAULTS = {
+    'n_seeds':1,
+    'seed':0,
+    'max_iters':1000,
+    'max_time':None,
+    'threshold':None,
+    'schedule':'exponential',
+    'seeding':'random',
+    'pr_actions':[.25, .25, .25, .25],
+    'scheduler':None,
+}
+# the settings of a job without default
+JOB_REQUIRED = ('name', 'grid_coords', 'function_params')
+
+
+# ---------------------------- global functions ------------------------------
+def load_data(spec, base_dir='.'):
+    """ Load the grid coordinates or function params given in a job. A
+    string is the path of a .json, .npy, .pickle or .plan file relative to
+    the manifest. For grid coordinates, a {"width", "height"} dictionary is a
+    rectangular boundary. Anything else is taken as the data itself.
+
+    Args:
+        spec: the data or where to find it
+        base_dir (str): the directory of manifest
+    """
+    if isinstance(spec, dict) and set(spec) == {'width', 'height'}:
+        return [(x, y) for x in range(spec['width']) \
+            for y in range(spec['height'])]
+    if not isinstance(spec, str): return spec
+
+    path = os.path.join(base_dir, spec)
+    ext  = os.path.splitext(path)[1]
+    if ext == '.json':
+        with open(path) as f: return json.load(f)
+    if ext == '.npy':
+        return np.load(path).tolist()
+    if ext == '.plan':
+        return PlanIO.load_state(path, mmap=False)['grid_coords'].tolist()
+    if ext == '.pickle':
+        # loading a pickle can run code, only use the trusted ones in data/
+        with open(path, 'rb') as f: return pickle.load(f)
+
+    raise ValueError("Unknown data file: %s" % path)
+
+
+def _check_keys(settings, where):
+    """ Raise ValueError for the keys unknown to jobs, so the typos in a 
+    manifest don't silently fall back to the defaults.
+    """
+    unknown = set(settings) - set(JOB_DEFAULTS) - set(JOB_REQUIRED)
+    if unknown:
+        raise ValueError("Unknown keys in %s: %s" % (where, 
+            ', '.join(sorted(unknown))))
+
+
+def load_manifest(path):
+    """ Load the jobs in a manifest with their defaults filled in and their
+    data loaded. Unknown keys are rejected.
+
+    Returns:
+        jobs (list): the jobs as dictionaries
+    """
+    with open(path) as f: manifest = json.load(f)
+    if isinstance(manifest, list): manifest = {'jobs':manifest}
+    unknown = set(manifest) - {'defaults', 'jobs'}
+    if unknown:
+        raise ValueError("Unknown keys in manifest: %s" % \
+            ', '.join(sorted(unknown)))
+    _check_keys(manifest.get('defaults', {}), 'defaults')
+    defaults = dict(JOB_DEFAULTS, **manifest.get('defaults', {}))
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    jobs = []
+    for k, job in enumerate(manifest['jobs']):
+        _check_keys(job, 'job %s' % job.get('name', k))
+        job = dict(defaults, **job)
+        job.setdefault('name', 'job_%d' % k)
+        for key in ('grid_coords', 'function_params'):
+            if key not in job:
+                raise ValueError("Job %s has no %s" % (job['name'], key))
+            job[key] = load_data(job[key], base_dir)
+        job['grid_coords'] = [(int(x), int(y)) for x, y in job['grid_coords']]
+        jobs.append(job)
+
+    return jobs
+
+
+def _run_task(job, seed, out_dir):
+    """ Run one seed of a job in a worker process and save the best plan.
+
+    Returns:
+        record (dict): the result of this task
+    """
+    start = time.time()
+    np.random.seed(seed)
+    plan = Plan(function_params=job['function_params'],
+        grid_coords=job['grid_coords'], seeding=job['seeding'], silent=True)
+    init_time = time.time() - start
+
+    scheduler = job['scheduler'] and SCHEDULERS[job['scheduler']]()
+    search = SimulatedAnnealing(
+        transition=Transition(silent=True, pr_actions=job['pr_actions'], 
+            scheduler=scheduler),
+        schedule=job['schedule'], max_iters=job['max_iters'],
+        max_time=job['max_time'], threshold=job['threshold'])
+    search.run(plan)
+
+    plan_path = None
+    if out_dir:
+        plan_path = os.path.join(out_dir, job['name'], 'seed_%d.plan' % seed)
+        os.makedirs(os.path.dirname(plan_path), exist_ok=True)
+        PlanIO.save_state(plan_path, search.best_state, job['function_params'],
+            plan.grids.coords, extra={'job':job['name'], 'seed':seed})
+
+    return {
+        'type':'task',
+        'job':job['name'],
+        'seed':seed,
+        'objective':search.best_objective,
+        'plan':plan_path,
+        'init_time':init_time,
+        'elapsed':time.time() - start,
+        'stats':search.stats,
+    }
+
+
+def _error_record(job, seed, error):
+    """ The record of a task failed by given exception.
+    """
+    return {
+        'type':'error',
+        'job':job['name'],
+        'seed':seed,
+        'error':'%s: %s' % (type(error).__name__, error),
+    }
+
+
+class BatchRunner(object):
+
+    """
+    The batch runner class runs the jobs of a manifest in a pool of worker
+    processes. Each seed of each job is a task, so the pool is kept busy
+    however the seeds are spread over jobs. A record is streamed for every
+    task when it finishes, and a summary record for every job when all its
+    seeds finish. A failing task streams an error record instead and the
+    other tasks carry on.
+
+    Inputs:
+    -------
+    - jobs (list): the jobs from load_manifest
+    - out_dir (str): the directory of results. The best plan of each task is
+        saved as <out_dir>/<job>/seed_<seed>.plan. If not given, no plan is
+        saved.
+    - jsonl (str): the path of the JSON lines of records, '-' for stdout.
+        Default is <out_dir>/results.jsonl.
+    - n_workers (int): the number of worker processes. Default is the number
+        of cpus. With 1 worker, the tasks run in this process.
+
+    Attributes:
+    -----------
+    - summaries: the summary of each job keyed by job name
+
+    Methods:
+    --------
+    - run: Run all tasks and stream their records.
+    - _collect: Stream the record of a task and of its job if finished.
+    """
+
+    def __init__(self, jobs, out_dir=None, jsonl=None, n_workers=None):
+        """
+        """
+        self.jobs      = jobs
+        self.out_dir   = out_dir
+        self.jsonl     = jsonl or (out_dir and \
+            os.path.join(out_dir, 'results.jsonl'))
+        self.n_workers = n_workers or os.cpu_count()
+
+
+    def run(self,):
+        """ Run all tasks and stream their records.
+
+        Returns:
+            summaries (dict): the summary of each job keyed by job name
+        """
+        if self.out_dir: os.makedirs(self.out_dir, exist_ok=True)
+        tasks = [(job, seed) for job in self.jobs \
+            for seed in range(job['seed'], job['seed'] + job['n_seeds'])]
+        self.summaries = {job['name']:{'type':'job', 'job':job['name'],
+            'n_seeds':job['n_seeds'], 'done':0, 'best_seed':None,
+            'objective':None, 'plan':None, 'elapsed':0., 'errors':0} \
+            for job in self.jobs}
+
+        if self.jsonl == '-': self.stream = sys.stdout
+        elif self.jsonl: self.stream = open(self.jsonl, 'a')
+        else: self.stream = None
+        try:
+            if self.n_workers == 1:
+                for job, seed in tasks:
+                    try:
+                        record = _run_task(job, seed, self.out_dir)
+                    except Exception as error:
+                        record = _error_record(job, seed, error)
+                    self._collect(record)
+            else:
+                with ProcessPoolExecutor(max_workers=self.n_workers) as pool:
+                    futures = {pool.submit(_run_task, job, seed, self.out_dir)\
+                        :(job, seed) for job, seed in tasks}
+                    for future in as_completed(futures):
+                        try:
+                            record = future.result()
+                        except Exception as error:
+                            record = _error_record(*futures[future], error)
+                        self._collect(record)
+        finally:
+            if self.stream not in (None, sys.stdout): self.stream.close()
+
+        return self.summaries
+
+
+    def _collect(self, record):
+        """ Stream the record of a task, and the summary of its job if all
+        its seeds are finished.
+        """
+        summary = self.summaries[record['job']]
+        summary['done'] += 1
+        if record['type'] == 'error':
+            summary['errors'] += 1
+        elif summary['objective'] is None or \
+                record['objective'] > summary['objective']:
+            summary.update(best_seed=record['seed'],
+                objective=record['objective'], plan=record['plan'])
+        summary['elapsed'] += record.get('elapsed', 0.)
+
+        records = [record]
+        if summary['done'] == summary['n_seeds']: records.append(summary)
+        if self.stream is None: return
+        for record in records:
+            self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the benchmarks for architectural_plan_generator: the 
+memory use of plan states, and the speed and peak memory of the hot paths on
+synthetic square plates with fixed seeds. The results can be saved as a 
+baseline and later runs compared against it to catch regressions:
+
+    python Benchmark.py [--sizes 10 30 100 300] [--save baseline.json]
+        [--compare baseline.json] [--tolerance 0.3] [--repeats 5] [--memory]
+
+The speed of each benchmark is the best of several repeats in CPU time,
+since the slower repeats are mostly noise of the machine. A fixed reference
+op is timed along with them, and the speeds are scaled by the change of its
+speed when compared, so a machine running slower as a whole is not taken for
+a regression.
+
+Author: Xian Lai
+Date: Feb.20, 2018
+"""
+
+
+import gc
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+from Grid import Grid, LabelGrid
+from Room import Room, calc_convex_aspect
+from Wall import Wall
+from Plan import Plan
+from Transition import Transition
+
+
+SIZES = (10, 30, 100, 300)  # the widths of synthetic square plates
+
+
+# ---------------------------- memory ----------------------------------------
+class _DictGrid(object):
+    """ The grid object keeping its attributes in an instance dictionary as
+    before, only for comparison.
+    """
+    def __init__(self, xy, rid):
+        self.xy = xy
+        self.x, self.y = xy
+        self.rid = rid
+
+
+class _BaselineWall(object):
+    """ The wall object as it was before slots, only for comparison: a shapely
+    LineString built at once with the attributes in an instance dictionary.
+    """
+    def __init__(self, ends, wid, rid):
+        from shapely.geometry import LineString
+        self.geom    = LineString(ends)
+        self.wid     = wid
+        self.rid     = rid
+        self.opening = [0, 0]
+        self.stats   = {'normalDir':int(ends[0][0] != ends[1][0]), 
+            'same':None}
+
+
+class _BaselineRoom(object):
+    """ The room object as it was before the label grid, only for comparison:
+    it keeps the list of its xys, the shapely polygon unioned from the boxes
+    of its grids and the stats parsed from the polygon in an instance 
+    dictionary.
+    """
+    def __init__(self, rid, xys, function):
+        from shapely.geometry import box
+        from shapely.ops import unary_union
+        self.rid      = rid
+        self.xys      = xys
+        self.function = function
+        self.geom     = unary_union([box(x - .5, y - .5, x + .5, y + .5) \
+            for x, y in xys])
+        min_x, min_y, max_x, max_y = self.geom.bounds
+        self.stats    = {
+            'area':self.geom.area,
+            'center':self.geom.centroid,
+            'convex_aspect':calc_convex_aspect(self.geom.bounds),
+            'min_x':min_x, 'max_x':max_x, 'min_y':min_y, 'max_y':max_y
+        }
+
+
+def measure_bytes(build):
+    """ Measure the memory allocated by given function and still held by the
+    object it returns.
+
+    Args:
+        build (function): the function building the objects to measure
+
+    Returns:
+        size (int): the allocated bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    obj  = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+
+    return size
+
+
+def _make_label_grid(xys, width):
+    """ Make a label grid of given xys and assign them to rooms of stripes
+    10 grids wide, so the boundary index is populated like a real plan.
+    """
+    grids = LabelGrid(xys)
+    for x0 in range(0, width, 10):
+        grids.assign([xy for xy in xys if x0 <= xy[0] < x0 + 10], x0 // 10)
+
+    return grids
+
+
+def memory_per_cell(width=200, height=200):
+    """ Compare the bytes per cell of the plan states made of grid objects
+    with instance dictionaries, grid objects with slots and the label grid.
+
+    Returns:
+        results (dict): the bytes per cell keyed by representation
+    """
+    xys = [(x, y) for x in range(width) for y in range(height)]
+    n   = len(xys)
+
+    return {
+        'dict_grids':measure_bytes(
+            lambda: {xy:_DictGrid(xy, 0) for xy in xys}) / n,
+        'slotted_grids':measure_bytes(
+            lambda: {xy:Grid(xy, 0) for xy in xys}) / n,
+        'label_grid':measure_bytes(lambda: _make_label_grid(xys, width)) / n,
+    }
+
+
+def _geos_bytes(objs):
+    """ The bytes of WKB of the shapely geometries of given objects. The 
+    geometries live in the GEOS heap, which tracemalloc doesn't see, so this
+    lower bound of their size is added to the measured bytes.
+    """
+    return sum(len(obj.geom.wkb) for obj in objs)
+
+
+def memory_per_object(n=1000, width=6):
+    """ Compare the bytes per object of the baseline rooms and walls, which
+    keep their shapely geometries and the xys of rooms, with the slotted ones
+    of the label grid, which keep the end points of walls and the running 
+    sums, bounds and stats of rooms. Each room is a width by width block of
+    grids. The label grid the slotted rooms read their grids from is built
+    beforehand and not counted, see memory_per_cell for it.
+
+    Returns:
+        results (dict): the bytes per object keyed by class
+    """
+    ends  = ((0, 0), (0, 1))
+    rooms = [[(k * width + x, y) for x in range(width) for y in range(width)] 
+        for k in range(n)]
+    grids = LabelGrid([xy for xys in rooms for xy in xys])
+    for rid, xys in enumerate(rooms): grids.assign(xys, rid)
+    sums, bounds = grids.count_moments(n)
+
+    def baseline_rooms():
+        return [_BaselineRoom(rid, list(xys), 'bedroom') \
+            for rid, xys in enumerate(rooms)]
+
+    def slotted_rooms():
+        objs = [Room(rid, 'bedroom', grids) for rid in range(n)]
+        for room in objs:
+            room._reset(sums[room.rid], bounds[room.rid])
+            room._parse()
+        return objs
+
+    baseline_walls = lambda: [_BaselineWall(ends, i, 0) for i in range(n)]
+
+    return {
+        'baseline_wall':(measure_bytes(baseline_walls) + \
+            _geos_bytes(baseline_walls())) / n,
+        'slotted_wall':measure_bytes(
+            lambda: [Wall(ends, i, 0) for i in range(n)]) / n,
+        'baseline_room':(measure_bytes(baseline_rooms) + \
+            _geos_bytes(baseline_rooms())) / n,
+        'slotted_room':measure_bytes(slotted_rooms) / n,
+    }
+
+
+
+# ---------------------------- speed -----------------------------------------
+def synthetic_plan(size, seed=0):
+    """ Make a plan on a size by size square plate with 5 functions and about
+    1 room per 300 grids, initialized by given seed. Every function has at
+    least 2 rooms so there are rooms to merge on small plates.
+    """
+    n_room = max(2, size * size // 1500)
+    function_params = {'function_%d' % k:{'n_room':n_room, 'area':n_room, 
+        'pr_merge':.2} for k in range(5)}
+    np.random.seed(seed)
+
+    return Plan(function_params=function_params, silent=True,
+        grid_coords=[(x, y) for x in range(size) for y in range(size)])
+
+
+def _action(name):
+    """ The op of proposing, applying and parsing a move of given action. The
+    move is undone afterwards so every op starts from the same plan state.
+    The op counts the moves applied in op.applied, so the benchmark of an
+    action never applicable to the plan is reported as a no-op.
+    """
+    transition = Transition(silent=True)
+    def setup(plan):
+        def op():
+            move = transition.propose(plan, name)
+            if move is None: return
+            op.applied += 1
+            transition.apply(plan, move)
+            plan._parse()
+            plan._evaluate()
+            transition.undo(plan, move)
+            plan._parse()
+            plan._evaluate()
+        op.applied = 0
+        return op
+    return setup
+
+
+def _room_parse(plan):
+    rooms = plan._purge_room()
+    def op():
+        room = rooms[np.random.randint(len(rooms))]
+        room._stale = True
+        room._parse()
+    return op
+
+
+def _room_boundary(plan):
+    rooms = plan._purge_room()
+    def op():
+        rooms[np.random.randint(len(rooms))].find_boundary_xys(plan.grids)
+    return op
+
+
+def _plan_parse(plan):
+    def op():
+        plan.dirty.update(range(plan.room_count))
+        plan._parse()
+        plan._evaluate()
+    return op
+
+
+def _divide(seeding):
+    def setup(plan):
+        n = sum(plan.n_rooms.values())
+        return lambda: plan._divide_xys(n, seeding)
+    return setup
+
+
+# the benchmarks as (name, setup function returning the op to time)
+BENCHMARKS = [
+    ('expand', _action('expand')),
+    ('swap', _action('swap')),
+    ('split', _action('split')),
+    ('merge', _action('merge')),
+    ('room_parse', _room_parse),
+    ('room_boundary', _room_boundary),
+    ('plan_parse', _plan_parse),
+    ('divide_random', _divide('random')),
+    ('divide_kmeans++', _divide('kmeans++')),
+]
+
+
+def time_op(op, min_time=.2, max_reps=100000, repeats=5):
+    """ Time given op by repeating it for at least min_time seconds, and
+    take the best of given repeats of that.
+
+    Returns:
+        ops_per_sec (float): the number of ops per second
+    """
+    op()  # warm up
+    best = 0.
+    for k in range(repeats):
+        reps, start = 0, time.process_time()
+        while reps < max_reps:
+            op()
+            reps += 1
+            elapsed = time.process_time() - start
+            if elapsed >= min_time: break
+        best = max(best, reps / elapsed)
+
+    return best
+
+
+def _reference():
+    """ The fixed reference op of plain python and numpy work, timed to
+    calibrate the speed of the machine.
+    """
+    labels = np.arange(10000) % 7
+    def op():
+        counts = {}
+        for label in labels[:2000].tolist():
+            counts[label] = counts.get(label, 0) + 1
+        np.bincount(labels, minlength=7)
+    return op
+
+
+def peak_memory(op, reps=3):
+    """ Measure the peak memory allocated while repeating given op.
+
+    Returns:
+        peak (int): the peak allocated bytes above the start
+    """
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for i in range(reps): op()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return peak
+
+
+def run_suite(sizes=SIZES, seed=0, min_time=.2, memory=True, silent=False,
+        repeats=5):
+    """ Run every benchmark on the synthetic plan of every size. The plan and
+    the random state are reset by given seed before each benchmark. The
+    benchmarks of actions never applied are marked as no-ops.
+
+    Returns:
+        results (dict): {'<benchmark>@<size>': {'ops_per_sec', 'peak_bytes',
+            'noop' if no move is ever applied}}
+    """
+    results = {'reference':{'ops_per_sec':time_op(_reference(), min_time,
+        repeats=repeats)}}
+    for size in sizes:
+        for name, setup in BENCHMARKS:
+            plan = synthetic_plan(size, seed)
+            op   = setup(plan)
+            np.random.seed(seed)
+            result = {'ops_per_sec':time_op(op, min_time, repeats=repeats)}
+            if memory: result['peak_bytes'] = peak_memory(op)
+            if getattr(op, 'applied', None) == 0: result['noop'] = True
+            results['%s@%d' % (name, size)] = result
+            if not silent:
+                print("%-24s %12.1f ops/s %12s%s" % ('%s@%d' % (name, size),
+                    result['ops_per_sec'], '%.1f KB' % (
+                    result['peak_bytes'] / 1024) if memory else '',
+                    '  (no-op)' if result.get('noop') else ''))
+
+    return results
+
+
+def compare(results, baseline, tolerance=.3):
+    """ Compare the results against a baseline. A benchmark regresses if its
+    ops per second drop or its peak memory grows by more than tolerance. The
+    no-op benchmarks are not compared. The speeds are scaled by the change
+    of speed of the reference op if both have it.
+
+    Returns:
+        regressions (list): the messages of regressed benchmarks
+    """
+    scale = 1.
+    if 'reference' in results and 'reference' in baseline:
+        scale = baseline['reference']['ops_per_sec'] / \
+            results['reference']['ops_per_sec']
+
+    regressions = []
+    for key, result in results.items():
+        if key == 'reference' or key not in baseline or result.get('noop') \
+                or baseline[key].get('noop'): continue
+        base  = baseline[key]
+        speed = result['ops_per_sec'] * scale / base['ops_per_sec']
+        if speed < 1 - tolerance:
+            regressions.append("%s: %.1f -> %.1f ops/s (%.0f%%)" % (key,
+                base['ops_per_sec'], result['ops_per_sec'], 100 * (speed - 1)))
+        if 'peak_bytes' in result and base.get('peak_bytes'):
+            growth = result['peak_bytes'] / base['peak_bytes']
+            if growth > 1 + tolerance:
+                regressions.append("%s: peak %d -> %d bytes (+%.0f%%)" % (key,
+                    base['peak_bytes'], result['peak_bytes'], 
+                    100 * (growth - 1)))
+
+    return regressions
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-time', type=float, default=.2)
+    parser.add_argument('--memory', action='store_true',
+        help="also measure the bytes per cell and per object of plan states")
+    parser.add_argument('--save', help="save the results as baseline")
+    parser.add_argument('--compare', help="compare against a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=.3)
+    parser.add_argument('--repeats', type=int, default=5,
+        help="the speed is the best of given repeats")
+    args = parser.parse_args()
+
+    if args.memory:
+        for name, size in memory_per_cell().items():
+            print("%-16s %8.1f bytes/cell" % (name, size))
+        for name, size in memory_per_object().items():
+            print("%-16s %8.1f bytes/object" % (name, size))
+
+    results = run_suite(args.sizes, args.seed, args.min_time,
+        repeats=args.repeats)
+    if args.save:
+        with open(args.save, 'w') as f: json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions: print("REGRESSION", message)
+        if regressions: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,33 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
-""" 
-This script implements the Grid class for architectural_plan_generator.
+"""
+This script implements the Grid and LabelGrid classes for
+architectural_plan_generator.
 Author: Xian Lai
 Date: Jan.30, 2017
 """
 
 
+import numpy as np
+import Raster
+
+
+OUTSIDE = -1  # the label of grids outside boundary or not assigned to a room
+NGBRS   = [(-1, 0), (1, 0), (0, 1), (0, -1)]  # the offsets of 4 neighbors
+
+
 class Grid():
 
     """
-    The grid class implements the abstract grid objects which are the unit 
+    The grid class implements the abstract grid objects which are the unit
     areas inside rooms. We use it to manipulate the geometry of rooms.
 
     Inputs:
     -------
-    - xy (tuple): the coordinates of this grid. Also used as the key for 
+    - xy (tuple): the coordinates of this grid. Also used as the key for
         retrieval from main grids list.
     - rid (int): the id of the room this grid belongs to.
-    
+
     Attributes:
     -----------
     - xy (tuple): the coordinates of this grid
@@ -26,13 +35,18 @@ class Grid():
     - y (int): the y of this grid
     - rid (int): the id of the room it belongs to
 
+    The attributes are kept in slots, so a Grid view costs no instance
+    dictionary.
+
     Methods:
     --------
     - parse: parse the states attributes to get stats attributes.
     """
 
+    __slots__ = ['xy', 'x', 'y', 'rid']
+
     def __init__(self, xy, rid):
-        """ 
+        """
         """
         self.xy = xy
         self.x, self.y = xy
@@ -44,10 +58,348 @@ class Grid():
         """
         pass
 
-    
+
+
+class LabelGrid(object):
+
+    """
+    The label grid class implements the canonical state of a plan: a dense
+    integer array holding the rid of the room each grid belongs to. The Grid
+    objects and the xys of rooms are only derived views of this array, so the
+    geometrical queries like boundary, adjacency, area and bounds are array
+    operations instead of list scans.
+
+    Inputs:
+    -------
+    - grid_coords (list): the x's and y's of grids inside boundary
+
+    Attributes:
+    -----------
+    - coords: the n by 2 int array of the x's and y's of grids inside 
+        boundary in given order
+    - xys: the coordinates of grids inside boundary as a list of tuples. It's
+        derived from coords when asked for, so the plan state keeps no tuple
+        per grid.
+    - origin: the (x, y) of the array element labels[0, 0]
+    - labels: the 2d int array of rids indexed by (x - x0, y - y0). The grids
+        outside boundary or not assigned to any room are labeled -1. There is
+        always a 1-grid wide border of -1 around the plan, so the neighbors of
+        any grid inside boundary can be indexed without clipping.
+    - inside: the 2d boolean array marking the grids inside boundary
+    - boundary: the index of boundary(inward) xys of each room as a set keyed
+        by rid. It's updated locally in assign, so finding the boundary of a
+        room costs O(boundary) instead of scanning the room.
+
+    Methods:
+    --------
+    - __getitem__: Get the Grid view of given xy.
+    - __contains__: Whether given xy is inside boundary.
+    - keys: The xys of grids inside boundary.
+    - rid_at: Get the rids of given xys.
+    - assign: Assign given xys to the room of given rid.
+    - reindex: Rebuild the boundary index from the labels.
+    - _update_boundary: Update the boundary index around given grids.
+    - to_indices: Convert xys into array indices.
+    - to_xys: Convert array indices into xys.
+    - find_grids: Find the x's and y's of grids labeled by given rid.
+    - find_xys: Find the xys labeled by given rid.
+    - find_bounds: Find the bounding x and y values of given room.
+    - find_boundary_xys: Find the inward boundary xys and corresponding
+        outward xys of given room.
+    - find_adjacent_rids: Find the rids of rooms adjacent to given room.
+    - count_moments: Count the moments and bounds of every rid.
+    """
+
+    def __init__(self, grid_coords):
+        """
+        """
+        self.coords = np.array(grid_coords).astype(np.int32).reshape(-1, 2)
+        xs, ys      = self.coords.T
+
+        # leave a border of 1 grid around the plan
+        self.origin = (xs.min() - 1, ys.min() - 1)
+        shape       = (xs.max() - xs.min() + 3, ys.max() - ys.min() + 3)
+
+        self.labels = np.full(shape, OUTSIDE, dtype=np.int32)
+        self.inside = np.zeros(shape, dtype=bool)
+        self.inside[self.to_indices(self.coords)] = True
+        self.reindex()
+
+
+    def __getitem__(self, xy):
+        """ Get the Grid view of given xy.
+        """
+        if xy not in self: raise KeyError(xy)
+        rid = int(self.labels[xy[0] - self.origin[0], xy[1] - self.origin[1]])
+
+        return Grid(xy=xy, rid=None if rid == OUTSIDE else rid)
+
+
+    def __contains__(self, xy):
+        """ Whether given xy is inside boundary.
+        """
+        i, j = xy[0] - self.origin[0], xy[1] - self.origin[1]
+        if not (0 <= i < self.inside.shape[0] and 0 <= j < self.inside.shape[1]):
+            return False
+
+        return bool(self.inside[i, j])
+
+
+    @property
+    def xys(self):
+        """ The coordinates of grids inside boundary as a list of tuples.
+        """
+        return list(zip(*self.coords.T.tolist()))
+
+
+    def __iter__(self):
+        return iter(self.xys)
+
+
+    def __len__(self):
+        return len(self.coords)
+
+
+    def keys(self,):
+        """ The xys of grids inside boundary.
+        """
+        return self.xys
+
+
+    def to_indices(self, xys):
+        """ Convert xys into a tuple of index arrays of labels.
+
+        Args:
+            xys (list): the xys to convert
+        """
+        if len(xys) == 0:
+            return (np.empty(0, dtype=int), np.empty(0, dtype=int))
+        xs, ys = np.asarray(xys).reshape(-1, 2).T
+
+        return (xs - self.origin[0], ys - self.origin[1])
+
+
+    def to_xys(self, ix, iy):
+        """ Convert index arrays of labels into a list of xys.
+
+        Args:
+            ix, iy (np.ndarray): the indices along x and y axis
+        """
+        xs = (ix + self.origin[0]).tolist()
+        ys = (iy + self.origin[1]).tolist()
+
+        return list(zip(xs, ys))
+
+
+    def rid_at(self, xys):
+        """ Get the rids of given xys as an array.
+        """
+        return self.labels[self.to_indices(xys)]
+
+
+    def assign(self, xys, rid):
+        """ Assign given xys to the room of given rid and update the boundary
+        index around them.
+        """
+        ix, iy = self.to_indices(xys)
+        self.labels[ix, iy] = rid
+        self._update_boundary(ix, iy)
+
+
+    def _on_boundary(self, ix, iy):
+        """ Whether the grids of given indices are on the boundary(inward) of
+        their rooms, namely having a neighbor inside boundary but in another
+        room.
+        """
+        own = self.labels[ix, iy]
+        on  = np.zeros(len(ix), dtype=bool)
+        for dx, dy in NGBRS:
+            on |= self.inside[ix + dx, iy + dy] & \
+                (self.labels[ix + dx, iy + dy] != own)
+
+        return on & (own != OUTSIDE)
+
+
+    def reindex(self,):
+        """ Rebuild the boundary index from the labels. It's used when the
+        whole label array is replaced.
+        """
+        # test all grids at once, the border of labels is always outside
+        w, h = self.labels.shape
+        own  = self.labels[1:-1, 1:-1]
+        on   = np.zeros(own.shape, dtype=bool)
+        for dx, dy in NGBRS:
+            window = (slice(1 + dx, w - 1 + dx), slice(1 + dy, h - 1 + dy))
+            on |= self.inside[window] & (self.labels[window] != own)
+        on &= own != OUTSIDE
+
+        self._member = np.full(self.labels.shape, OUTSIDE, dtype=np.int32)
+        self._member[1:-1, 1:-1][on] = own[on]
+        self.boundary = {}
+        ix, iy = np.nonzero(on)
+        rids   = own[ix, iy].tolist()
+        for xy, rid in zip(self.to_xys(ix + 1, iy + 1), rids):
+            self.boundary.setdefault(rid, set()).add(xy)
+
+
+    def _update_boundary(self, ix, iy):
+        """ Update the boundary index around the grids of given indices. Only
+        these grids and their neighbors can enter or leave the boundary of a
+        room.
+        """
+        ix = np.concatenate([ix] + [ix + dx for dx, dy in NGBRS])
+        iy = np.concatenate([iy] + [iy + dy for dx, dy in NGBRS])
+        keep   = self.inside[ix, iy]
+        ix, iy = ix[keep], iy[keep]
+
+        new  = np.where(self._on_boundary(ix, iy), self.labels[ix, iy], OUTSIDE)
+        old  = self._member[ix, iy]
+        diff = np.flatnonzero(new != old)
+        if len(diff) == 0: return
+        # the neighbors of given grids overlap, keep each changed grid once
+        _, first = np.unique(ix[diff] * self.labels.shape[1] + iy[diff],
+            return_index=True)
+        diff = diff[first]
+        self._member[ix[diff], iy[diff]] = new[diff]
+
+        xys = self.to_xys(ix[diff], iy[diff])
+        for xy, r_old, r_new in zip(xys, old[diff].tolist(), new[diff].tolist()):
+            if r_old != OUTSIDE:
+                self.boundary[r_old].discard(xy)
+                if not self.boundary[r_old]: del self.boundary[r_old]
+            if r_new != OUTSIDE: self.boundary.setdefault(r_new, set()).add(xy)
+
+
+    def _window(self, bounds=None):
+        """ Get the slices of labels covering the given bounds and a border of
+        1 grid around it.
+
+        Args:
+            bounds (tuple): (min_x, min_y, max_x, max_y) of grids. If not
+                given, the window covers the whole plan.
+        """
+        if bounds is None:
+            return (slice(None), slice(None)), (0, 0)
+
+        i0 = bounds[0] - self.origin[0] - 1
+        j0 = bounds[1] - self.origin[1] - 1
+        i1 = bounds[2] - self.origin[0] + 2
+        j1 = bounds[3] - self.origin[1] + 2
+
+        return (slice(i0, i1), slice(j0, j1)), (i0, j0)
+
+
+    def find_grids(self, rid, bounds=None):
+        """ Find the x's and y's of grids labeled by given rid as 2 arrays.
+
+        Args:
+            rid (int): the rid of room
+            bounds (tuple): the bounds of room to limit the scanning window
+        """
+        window, (i0, j0) = self._window(bounds)
+        ix, iy = np.nonzero(self.labels[window] == rid)
+
+        return ix + (i0 + self.origin[0]), iy + (j0 + self.origin[1])
+
+
+    def find_xys(self, rid, bounds=None):
+        """ Find the xys labeled by given rid.
+
+        Args:
+            rid (int): the rid of room
+            bounds (tuple): the bounds of room to limit the scanning window
+        """
+        xs, ys = self.find_grids(rid, bounds)
+
+        return list(zip(xs.tolist(), ys.tolist()))
+
+
+    def find_bounds(self, rid, bounds=None):
+        """ Find the bounding x and y values of given room as a tuple of
+        (min_x, min_y, max_x, max_y). Return None if the room has no grids.
+        """
+        return Raster.bounds(*self.find_grids(rid, bounds))
+
+
+    def _outward_masks(self, rid, bounds=None):
+        """ For each of the 4 neighbor directions, find the grids of given room
+        whose neighbor in that direction is inside boundary but not in this
+        room. The masks are of the shape of the scanning window without
+        border.
+        """
+        window, (i0, j0) = self._window(bounds)
+        mine   = self.labels[window] == rid
+        inside = self.inside[window]
+        core   = mine[1:-1, 1:-1]
+        w, h   = core.shape
+
+        masks = []
+        for dx, dy in NGBRS:
+            ngbr_mine   = mine[1 + dx:1 + dx + w, 1 + dy:1 + dy + h]
+            ngbr_inside = inside[1 + dx:1 + dx + w, 1 + dy:1 + dy + h]
+            masks.append(core & ~ngbr_mine & ngbr_inside)
+
+        return masks, (i0 + 1, j0 + 1)
+
+
+    def find_boundary_xys(self, rid):
+        """ Find the xys on boundary(inward) of given room and corresponding
+        outward xys in other rooms. They are looked up in the boundary index
+        and sorted by x then y.
+
+        Args:
+            rid (int): the rid of room
+
+        Returns:
+            boundary_xys (list): the xys on boundary(inward)
+            outward_xys (list): corresponding outward xys in other rooms
+        """
+        boundary_xys = sorted(self.boundary.get(rid, ()))
+        ix, iy = self.to_indices(boundary_xys)
+
+        # the outward xys of each boundary xy, in the order of NGBRS
+        hits = np.stack([self.inside[ix + dx, iy + dy] & \
+            (self.labels[ix + dx, iy + dy] != rid) for dx, dy in NGBRS], axis=1)
+        outward_xys = [
+            [(x + dx, y + dy) for (dx, dy), hit in zip(NGBRS, row) if hit]
+            for (x, y), row in zip(boundary_xys, hits.tolist())
+        ]
+
+        return boundary_xys, outward_xys
+
+
+    def find_adjacent_rids(self, rid, bounds=None):
+        """ Find the rids of rooms adjacent to given room.
+        """
+        masks, (i0, j0) = self._outward_masks(rid, bounds)
+        rids = []
+        for (dx, dy), mask in zip(NGBRS, masks):
+            ix, iy = np.nonzero(mask)
+            rids.append(self.labels[ix + i0 + dx, iy + j0 + dy])
+        rids = np.unique(np.concatenate(rids))
+
+        return [int(r) for r in rids if r != OUTSIDE]
+
+
+    def count_moments(self, n):
+        """ Count the moments [n, sum of x, sum of y] and the bounds (min_x, 
+        min_y, max_x, max_y) of every rid in range(n) in one pass.
+
+        Returns:
+            sums (np.ndarray): the n by 3 array of moments
+            bounds (np.ndarray): the n by 4 array of bounds
+        """
+        x0, y0 = self.origin
+        sums   = Raster.label_moments(self.labels, n)
+        sums[:, 1] += sums[:, 0] * x0
+        sums[:, 2] += sums[:, 0] * y0
+
+        return sums, Raster.label_bounds(self.labels, n) + [x0, y0, x0, y0]
+
+
 
 def main():
     pass
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the logging of architectural_plan_generator. Every
+subsystem has its own logger under 'apg', like 'apg.plan', 'apg.transition',
+'apg.search' and 'apg.parallel', so their levels can be set separately.
+
+The messages are formatted lazily: the arguments are only formatted when a
+record is emitted, and the expensive ones like the states of all rooms are
+wrapped in Lazy so they are not even built otherwise. The debug traces of the
+hot paths are rate-limited per message when enabled.
+
+    import Log
+    Log.configure(level='INFO', rate=20)   # 20 messages per second at most
+    Log.verbose('transition')              # the debug traces of actions
+
+The levels are only set by configure and verbose, never by the classes. The
+'silent' inputs of the classes are kept per instance: a silent instance logs
+through a Quiet logger passing only warnings and errors, whatever the levels.
+
+Author: Xian Lai
+Date: Feb.26, 2018
+"""
+
+
+import sys
+import time
+import logging
+
+
+ROOT   = 'apg'
+FORMAT = '%(levelname)s %(name)s: %(message)s'
+
+
+# ---------------------------- global functions ------------------------------
+def get_logger(subsystem, silent=False):
+    """ The logger of given subsystem, like 'plan' or 'search'. If silent,
+    it's wrapped by Quiet to drop everything below WARNING.
+    """
+    logger = logging.getLogger(ROOT + '.' + subsystem)
+
+    return Quiet(logger, {}) if silent else logger
+
+
+def configure(level=logging.INFO, rate=50., burst=100, stream=None,
+        fmt=FORMAT):
+    """ Set up the handler of all subsystems. Calling it again replaces the
+    handler set up before.
+
+    Args:
+        level (int or str): the level of all subsystems
+        rate (float): the messages per second allowed for each message below
+            WARNING. None for no rate limit.
+        burst (int): the messages allowed in a burst before rate limiting
+        stream: the stream to write, default is sys.stderr
+        fmt (str): the format of records
+
+    Returns:
+        handler (logging.Handler): the handler set up
+    """
+    root = logging.getLogger(ROOT)
+    for handler in list(root.handlers):
+        if getattr(handler, '_apg', False): root.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(fmt))
+    if rate is not None: handler.addFilter(RateLimitFilter(rate, burst))
+    handler._apg = True
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+
+    return handler
+
+
+def verbose(subsystem):
+    """ Turn on the debug logging of given subsystem. If no handler is set
+    up yet, the default one is set up with the messages on stdout.
+    """
+    get_logger(subsystem).setLevel(logging.DEBUG)
+    if not logging.getLogger(ROOT).handlers: configure(stream=sys.stdout)
+
+
+
+class Quiet(logging.LoggerAdapter):
+
+    """
+    The quiet logger of a silent instance passing only the records of WARNING
+    and above to the logger of its subsystem.
+    """
+
+    def isEnabledFor(self, level):
+        return level >= logging.WARNING and self.logger.isEnabledFor(level)
+
+
+
+class Lazy(object):
+
+    """
+    The lazy message argument calling given function with given arguments
+    only when the message is formatted.
+    """
+
+    __slots__ = ['fn', 'args']
+
+    def __init__(self, fn, *args):
+        self.fn   = fn
+        self.args = args
+
+    def __str__(self):
+        return str(self.fn(*self.args))
+
+
+
+class RateLimitFilter(logging.Filter):
+
+    """
+    The rate limit filter drops the records of a message repeated faster than
+    given rate by a token bucket kept for each logger and message. The number
+    of records dropped is appended to the next record passing. Records of
+    WARNING and above always pass.
+
+    Inputs:
+    -------
+    - rate (float): the records per second allowed for each message
+    - burst (int): the records allowed in a burst
+
+    Attributes:
+    -----------
+    - buckets: [tokens, last time, dropped] keyed by (logger name, message)
+    """
+
+    def __init__(self, rate=50., burst=100):
+        """
+        """
+        logging.Filter.__init__(self)
+        self.rate    = rate
+        self.burst   = burst
+        self.buckets = {}
+
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING: return True
+
+        key, now = (record.name, record.msg), time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None: bucket = self.buckets[key] = [self.burst, now, 0]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            record.msg = str(record.msg) + \
+                " (%d similar messages dropped)" % bucket[2]
+            bucket[2] = 0
+
+        return True
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
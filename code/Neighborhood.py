@@ -0,0 +1,327 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the Neighborhood class for architectural_plan_generator.
+
+Author: Xian Lai
+Date: Feb.28, 2018
+"""
+
+
+import numpy as np
+
+import Raster
+from Grid import NGBRS
+
+
+EXPAND, SPLIT, MERGE = 0, 1, 2
+ACTIONS = ('expand', 'split', 'merge')
+
+
+# ---------------------------- global functions ------------------------------
+def convex_aspect(widths, heights):
+    """ The convex aspect ratios of rectangles of given widths and heights,
+    the vectorized calc_convex_aspect of Room.
+    """
+    ratio = np.asarray(widths, dtype=float) / np.asarray(heights, dtype=float)
+
+    return np.maximum(ratio, 1 / ratio)
+
+
+class Neighborhood(object):
+
+    """
+    The neighborhood class enumerates the whole neighborhood of a plan state:
+    every single-wall expand of every room, every split line of every room
+    and every merge of adjacent same-function rooms. Both the enumeration and
+    the scoring are vectorized over the grids and rooms of the label grid, so
+    the change of totals of objective terms of every move is found in a few
+    array passes and all moves are scored by Objective.score_batch at once.
+
+    The rooms are indexed by a compact index of live rooms inside, since the
+    rids of deleted rooms are never reused and the room count keeps growing
+    along a search. The moves are reported by rids.
+
+    The moves are only made into Move records by Transition when asked for.
+    The change of totals assumes the rooms losing grids in an expand and the
+    2 sides of a split stay in one piece, so a move breaking a room into more
+    pieces should be scored again by Transition.score before committing.
+
+    Inputs:
+    -------
+    - plan (Plan): the parsed plan
+    - actions (tuple): the actions to enumerate from ACTIONS
+
+    Attributes:
+    -----------
+    - kinds: the action of each move, EXPAND, SPLIT or MERGE
+    - rids: the rid of room each move is on. For merges, the first room.
+    - others: for expands, the index of wall. For splits, the index of the
+        line along the axis, the split is after it. For merges, the rid of
+        the second room.
+    - axes: for splits, 0 for x and 1 for y
+    - deltas: the m by 4 array of changes of objective totals of each move
+    - scores: the changes of objective value of each move
+    - live: the rids of live rooms, in the order of the compact index
+    - labels: the compact index of room of each grid, -1 for outside
+
+    Methods:
+    --------
+    - move: Make the Move record of a move by the transition.
+    - expand_max: The max of given per-grid values over the grids taken by
+        each expand.
+    - _room_arrays: Index the live rooms and count their areas, bounds and
+        aspect ratios.
+    - _expands: Enumerate and score the single-wall expands.
+    - _splits: Enumerate and score the split lines along an axis.
+    - _merges: Enumerate and score the merges.
+    """
+
+    def __init__(self, plan, actions=ACTIONS):
+        """
+        """
+        self.plan = plan
+        self._room_arrays()
+
+        parts = []
+        if 'expand' in actions: parts.append(self._expands())
+        if 'split' in actions: parts += [self._splits(0), self._splits(1)]
+        if 'merge' in actions: parts.append(self._merges())
+        parts = [part for part in parts if len(part[0])]
+
+        if parts:
+            kinds, rids, others, axes, deltas = zip(*parts)
+            self.kinds  = np.concatenate(kinds)
+            self.rids   = np.concatenate(rids)
+            self.others = np.concatenate(others)
+            self.axes   = np.concatenate(axes)
+            self.deltas = np.concatenate(deltas)
+        else:
+            self.kinds, self.rids, self.others, self.axes = \
+                [np.empty(0, dtype=int) for _ in range(4)]
+            self.deltas = np.empty((0, 4))
+        self.scores = plan.objective_fn.score_batch(self.deltas)
+
+
+    def __len__(self):
+        return len(self.kinds)
+
+
+    def _room_arrays(self,):
+        """ Index the live rooms compactly, and count their areas, bounds and
+        aspect ratios and the grids of each room in one pass over the label
+        grid. Everything is in array indices of labels.
+        """
+        plan  = self.plan
+        rooms = plan._purge_room()
+        n     = len(rooms)
+
+        # the compact index of each rid, the last one is for OUTSIDE
+        self.live  = np.array([room.rid for room in rooms], dtype=int)
+        index      = np.full(plan.room_count + 1, -1)
+        index[self.live] = np.arange(n)
+        self.labels = labels = index[plan.grids.labels]
+        ix, iy = np.nonzero(labels >= 0)
+        rids   = labels[ix, iy]
+
+        self.cells  = (ix, iy, rids)
+        self.areas  = np.bincount(rids, minlength=n)
+        self.bounds = Raster.label_bounds(labels, n)
+
+        min_x, min_y, max_x, max_y = self.bounds.T
+        self.aspects = convex_aspect(max_x - min_x + 1, max_y - min_y + 1)
+
+        self.functions = np.array([plan.functions.index(room.function) \
+            for room in rooms], dtype=int)
+        self.corridors = np.array([room.function in \
+            plan.objective_fn.corridors for room in rooms], dtype=float)
+        self._index = index
+
+
+    def _expands(self,):
+        """ Enumerate and score the single-wall expands. The walls of a room
+        are the 4-connected groups of grids outside it but next to it, as in
+        Transition._propose_expand. They are found for all rooms in one pass
+        by labeling the components of all (room, grid) pairs with the rooms
+        set apart along x.
+        """
+        labels, inside = self.labels, self.plan.grids.inside
+        W, H = labels.shape
+        ix, iy, own = self.cells
+
+        keys = []
+        for dx, dy in NGBRS:
+            nx, ny = ix + dx, iy + dy
+            hit = inside[nx, ny] & (labels[nx, ny] != own)
+            keys.append(own[hit].astype(np.int64) * (W * H) + nx[hit] * H + \
+                ny[hit])
+        keys = np.unique(np.concatenate(keys))
+        gainers, flat = keys // (W * H), keys % (W * H)
+        cx, cy = flat // H, flat % H
+
+        walls, n_walls = Raster.connected_components(cx + gainers * (W + 1), cy)
+        order  = np.argsort(walls, kind='stable')
+        cw, cx, cy, gainers = walls[order], cx[order], cy[order], \
+            gainers[order]
+        starts = np.flatnonzero(np.r_[True, np.diff(cw) != 0])
+        self._walls = (cx, cy, np.r_[starts, len(cw)])
+        if n_walls == 0: return self._empty()
+
+        owners  = labels[cx, cy]
+        g       = gainers[starts]
+        n_taken = np.bincount(cw, minlength=n_walls)
+
+        # the gaining rooms take the union of bounds
+        bounds = self.bounds[g]
+        min_x  = np.minimum(bounds[:, 0], np.minimum.reduceat(cx, starts))
+        min_y  = np.minimum(bounds[:, 1], np.minimum.reduceat(cy, starts))
+        max_x  = np.maximum(bounds[:, 2], np.maximum.reduceat(cx, starts))
+        max_y  = np.maximum(bounds[:, 3], np.maximum.reduceat(cy, starts))
+        aspect = convex_aspect(max_x - min_x + 1, max_y - min_y + 1) - \
+            self.aspects[g]
+
+        # the losing rooms of each wall: the bounds of grids left are found
+        # from the counts of grids of each room in each column and row.
+        n = len(self.areas)
+        groups, inverse, counts = np.unique(cw * n + owners,
+            return_inverse=True, return_counts=True)
+        gw, go = groups // n, groups % n
+        eaten  = counts == self.areas[go]
+        left   = []
+        for axis, size, coords in ((0, W, cx), (1, H, cy)):
+            room_counts = np.bincount(own * size + (ix, iy)[axis],
+                minlength=n * size).reshape(n, size)
+            taken = np.bincount(inverse * size + coords,
+                minlength=len(groups) * size).reshape(-1, size)
+            kept  = (room_counts[go] - taken) > 0
+            left.append((kept.argmax(axis=1),
+                size - 1 - kept[:, ::-1].argmax(axis=1)))
+        (lo_x, hi_x), (lo_y, hi_y) = left
+        loss = np.where(eaten, 0.,
+            convex_aspect(hi_x - lo_x + 1, hi_y - lo_y + 1)) - self.aspects[go]
+        aspect += np.bincount(gw, weights=loss, minlength=n_walls)
+
+        corr = self.corridors[g] * n_taken - \
+            np.bincount(cw, weights=self.corridors[owners], minlength=n_walls)
+        deltas = np.stack([-np.bincount(gw, weights=eaten, minlength=n_walls),
+            np.zeros(n_walls), aspect, corr], axis=1)
+
+        return (np.full(n_walls, EXPAND), self.live[g], np.arange(n_walls),
+            np.zeros(n_walls, dtype=int), deltas)
+
+
+    def _splits(self, axis):
+        """ Enumerate and score the split lines of all rooms along given axis.
+        The grids of a room span its bounds along both axes, so the bounds of
+        both sides are found from the prefix and suffix extremes of the other
+        coordinate over the lines.
+        """
+        labels = self.labels
+        ix, iy, own = self.cells
+        along, other = ((ix, iy), (iy, ix))[axis]
+        size, big = labels.shape[axis], max(labels.shape)
+        n = len(self.areas)
+
+        lows  = np.full((n, size), big)
+        highs = np.full((n, size), -1)
+        np.minimum.at(lows, (own, along), other)
+        np.maximum.at(highs, (own, along), other)
+        pre_lo  = np.minimum.accumulate(lows, axis=1)
+        pre_hi  = np.maximum.accumulate(highs, axis=1)
+        post_lo = np.minimum.accumulate(lows[:, ::-1], axis=1)[:, ::-1]
+        post_hi = np.maximum.accumulate(highs[:, ::-1], axis=1)[:, ::-1]
+
+        start, end = self.bounds[:, axis], self.bounds[:, axis + 2]
+        lines  = np.arange(size - 1)
+        valid  = (lines >= start[:, None]) & (lines < end[:, None])
+        rr, cc = np.nonzero(valid)
+        if len(rr) == 0: return self._empty()
+
+        aspect = convex_aspect(cc - start[rr] + 1,
+                pre_hi[rr, cc] - pre_lo[rr, cc] + 1) + \
+            convex_aspect(end[rr] - cc,
+                post_hi[rr, cc + 1] - post_lo[rr, cc + 1] + 1) - \
+            self.aspects[rr]
+        m = len(rr)
+        deltas = np.stack([np.ones(m), np.zeros(m), aspect, np.zeros(m)],
+            axis=1)
+
+        return np.full(m, SPLIT), self.live[rr], cc, np.full(m, axis), deltas
+
+
+    def _merges(self,):
+        """ Enumerate and score the merges of adjacent same-function rooms
+        from the adjacency graph of plan.
+        """
+        pairs = np.array([(r, s) for r, s, _ in self.plan.adjacency.pairs()],
+            dtype=int).reshape(-1, 2)
+        pairs = self._index[pairs]
+        same  = self.functions[pairs[:, 0]] == self.functions[pairs[:, 1]]
+        r, s  = pairs[same].T
+        m = len(r)
+        if m == 0: return self._empty()
+
+        a, b   = self.bounds[r], self.bounds[s]
+        lo, hi = np.minimum(a[:, :2], b[:, :2]), np.maximum(a[:, 2:], b[:, 2:])
+        aspect = convex_aspect(*(hi - lo + 1).T) - self.aspects[r] - \
+            self.aspects[s]
+        deltas = np.stack([-np.ones(m), np.zeros(m), aspect, np.zeros(m)],
+            axis=1)
+
+        return np.full(m, MERGE), self.live[r], self.live[s], \
+            np.zeros(m, dtype=int), deltas
+
+
+    def _empty(self,):
+        empty = np.empty(0, dtype=int)
+        return empty, empty, empty, empty, np.empty((0, 4))
+
+
+    def expand_max(self, values):
+        """ The max of given per-grid values over the grids taken by each
+        expand. The other moves get -inf.
+
+        Args:
+            values (np.ndarray): the values of the shape of labels
+        """
+        result = np.full(len(self), -np.inf)
+        expand = self.kinds == EXPAND
+        if expand.any():
+            cx, cy, bounds = self._walls
+            result[expand] = np.maximum.reduceat(values[cx, cy],
+                bounds[:-1])[self.others[expand]]
+
+        return result
+
+
+    def move(self, k, transition):
+        """ Make the Move record of given move by the transition.
+
+        Args:
+            k (int): the index of move
+            transition (Transition): the transition making moves
+
+        Returns:
+            move (Move): the move record ready to score and apply
+        """
+        plan, grids = self.plan, self.plan.grids
+        kind, rid, other = self.kinds[k], int(self.rids[k]), int(self.others[k])
+        if kind == EXPAND:
+            cx, cy, bounds = self._walls
+            start, end = bounds[other], bounds[other + 1]
+            return transition._expand_move(plan, plan.rooms[rid],
+                grids.to_xys(cx[start:end], cy[start:end]))
+        if kind == SPLIT:
+            axis = int(self.axes[k])
+            return transition._split_move(plan, plan.rooms[rid], 'xy'[axis],
+                other + grids.origin[axis] + .5)
+
+        return transition._merge_move(plan, rid, other)
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
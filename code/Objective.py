@@ -0,0 +1,218 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the Objective class for architectural_plan_generator.
+
+Author: Xian Lai
+Date: Feb.10, 2018
+"""
+
+
+from math import fsum
+import numpy as np
+import Raster
+from Room import calc_convex_aspect
+
+
+class Objective(object):
+
+    """
+    The objective class implements the objective function of plans. Instead of
+    averaging over all rooms every time, it keeps the terms of each room and
+    the running totals of them. So the objective value of a plan is updated
+    with the rooms changed in last action, and the objective value after a
+    proposed change can be scored from the change alone without applying it.
+
+    The objective value is a linear combination of:
+    - the average area of rooms
+    - the average convex aspect ratio of rooms
+    - the space efficiency: 1 - corridor area / total area
+
+    Inputs:
+    -------
+    - total_area (float): the total area of plan
+    - weights (tuple): the weights of average area, average convex aspect
+        ratio and space efficiency.
+    - corridors (tuple): the functions counted as corridor area
+
+    Attributes:
+    -----------
+    - terms: the terms of each room keyed by rid. The terms of a room are
+        (1, area, convex aspect ratio, corridor area).
+    - totals: the running totals of terms of all rooms as an array
+    - value: the objective value given current totals
+
+    Methods:
+    --------
+    - room_terms: Get the terms of a room given its area, bounds, function.
+    - reset: Remove the terms of all rooms.
+    - update: Replace the terms of a room.
+    - resum: Sum the totals again from the terms of rooms exactly.
+    - score: Get the objective value given totals of terms.
+    - stats: Get the plan stats given current totals.
+    - score_delta: Score the change of objective value if the terms of some
+        rooms are replaced.
+    - score_change: Score the change of objective value if some grids change
+        owner, without applying it.
+    - score_batch: Score the changes of objective value of many changes of
+        totals at once.
+    """
+
+    def __init__(self, total_area, weights=(2, 3, 4), corridors=('hall_way',)):
+        """
+        """
+        self.total_area = total_area
+        self.weights    = weights
+        self.corridors  = corridors
+        self.reset()
+
+
+    def room_terms(self, area, bounds, function):
+        """ Get the terms of a room given its area, grid bounds and function.
+
+        Args:
+            area (int): the number of grids in this room
+            bounds (tuple): the (min_x, min_y, max_x, max_y) of grids
+            function (str): the function of this room
+        """
+        min_x, min_y, max_x, max_y = bounds
+        aspect    = calc_convex_aspect((min_x, min_y, max_x + 1, max_y + 1))
+        corr_area = area if function in self.corridors else 0
+
+        return (1, area, aspect, corr_area)
+
+
+    def reset(self,):
+        """ Remove the terms of all rooms.
+        """
+        self.terms  = {}
+        self.totals = np.zeros(4)
+        self.value  = None
+
+
+    def update(self, rid, terms):
+        """ Replace the terms of a room and update the totals and value.
+
+        Args:
+            rid (int): the rid of room
+            terms (tuple): the new terms of room, None if the room is removed
+        """
+        old = self.terms.pop(rid, None)
+        if old is not None: self.totals -= old
+        if terms is not None:
+            self.terms[rid] = terms
+            self.totals += terms
+        self.value = self.score(self.totals)
+
+
+    def resum(self,):
+        """ Sum the totals again from the terms of rooms by math.fsum. The
+        running totals drift with the order of updates, while the exact sums
+        only depend on the terms. So 2 plans in the same state get the same
+        totals and score every move the same.
+        """
+        terms = list(self.terms.values())
+        self.totals = np.array([fsum(t[k] for t in terms) for k in range(4)])
+        self.value  = self.score(self.totals)
+
+
+    def score(self, totals):
+        """ Get the objective value given totals of terms.
+        """
+        n_rooms, area, aspect, corr_area = totals
+        if n_rooms == 0: return None
+        w_area, w_aspect, w_eff = self.weights
+
+        return w_area * area / n_rooms + w_aspect * aspect / n_rooms + \
+            w_eff * (1 - corr_area / self.total_area)
+
+
+    def stats(self,):
+        """ Get the plan stats given current totals.
+        """
+        n_rooms, area, aspect, corr_area = self.totals
+
+        return {
+            'n_rooms':int(n_rooms),
+            'avg_area':area / n_rooms,
+            'avg_convex_aspect':aspect / n_rooms,
+            'pl_space_eff':1 - corr_area / self.total_area,
+        }
+
+
+    def score_delta(self, changes):
+        """ Score the change of objective value if the terms of some rooms are
+        replaced. Nothing is changed.
+
+        Args:
+            changes (dict): the new terms of rooms keyed by rid, None if the
+                room is removed.
+        """
+        totals = self.totals.copy()
+        for rid, terms in changes.items():
+            if rid in self.terms: totals -= self.terms[rid]
+            if terms is not None: totals += terms
+
+        return self.score(totals) - self.value
+
+
+    def score_change(self, plan, xys, rids, functions=None):
+        """ Score the change of objective value if the given grids change
+        owner, without applying it. The new rooms are those with rid not yet
+        in plan.
+
+        Args:
+            plan (Plan): the parsed plan before change
+            xys (list): the xys changing owner
+            rids (list): the new rid of each xy
+            functions (dict): the new functions of rooms keyed by rid. Only
+                needed for new rooms and rooms changing function.
+        """
+        functions = functions or {}
+        xs, ys = np.asarray(xys, dtype=int).reshape(-1, 2).T
+        rids   = np.asarray(rids)
+        owners = plan.grids.rid_at(xys)
+
+        changes = {}
+        for rid in set(owners.tolist()) | set(rids.tolist()) | set(functions):
+            gained = (rids == rid) & (owners != rid)
+            lost   = (owners == rid) & (rids != rid)
+            room   = plan.rooms[rid] if rid < len(plan.rooms) else None
+            if room is None:
+                area   = int(gained.sum())
+                bounds = Raster.bounds(xs[gained], ys[gained])
+            else:
+                area, bounds = room.preview(
+                    xs[gained], ys[gained], xs[lost], ys[lost])
+            function = functions.get(rid, room.function if room else None)
+            changes[rid] = None if area == 0 else \
+                self.room_terms(area, bounds, function)
+
+        return self.score_delta(changes)
+
+
+    def score_batch(self, deltas):
+        """ Score the changes of objective value if the totals of terms change
+        by each row of deltas, in one vectorized pass. Nothing is changed.
+
+        Args:
+            deltas (np.ndarray): the m by 4 array of changes of totals
+
+        Returns:
+            changes (np.ndarray): the change of objective value of each row
+        """
+        totals = self.totals + np.asarray(deltas, dtype=float).reshape(-1, 4)
+        n_rooms, area, aspect, corr_area = totals.T
+        n_rooms = np.maximum(n_rooms, 1)
+        w_area, w_aspect, w_eff = self.weights
+
+        return w_area * area / n_rooms + w_aspect * aspect / n_rooms + \
+            w_eff * (1 - corr_area / self.total_area) - self.value
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
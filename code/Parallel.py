@@ -0,0 +1,376 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the parallel searching classes for
+architectural_plan_generator. The searches run in a pool of worker processes
+and only compact plan states cross the process boundaries: multi-start runs
+independent searches from different seeds and parallel tempering exchanges
+the states of replicas at different temperatures.
+
+Author: Xian Lai
+Date: Feb.14, 2018
+"""
+
+
+import os
+import time
+import numpy as np
+from math import exp
+from numpy.random import random as random_uniform
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import Log
+from Plan import Plan
+from Search import SimulatedAnnealing
+
+
+# ---------------------------- worker functions ------------------------------
+# the payload shared by all tasks is shipped once to each worker process by
+# the pool initializer and kept in this global.
+_payload = {}
+
+
+def _init_worker(function_params, grid_coords, seeding, search_kwargs):
+    """ Keep the payload shared by all tasks in this worker process.
+    """
+    _payload['function_params'] = function_params
+    _payload['grid_coords']     = grid_coords
+    _payload['seeding']         = seeding
+    _payload['search_kwargs']   = search_kwargs
+
+
+def _run_start(seed):
+    """ Run one search from a random initial state generated by given seed.
+
+    Returns:
+        result (dict): {'seed', 'objective', 'state', 'stats'}
+    """
+    np.random.seed(seed)
+    plan = Plan(
+        function_params=_payload['function_params'],
+        grid_coords=_payload['grid_coords'],
+        seeding=_payload['seeding'],
+        silent=True
+    )
+    search = SimulatedAnnealing(**_payload['search_kwargs'])
+    search.run(plan)
+
+    return {
+        'seed':seed,
+        'objective':search.best_objective,
+        'state':search.best_state,
+        'stats':search.stats
+    }
+
+
+def _worker_plan():
+    """ The plan object of this worker process. It's built once and then 
+    reused by setting the states of replicas onto it.
+    """
+    if 'plan' not in _payload:
+        _payload['plan'] = Plan(
+            function_params=_payload['function_params'],
+            grid_coords=_payload['grid_coords'],
+            silent=True
+        )
+
+    return _payload['plan']
+
+
+def _run_replica(state, temperature, n_steps, seed):
+    """ Run given steps of annealing at a fixed temperature from given state.
+
+    Returns:
+        result (dict): {'state', 'objective', 'best_state', 'best_objective',
+            'stats'}
+    """
+    np.random.seed(seed)
+    plan = _worker_plan()
+    plan.set_state(state)
+    search = SimulatedAnnealing(
+        schedule=lambda i, progress: temperature, max_iters=n_steps,
+        **_payload['search_kwargs']
+    )
+    search.run(plan)
+
+    return {
+        'state':plan.get_state(),
+        'objective':plan.objective,
+        'best_state':search.best_state,
+        'best_objective':search.best_objective,
+        'stats':search.stats
+    }
+
+
+class MultiStart(object):
+
+    """
+    The multi-start class runs independent simulated annealing searches from
+    different random seeds across a pool of processes, and collects the best
+    plan state of each search with its objective value and seed.
+
+    Inputs:
+    -------
+    - function_params (dict): requirements for each function
+    - grid_coords (list): the x's and y's of grids inside boundary
+    - n_workers (int): the number of worker processes. Default is the number
+        of cpus. With 1 worker, the searches run in this process.
+    - seeding (str): the strategy of random initial states, see Plan.
+    - silent (bool): do not log the progress. If False, the progress is 
+        logged at the level of 'parallel' set by Log.configure, see Log.
+    - search_kwargs: the keyword arguments of SimulatedAnnealing. They are
+        shipped to the workers so they should be picklable, e.g. the cooling
+        schedule given by name.
+
+    Attributes:
+    -----------
+    - results: the results of all starts sorted by objective value from best
+        to worst. Each result is a dict of seed, objective, state and stats.
+    - stats: {'n_starts', 'elapsed', 'starts_per_sec'} of last run
+
+    Methods:
+    --------
+    - run: Run the searches of given seeds.
+    - best_plan: Build a Plan from the best result.
+    """
+
+    def __init__(self, function_params, grid_coords, n_workers=None,
+            seeding='random', silent=True, **search_kwargs):
+        """
+        """
+        self.function_params = function_params
+        self.grid_coords     = [(int(x), int(y)) for x, y in grid_coords]
+        self.n_workers       = n_workers or os.cpu_count()
+        self.seeding         = seeding
+        self.silent          = silent
+        self.log             = Log.get_logger('parallel', silent)
+        self.search_kwargs   = search_kwargs
+
+
+    def run(self, seeds):
+        """ Run the searches of given seeds, one search per seed.
+
+        Args:
+            seeds (list or int): the seeds, or the number of seeds starting
+                from 0.
+
+        Returns:
+            results (list): the results sorted from best to worst
+        """
+        if isinstance(seeds, int): seeds = list(range(seeds))
+        payload = (self.function_params, self.grid_coords, self.seeding,
+            self.search_kwargs)
+        start   = time.time()
+
+        self.results = []
+        if self.n_workers == 1:
+            _init_worker(*payload)
+            for seed in seeds: self._collect(_run_start(seed))
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers,
+                    initializer=_init_worker, initargs=payload) as pool:
+                futures = [pool.submit(_run_start, seed) for seed in seeds]
+                for future in as_completed(futures):
+                    self._collect(future.result())
+
+        self.results.sort(key=lambda r: r['objective'], reverse=True)
+        elapsed = time.time() - start
+        self.stats = {
+            'n_starts':len(seeds),
+            'elapsed':elapsed,
+            'starts_per_sec':len(seeds) / elapsed
+        }
+
+        return self.results
+
+
+    def _collect(self, result):
+        """ Collect the result of one start.
+        """
+        self.results.append(result)
+        self.log.info("seed %d: objective %s (%.1f iters/s)", result['seed'],
+            result['objective'], result['stats']['iters_per_sec'])
+
+
+    def best_plan(self,):
+        """ Build a Plan from the best result.
+        """
+        plan = Plan(function_params=self.function_params,
+            grid_coords=self.grid_coords, state=self.results[0]['state'],
+            silent=True)
+
+        return plan
+
+
+
+class ParallelTempering(object):
+
+    """
+    The parallel tempering class implements the replica exchange search. K
+    replicas of plan run the annealing moves at K fixed temperatures in the 
+    worker processes. After every round of given steps, the replicas at 
+    adjacent temperatures try to exchange their states, so good states found
+    at high temperatures can sink to low temperatures and the states stuck in
+    local optima at low temperatures can escape. Only the compact states 
+    (label arrays and room functions) cross the process boundaries.
+
+    Inputs:
+    -------
+    - function_params (dict): requirements for each function
+    - grid_coords (list): the x's and y's of grids inside boundary
+    - temperatures (list): the temperatures of replicas from cold to hot
+    - n_workers (int): the number of worker processes. Default is the number
+        of replicas capped by the number of cpus.
+    - seed (int): the seed of initial states, steps and exchanges
+    - seeding (str): the strategy of random initial states, see Plan.
+    - silent (bool): do not log the progress. If False, the progress is 
+        logged at the level of 'parallel' set by Log.configure, see Log.
+    - search_kwargs: the other keyword arguments of SimulatedAnnealing. The
+        max_iters and schedule are controlled by this class, so giving them
+        raises ValueError.
+
+    Attributes:
+    -----------
+    - states: the current states of replicas ordered by temperature
+    - objectives: the current objective values of replicas
+    - best_state: the best state found by any replica
+    - best_objective: the best objective value found by any replica
+    - stats: {'rounds', 'iters', 'elapsed', 'iters_per_sec', 'exchange_rate'}
+
+    Methods:
+    --------
+    - run: Run given rounds of replica steps and exchanges.
+    - _exchange: Try to exchange the states of adjacent replicas.
+    - best_plan: Build a Plan from the best state.
+    """
+
+    # the keyword arguments of SimulatedAnnealing set by each round
+    CONTROLLED = ('max_iters', 'schedule')
+
+    def __init__(self, function_params, grid_coords, 
+            temperatures=(0.1, 0.3, 1., 3.), n_workers=None, seed=0, 
+            seeding='random', silent=True, **search_kwargs):
+        """
+        """
+        controlled = [key for key in self.CONTROLLED if key in search_kwargs]
+        if controlled:
+            raise ValueError("%s are controlled by ParallelTempering: the "
+                "replicas take steps_per_round steps of run at their fixed "
+                "temperatures." % ', '.join(controlled))
+        self.function_params = function_params
+        self.grid_coords     = [(int(x), int(y)) for x, y in grid_coords]
+        self.temperatures    = list(temperatures)
+        self.n_workers       = n_workers or \
+            min(len(self.temperatures), os.cpu_count())
+        self.seed            = seed
+        self.seeding         = seeding
+        self.silent          = silent
+        self.log             = Log.get_logger('parallel', silent)
+        self.search_kwargs   = search_kwargs
+
+
+    def run(self, n_rounds, steps_per_round=100):
+        """ Run given rounds. In each round every replica takes given steps
+        at its temperature in parallel, then the adjacent replicas try to 
+        exchange states.
+
+        Args:
+            n_rounds (int): the number of rounds
+            steps_per_round (int): the steps each replica takes per round
+
+        Returns:
+            best_objective (float): the best objective value found
+        """
+        K = len(self.temperatures)
+        np.random.seed(self.seed)
+        self.states, self.objectives = [], []
+        for k in range(K):
+            plan = Plan(function_params=self.function_params,
+                grid_coords=self.grid_coords, seeding=self.seeding, 
+                silent=True)
+            self.states.append(plan.get_state())
+            self.objectives.append(plan.objective)
+        best = int(np.argmax(self.objectives))
+        self.best_state, self.best_objective = self.states[best], \
+            self.objectives[best]
+
+        payload = (self.function_params, self.grid_coords, self.seeding,
+            self.search_kwargs)
+        n_iters, n_tries, n_exchanges = 0, 0, 0
+        start = time.time()
+        with ProcessPoolExecutor(max_workers=self.n_workers,
+                initializer=_init_worker, initargs=payload) as pool:
+            for r in range(n_rounds):
+                seeds   = np.random.randint(2**31, size=K).tolist()
+                futures = [pool.submit(_run_replica, self.states[k], 
+                    self.temperatures[k], steps_per_round, seeds[k]) \
+                    for k in range(K)]
+
+                for k, future in enumerate(futures):
+                    result = future.result()
+                    self.states[k]     = result['state']
+                    self.objectives[k] = result['objective']
+                    n_iters += result['stats']['iters']
+                    if result['best_objective'] > self.best_objective:
+                        self.best_objective = result['best_objective']
+                        self.best_state     = result['best_state']
+
+                tries, exchanges = self._exchange(parity=r % 2)
+                n_tries += tries
+                n_exchanges += exchanges
+                self.log.info("round %d: objectives %s, best %s", r, 
+                    Log.Lazy(lambda: [round(o, 3) for o in self.objectives]),
+                    self.best_objective)
+
+        elapsed = time.time() - start
+        self.stats = {
+            'rounds':n_rounds,
+            'iters':n_iters,
+            'elapsed':elapsed,
+            'iters_per_sec':n_iters / elapsed,
+            'exchange_rate':n_exchanges / n_tries if n_tries else 0.
+        }
+
+        return self.best_objective
+
+
+    def _exchange(self, parity):
+        """ Try to exchange the states of adjacent replicas (k, k+1) for k of
+        given parity. The exchange is accepted with probability 
+        min(1, exp((1/T_k - 1/T_k+1) * (objective_k+1 - objective_k))).
+
+        Returns:
+            tries (int): the number of exchanges tried
+            exchanges (int): the number of exchanges accepted
+        """
+        tries, exchanges = 0, 0
+        for k in range(parity, len(self.temperatures) - 1, 2):
+            beta_diff = 1 / self.temperatures[k] - 1 / self.temperatures[k + 1]
+            log_pr    = beta_diff * (self.objectives[k + 1] - self.objectives[k])
+            tries += 1
+            if log_pr >= 0 or random_uniform() < exp(log_pr):
+                exchanges += 1
+                self.states[k], self.states[k + 1] = \
+                    self.states[k + 1], self.states[k]
+                self.objectives[k], self.objectives[k + 1] = \
+                    self.objectives[k + 1], self.objectives[k]
+
+        return tries, exchanges
+
+
+    def best_plan(self,):
+        """ Build a Plan from the best state.
+        """
+        plan = Plan(function_params=self.function_params,
+            grid_coords=self.grid_coords, state=self.best_state,
+            silent=True)
+
+        return plan
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
@@ -8,15 +8,21 @@ Date: Dec.21, 2017
 """
 
 
-from pprint import pprint
+from pprint import pformat
+from heapq import heappush, heappop
 import numpy as np
 from numpy.random import choice as random_pick
 
 from Transition import Transition
 from Room import Room
-from Grid import Grid
-from Wall import Wall
-import Visual
+from Grid import Grid, LabelGrid, NGBRS
+from Adjacency import Adjacency
+from Walls import Walls
+import Raster
+from Objective import Objective
+import Log
+import PlanIO
+from Telemetry import timed
 
 
 # ---------------------------- global functions ------------------------------
@@ -26,6 +32,9 @@ purge_dict = lambda d: dict((k, v) for k, v in d.items() if v)
 l1_dist    = lambda xys: abs(xys[0][0] - xys[1][0]) + abs(xys[0][1] - xys[1][1])
 random_choice = lambda seq: seq[random_pick(indices(seq))]
 
+# the strategies of randomly dividing grids into rooms
+SEEDINGS = ('random', 'kmeans++', 'area', 'grow')
+
 
 class Plan(object):
 
@@ -48,7 +57,14 @@ class Plan(object):
             ...
         }
     - grid_coords (list): the x's and y's of grids inside boundary
-    - silent (bool): do not print out the searching process
+    - seeding (str): the strategy of dividing grids into rooms when randomly
+        initializing, one of SEEDINGS. 'grow' grows the rooms to their target
+        areas, see _grow_xys. The others are voronoi diagrams, see 
+        _divide_xys.
+    - silent (bool): do not log the searching process. If False, the debug
+        traces are logged at the level of 'plan' set by Log.configure or
+        --log-level, see Log.
+    - plot (bool): plot the plan in the middle of random walk and searches
     - init_state (dict): a initial plan state encoded as a dictionary of 
         function/grid-coordinates pairs assigned by human designer.
         {
@@ -56,39 +72,58 @@ class Plan(object):
             "bedroom":[(x,y), (x,y), (x,y), (x,y), ],
             "living_room":[(x,y), (x,y), (x,y), (x,y)]
         }
+    - state (dict): a compact plan state from get_state on given grid 
+        coordinates. If given, the plan starts from it instead of a random
+        state.
 
     Attributes:
     -----------
-    - grids: a dict containing the grids in this plan keyed by (x,y), namely  
-        the coordinates of each grid. These grids are fixed once initialized.
+    - grids: the LabelGrid of this plan, a dense array of the rid of each 
+        grid(-1 for outside) which is the canonical state of this plan. The 
+        Grid objects keyed by (x,y) and the xys of rooms are views derived 
+        from it.
     - rooms: a list containing the rooms in this plan. Each room has a rid for
         fast retrieval. If a room is deleted, we replace this room with None 
         object rather than delete it from the list in order to keep the indices
         of previous rooms unchanged.
     - xys: simply the coordinates of each grid
+    - adjacency: the Adjacency graph of rooms with the shared wall lengths.
+        It's updated while grids change owner.
+    - walls: the Walls of all rooms traced from the label grid. The walls of
+        dirty rooms are marked stale while parsing and traced again when 
+        asked for.
+    - dirty: the rids of rooms changed since last parsing. Only these rooms 
+        are parsed again.
     - room_count: the counter of room. Each time we create a room, we assign 
         the counter state at that time as rid. And then increment the counter 
         by 1.
     - objective: the objective value of this plan
+    - objective_fn: the Objective object keeping the running terms of rooms
+        to evaluate this plan and score proposed changes.
     - stats: a dictionary of properties of this plan:
         {
-            'rm_areas': area of each room in this plan,
             'n_rooms': total number of rooms in this plan,
-            'rm_convex_aspect': convex aspect ratio of each room in this plan,
+            'avg_area': average area of rooms in this plan,
+            'avg_convex_aspect': average convex aspect ratio of rooms,
             'pl_space_eff': the ratio of non-corridor area and total area, 
             ...
         }
-    - plot_fig: the matplotlib figure object to plot plans on.
+    - observers: the observers notified of the plan state in the middle of 
+        searching, like the plotter in Visual.py. Without observers, the plan
+        never imports matplotlib.
     - unit: the size of unit grids
     - total_area: the total area of plan
+    - function_params: the requirements for each function as given
     - functions: all the functions in this plan
     - n_rooms: the number of rooms in this plan
     - areas: the areas for each function
     - pr_merge: pick probability in merge action for each function
     - n_functions: the number of functions in this plan
-    - colors: the color of each function used in plotting
-    - silent: do not plot plans or print stats in the middle of searching
-    - plot_freq: the frequency of plotting. (e.g. 4 if plot once every 4 steps)
+    - silent: do not log stats in the middle of searching
+    - log: the logger of 'plan', quiet if silent
+    - plot_freq: the frequency of notifying observers. (e.g. 4 if plot once 
+        every 4 steps of random walk or 4 accepted moves of searches)
+    - telemetry: the attached Telemetry timing parsing and evaluating, or None
     
 
     Methods:
@@ -98,51 +133,88 @@ class Plan(object):
         a separate attribute.
     - _parse_init_state：Parse the given init state into rooms and grids.
     - _random_initialize: Initiate the plan state with given grid coordinates‘ 
-    - _make_grids_from_coords: Make a fixed list of grid objects from given 
-        grid coordinates.
+    - _make_grids_from_coords: Make the label grid from given grid 
+        coordinates.
     - _divide_xys_into_rooms: Randomly divide existing grids into groups and 
         create a room for each group.
     - _divide_xys: Randomly divide the xys into n continuous groups.
+    - _grow_xys: Grow n continuous groups of xys to their target areas.
+    - _spread_seeds: Pick n seeds spread over the plan like k-means++.
+    - _nearest_seeds: Find the nearest seed of each grid in batches.
+    - _room_targets: The target number of grids of each room.
     - _find_xy_lims: Find the bounding x and y values of this plan.
 
-    # Searching(will be seperated as a searching class in the future)
+    # Searching(the directed searches are implemented in Search.py)
     - random_walk: Random walk and stop after given iterations. 
 
-    # Evaluating(will be seperated as a Objective class in the future)
+    # State
+    - get_state: Get a compact copy of the plan state.
+    - set_state: Replace the plan state with a compact copy.
+    - save: Save the plan state into a binary plan file.
+    - load: Build a plan from a binary plan file.
+
+    # Evaluating(the running terms are kept by the Objective class)
+    - _evaluate: Evaluate the objective value from stats.
 
     # Supporting methods:
+    - _create_room: Create a room with given function and xys.
+    - _assign_xys: Assign given xys to the room of given rid.
+    - _delete_room: Replace the room of given rid with None.
+    - _set_function: Change the function of the room of given rid.
+    - _restore_room: Put a deleted room back to its place.
+    - _drop_rooms: Remove the last n rooms created.
     - _parse: Parse the stats from states.
-    - _evaluate: Evaluate the objective value from stats.
     - _purge_room: Return a list of valid rooms(not None) in this plan.
     - _pick_a_room: Randomly pick a valid room.
-    - _plot_intermediate: Plot the plan.
-    - _pprint_rooms: pprint the states of all rooms in this plan.
+    - add_observer: Add an observer notified of the plan state.
+    - _notify: Notify the observers of the plan state.
+    - _close_observers: Close the observers when the walk or search stops.
+    - _format_rooms: Format the states of all rooms in this plan.
     
     """
 
     
     def __init__(self, function_params, grid_coords=None, init_state=None, 
-            silent=False):
+            silent=False, plot=False, seeding='random', state=None):
 
+        self.telemetry = None
         self._extract_function_params(function_params)
+        self.seeding = seeding
 
         # if init_state parameter is given, we parse it as the initial state
-        # else, the grid coordinates must be given, and we generate initial
-        # state randomly.
+        # else, the grid coordinates must be given. If a compact state is
+        # given, it's set after the objective function is ready, otherwise we
+        # generate initial state randomly.
         if init_state: self._parse_init_state(init_state)
+        elif state is not None: self._make_grids_from_coords(grid_coords)
         else: self._random_initialize(grid_coords)
 
         self.silent     = silent
+        self.log        = Log.get_logger('plan', silent)
         self.unit       = 1
         self.total_area = sum(self.areas.values())
+        self.objective_fn = Objective(total_area=self.total_area)
         self.plot_freq  = 1
-        self.plot_fig   = Visual.SingleAxPlot(xy_lims=self._find_xy_lims())
+        self.observers  = []
+
+        # plotting is optional, so matplotlib is only imported when asked for
+        if plot:
+            import Visual
+            self.add_observer(Visual.PlanPlotter(self))
         
+        if state is not None: self.set_state(state)
         self._parse()
         self._evaluate()
-        self._plot_intermediate(0)
+        self._notify(0)
  
 
+    @property
+    def xys(self):
+        """ The coordinates of each grid, derived from the label grid.
+        """
+        return self.grids.xys
+
+
 # -------------------------- init state --------------------------------------
     def _extract_function_params(self, function_params):
         """ Extract each requirement for all functions as a separate attribute.
@@ -151,6 +223,7 @@ class Plan(object):
             function_params (dict): the requirements for each function
 
         """
+        self.function_params = function_params
         self.functions = list(function_params.keys())  # all functions as a list
         self.n_rooms   = {}  # number of rooms for each function
         self.areas     = {}  # area for each function
@@ -163,8 +236,6 @@ class Plan(object):
 
         self.pr_merge = list(self.pr_merge.values())
         self.n_functions = len(self.functions)
-        self.colors = {f:Visual.CM(i/self.n_functions) for i, f in \
-            enumerate(self.functions)}
 
 
     def _parse_init_state(self, init_state):
@@ -175,26 +246,16 @@ class Plan(object):
 
         """
         self.room_count = 0
-        self.grids = {}
         self.rooms = []
-        self.xys   = []
+        self.dirty = set()
+        self._make_grids_from_coords(
+            [xy for grid_coords in init_state.values() for xy in grid_coords]
+        )
 
         # for each room state namely each function:grid_coords pair in init_state
+        # instantialize this room and add it to self.rooms
         for function, grid_coords in init_state.items():
-            # instantialize this room and add it to self.rooms
-            room = Room(
-                    rid=self.room_count, 
-                    function=function, 
-                    xys=grid_coords
-            )
-            self.rooms.append(room)
-
-            # instantialize the grids from this group of grid coordinates
-            for xy in grid_coords:
-                self.grids[xy] = Grid(xy=xy, rid=self.room_count)
-
-            self.room_count += 1
-            self.xys += grid_coords
+            self._create_room(function, grid_coords)
  
 
     def _random_initialize(self, grid_coords):
@@ -209,17 +270,17 @@ class Plan(object):
 
 
     def _make_grids_from_coords(self, grid_coords):
-        """ Make a fixed dictionary of grid objects keyed by their coordinates
-        from given grid coordinates.
+        """ Make the label grid from given grid coordinates. The grids can 
+        still be retrieved as Grid objects keyed by their coordinates.
         
         Args:
             grid_coords (list): the list of grid coordinates as tuples
 
         """
-        # the coordiates are used as the key for fast retrieval.
-        # the rid are temporarily none and everything else is immutable.
-        self.grids = {coord:Grid(xy=coord, rid=None) for coord in grid_coords}
-        self.xys   = grid_coords
+        # the rid are temporarily -1 and the boundary is immutable.
+        self.grids     = LabelGrid(grid_coords)
+        self.adjacency = Adjacency(self.grids)
+        self.walls     = Walls(self.grids)
 
 
     def _divide_xys_into_rooms(self, ):
@@ -228,58 +289,182 @@ class Plan(object):
         """
         self.rooms      = []
         self.room_count = 0
+        self.dirty      = set()
 
         # divide xys into n groups, n equals to the total number of rooms
-        groups = self._divide_xys(sum(self.n_rooms.values()))
+        n = sum(self.n_rooms.values())
+        if self.seeding == 'grow': groups = self._grow_xys(n)
+        else: groups = self._divide_xys(n, self.seeding)
         
         # for each group, we create a room with function and rid
         for function, n_rooms in self.n_rooms.items():
             for i in range(n_rooms):
-                room = Room(
-                    rid=self.room_count, 
-                    function=function, 
-                    xys=groups[self.room_count]
-                )
-                self.rooms.append(room)
-                # update the rid of xys in this newly created room
-                for xy in room.xys:
-                    self.grids[xy].rid = self.room_count
+                self._create_room(function, groups[self.room_count])
 
-                self.room_count += 1
 
-
-    def _divide_xys(self, n):
-        """ Randomly divide the xys into n continuous groups.
+    def _divide_xys(self, n, seeding='random'):
+        """ Randomly divide the xys into n continuous groups by the l1 version
+        of voronoi diagram. The distances from grids to seeds are computed as 
+        arrays in batches of grids.
         
         Args:
             n (int): number of groups to have
+            seeding (str): the strategy of picking seeds:
+                'random': n random grids.
+                'kmeans++': n grids spread over the plan by k-means++.
+                'area': spread like 'kmeans++' and weighted by the target 
+                    areas of rooms, so the bigger rooms get bigger groups.
 
         Returns:
             groups (list): the list of divided xys groups
 
         """
-        groups = [[] for i in range(n)]
-
-        # randomly pick n xys(points) in plan 
-        xys    = list(self.grids.keys())
-        idx    = random_pick(indices(xys), size=n, replace=False)
-        points = [xys[i] for i in idx]
-
-        # assign each xy to the nearest point(l1 version of voronoi).
-        for xy in xys:
-            dists    = [l1_dist((xy, point)) for point in points]
-            min_dist = min(dists)
-            groups[dists.index(min_dist)].append(xy)
-            
+        coords = self.grids.coords
+        if seeding == 'random':
+            seeds = coords[random_pick(len(coords), size=n, replace=False)]
+        elif seeding in ('kmeans++', 'area'):
+            seeds = self._spread_seeds(n)
+        else:
+            raise ValueError("Unknown seeding: %s" % seeding)
+
+        # the weight of a seed is the radius of the l1 ball of its target area
+        # and it's subtracted from the distances to this seed. Walking from
+        # a grid toward its seed, the weighted distance to its seed drops by 1
+        # each step while the others drop by at most 1, so every group is 
+        # either empty or continuous around its seed. If any group is empty, 
+        # the weights are halved until none is.
+        offsets = np.zeros(n)
+        if seeding == 'area': offsets = np.sqrt(self._room_targets() / 2)
+        while True:
+            labels = self._nearest_seeds(coords, seeds, offsets)
+            if np.bincount(labels, minlength=n).all(): break
+            offsets = np.where(offsets > .5, offsets / 2, 0)
+
+        xys    = self.grids.xys
+        order  = np.argsort(labels, kind='stable')
+        splits = np.cumsum(np.bincount(labels, minlength=n))[:-1]
+
+        return [[xys[i] for i in idx] for idx in np.split(order, splits)]
+
+
+    def _grow_xys(self, n):
+        """ Divide the xys into n continuous groups by growing regions from n
+        seeds spread by k-means++ until each reaches the target area of its
+        room. In each step, the least filled region(area over target) takes 
+        the grid on its frontier closest to its seed. So the regions grow 
+        compact and reach their targets together, and the regions already 
+        over target only grow when no other region can.
+        
+        Args:
+            n (int): number of groups to have
+
+        Returns:
+            groups (list): the list of grown xys groups
+        """
+        grids   = self.grids
+        x0, y0  = grids.origin
+        seeds   = self._spread_seeds(n)
+        targets = self._room_targets()
+
+        # the owner of each grid, -1 for free grids and -2 outside boundary
+        owner  = np.where(grids.inside, -1, -2)
+        groups = [[] for k in range(n)]
+        fronts = [[] for k in range(n)]  # heaps of (distances to seed, x, y)
+        queue  = []  # heap of (filled ratio, k)
+
+        def take(k, x, y):
+            owner[x - x0, y - y0] = k
+            groups[k].append((x, y))
+            sx, sy = seeds[k]
+            for dx, dy in NGBRS:
+                nx, ny = x + dx, y + dy
+                if owner[nx - x0, ny - y0] == -1:
+                    dist = (abs(nx - sx), abs(ny - sy))
+                    heappush(fronts[k], (max(dist), sum(dist), nx, ny))
+
+        seeds = seeds.tolist()
+        for k, (x, y) in enumerate(seeds):
+            take(k, x, y)
+            heappush(queue, (1 / targets[k], k))
+
+        while queue:
+            _, k = heappop(queue)
+            front = fronts[k]
+            # drop the grids taken by other regions since pushed
+            while front and owner[front[0][2] - x0, front[0][3] - y0] != -1:
+                heappop(front)
+            # if the frontier is empty, this region can't grow anymore
+            if not front: continue
+            _, _, x, y = heappop(front)
+            take(k, x, y)
+            heappush(queue, (len(groups[k]) / targets[k], k))
+
+        # the grids not reachable from any seed go to the nearest seed
+        ix, iy = np.nonzero(owner == -1)
+        left   = np.stack([ix + x0, iy + y0], axis=1)
+        labels = self._nearest_seeds(left, np.array(seeds), np.zeros(n))
+        for xy, k in zip(left.tolist(), labels.tolist()):
+            groups[k].append(tuple(xy))
+
         return groups
 
 
+    def _spread_seeds(self, n):
+        """ Pick n seeds spread over the plan like k-means++: the first seed
+        is a random grid, and each next seed is picked with probability
+        proportional to the squared l1 distance to its nearest picked seed.
+
+        Returns:
+            seeds (np.ndarray): the n by 2 array of x's and y's of seeds
+        """
+        coords = self.grids.coords
+        picked = [random_pick(len(coords))]
+        dists  = np.abs(coords - coords[picked[0]]).sum(axis=1).astype(float)
+        for k in range(1, n):
+            pr = dists ** 2
+            picked.append(random_pick(len(coords), p=pr / pr.sum()))
+            dists = np.minimum(dists,
+                np.abs(coords - coords[picked[-1]]).sum(axis=1))
+
+        return coords[picked]
+
+
+    def _nearest_seeds(self, coords, seeds, offsets, batch=4096):
+        """ Find the index of nearest seed of each grid by the l1 distance 
+        minus the offset of seed. The ties go to the first seed.
+
+        Args:
+            coords (np.ndarray): the x's and y's of grids
+            seeds (np.ndarray): the x's and y's of seeds
+            offsets (np.ndarray): the offset of each seed
+            batch (int): the number of grids computed together
+        """
+        labels = np.empty(len(coords), dtype=np.int64)
+        for i in range(0, len(coords), batch):
+            dists = np.abs(coords[i:i + batch, None, :] - seeds[None, :, :])
+            labels[i:i + batch] = (dists.sum(axis=2) - offsets).argmin(axis=1)
+
+        return labels
+
+
+    def _room_targets(self,):
+        """ The target number of grids of each room in the order of creation.
+        The area of a function is shared evenly by its rooms and scaled from
+        the total area of functions to the number of grids in plan.
+        """
+        scale = len(self.grids) / sum(self.areas.values())
+
+        return np.array([self.areas[function] / n_rooms * scale \
+            for function, n_rooms in self.n_rooms.items() \
+            for i in range(n_rooms)])
+
+
     def _find_xy_lims(self,):
         """ Find the bounding x and y values of this plan.
         """
-        xs = [xy[0] for xy in self.xys]
-        ys = [xy[1] for xy in self.xys]
-        return ((min(xs)-1, max(xs)+1), (min(ys)-1, max(ys)+1))
+        min_x, min_y = self.grids.coords.min(axis=0).tolist()
+        max_x, max_y = self.grids.coords.max(axis=0).tolist()
+        return ((min_x-1, max_x+1), (min_y-1, max_y+1))
 
 
 # --------------------------- searching --------------------------------------
@@ -295,60 +480,224 @@ class Plan(object):
 
         """
         # instantialize a transition object to handle actions
-        transition = Transition(silent=self.silent, pr_actions=[1., 0., 0., 0.])
+        transition = Transition(silent=self.silent, pr_actions=[1., 0., 0., 0.],
+            telemetry=self.telemetry)
 
         for i in range(iters):
-            if not self.silent:
-                print("\n\n------------------- Iter: %d --------------------" % i)
+            self.log.debug("------------------- Iter: %d --------------------", i)
             # randomly pick a action with different weighting
             # apply the picked action to picked room and get new state
             action = random_pick(transition.actions, p=transition.pr_actions)
-            if not self.silent:
-                print("\nSelected action:", action)
-            getattr(transition, action)(self)
-            if not self.silent:
-                print("\nRoom states after action:"); self._pprint_rooms()
+            self.log.debug("Selected action: %s", action)
+            transition.apply(self, transition.propose(self, action))
+            self.log.debug("Room states after action:\n%s", 
+                Log.Lazy(self._format_rooms))
             # parse the stats and evaluate the stats
             # plot the plan every 20 iterations
             self._parse()
             self._evaluate()
-            if i % self.plot_freq == 0: self._plot_intermediate(i)
+            if i % self.plot_freq == 0: self._notify(i)
+            if self.telemetry is not None:
+                self.telemetry.step(i, True, self.objective, self.objective)
+
+        self._close_observers()
+
+
+# --------------------------- state ------------------------------------------
+    def get_state(self,):
+        """ Get a compact copy of the plan state, which is the label grid, 
+        the function of each room and the openings of walls.
+
+        Returns:
+            state (dict): {
+                'labels': a copy of the label array,
+                'functions': the function of each rid, None for deleted rooms,
+                'openings': the openings of walls, see Walls.get_openings
+            }
+        """
+        return {
+            'labels':self.grids.labels.copy(),
+            'functions':[None if room is None else room.function \
+                for room in self.rooms],
+            'openings':self.walls.get_openings()
+        }
+
+
+    def set_state(self, state):
+        """ Replace the plan state with a compact copy from get_state. The
+        rooms are rebuilt with their stats counted from the label grid in one
+        pass, and the plan is parsed and evaluated again. The walls are all
+        traced again when asked for, keeping the openings of state, or the
+        current openings if the state has none.
+
+        Args:
+            state (dict): the state to restore
+        """
+        functions = state['functions']
+        self.grids.labels[...] = state['labels']
+        self.grids.reindex()
+        self.adjacency.rebuild()
+        self.room_count = len(functions)
+        self.rooms = [None] * self.room_count
+        self.objective_fn.reset()
+
+        sums, bounds = self.grids.count_moments(self.room_count)
+        for rid, function in enumerate(functions):
+            if function is None: continue
+            room = Room(rid=rid, function=function, grids=self.grids,
+                walls=self.walls)
+            room._reset(sums[rid], bounds[rid])
+            self.rooms[rid] = room
+
+        self.walls.clear(state.get('openings'))
+        self.dirty = set(range(self.room_count))
+        self._parse()
+        self.objective_fn.resum()
+        self._evaluate()
+
+
+    def save(self, path, extra=None):
+        """ Save the plan state with the function params and grid coordinates
+        into a binary plan file. See PlanIO.
+
+        Args:
+            path (str): the path of plan file
+            extra (dict): other JSON-serializable data kept in the file
+        """
+        PlanIO.save_state(path, self.get_state(), self.function_params,
+            self.grids.coords, extra)
 
-        self.plot_fig.ioff()
+
+    @classmethod
+    def load(cls, path, silent=True, mmap=True, **kwargs):
+        """ Build a plan from a binary plan file saved by save.
+
+        Args:
+            path (str): the path of plan file
+            silent (bool): do not log the searching process
+            mmap (bool): memory-map the arrays of file instead of reading
+            kwargs: the other inputs of Plan
+        """
+        plan_file = PlanIO.load_state(path, mmap=mmap)
+
+        return cls(function_params=plan_file['function_params'],
+            grid_coords=plan_file['grid_coords'], state=plan_file['state'],
+            silent=silent, **kwargs)
 
 
 # ----------------------- evaluating methods ---------------------------------
+    @timed('evaluate')
     def _evaluate(self, ):
         """ Evaluate the objective value from stats.
 
         """
-        n_rooms          = self.stats['n_rooms']
-        avg_area         = sum(self.stats['rm_areas']) / n_rooms
-        avg_convex_ratio = sum(self.stats['rm_convex_aspect']) / n_rooms
-        efficiency       = self.stats['pl_space_eff']
-        # the weighting for each term is just assigned randomly for debuging
-        self.objective = 2 * avg_area + 3 * avg_convex_ratio + 4 * efficiency
-        if not self.silent:
-            print("\nObjective Value:", self.objective)
+        # the objective function keeps the running totals of room terms, so
+        # the value is already up to date after parsing.
+        self.objective = self.objective_fn.value
+        self.log.debug("Objective Value: %s", self.objective)
 
 
 # ----------------------- supporting methods ---------------------------------
+    def _create_room(self, function, xys):
+        """ Create a room with given function and xys. The new room takes the
+        room counter as its rid and is appended to self.rooms.
+
+        Args:
+            function (str): the function of new room
+            xys (list): the xys of grids in new room
+
+        Returns:
+            room (Room): the newly created room
+        """
+        room = Room(rid=self.room_count, function=function, grids=self.grids,
+                walls=self.walls)
+        self.rooms.append(room)
+        self.room_count += 1
+        self._assign_xys(xys, room.rid)
+
+        return room
+
+
+    def _assign_xys(self, xys, rid):
+        """ Assign given xys to the room of given rid. The running stats of 
+        the rooms losing and gaining these xys and the adjacency graph are 
+        updated, and those rooms are marked dirty.
+
+        Args:
+            xys (list): the xys changing owner
+            rid (int): the rid of room taking them
+        """
+        xs, ys = np.asarray(xys, dtype=int).reshape(-1, 2).T
+        owners = self.grids.rid_at(xys)
+        for owner in np.unique(owners).tolist():
+            if owner == rid or owner < 0: continue
+            lost = owners == owner
+            self.rooms[owner]._remove_xys(xs[lost], ys[lost])
+            self.dirty.add(owner)
+
+        gained = owners != rid
+        self.adjacency.detach(xys)
+        self.grids.assign(xys, rid)
+        self.adjacency.attach(xys)
+        self.rooms[rid]._add_xys(xs[gained], ys[gained])
+        self.dirty.add(rid)
+
+
+    def _delete_room(self, rid):
+        """ Replace the room of given rid with None. The grids of this room
+        should have been assigned to other rooms already.
+        """
+        self.rooms[rid] = None
+        self.dirty.add(rid)
+
+
+    def _set_function(self, rid, function):
+        """ Change the function of the room of given rid.
+        """
+        self.rooms[rid].function = function
+        self.dirty.add(rid)
+
+
+    def _restore_room(self, room):
+        """ Put a deleted room back to its place in self.rooms. Its grids are 
+        assigned back separately.
+        """
+        self.rooms[room.rid] = room
+        self.dirty.add(room.rid)
+
+
+    def _drop_rooms(self, n):
+        """ Remove the last n rooms created and roll back the room counter. 
+        The grids of these rooms should have been assigned to other rooms.
+        """
+        for i in range(n):
+            self.rooms.pop()
+            self.room_count -= 1
+            self.dirty.add(self.room_count)
+
+
+    @timed('parse')
     def _parse(self,):
-        """ Parse the stats from states.
+        """ Parse the stats from states. Only the rooms changed since last 
+        parsing are parsed again, and their walls are marked stale to be 
+        traced again inside the bounds of them when asked for.
         """
-        rooms = self._purge_room()
-        for room in rooms: room._parse()
-
-        corridors  = [room for room in rooms if room.function == "hall_way"]
-        corr_area  = sum([corr.stats['area'] for corr in corridors])
-        self.stats = {
-            'rm_areas':[room.stats['area'] for room in rooms],
-            'n_rooms':len(rooms),
-            'rm_convex_aspect':[room.stats['convex_aspect'] for room in rooms],
-            'pl_space_eff': 1 - corr_area / self.total_area, 
-        }
-        if not self.silent:
-            print("\nPlan Stats:"); pprint(self.stats)
+        bounds = None
+        for rid in sorted(self.dirty):
+            room = self.rooms[rid] if rid < len(self.rooms) else None
+            if room is None:
+                self.objective_fn.update(rid, None)
+            else:
+                room._parse()
+                self.objective_fn.update(rid, self.objective_fn.room_terms(
+                    room.stats['area'], room.grid_bounds, room.function))
+                bounds = Raster.union_bounds(bounds, room.grid_bounds)
+
+        self.walls.mark(self.dirty, bounds)
+        self.dirty.clear()
+
+        self.stats = self.objective_fn.stats()
+        self.log.debug("Plan Stats:\n%s", Log.Lazy(pformat, self.stats))
 
 
     def _purge_room(self,):
@@ -364,34 +713,36 @@ class Plan(object):
         return random_pick(rooms)
 
 
-    def _plot_intermediate(self, i):
-        """ Plot the plan.
+    def add_observer(self, observer):
+        """ Add an observer notified of the plan state. An observer has the 
+        methods update(plan, i) and close().
+        """
+        self.observers.append(observer)
+
+
+    def _notify(self, i):
+        """ Notify the observers of the plan state.
 
         Args:
             i (int): the iteration
 
         """
-        rooms     = self._purge_room()
-        centers   = [room.stats['center'] for room in rooms]
-        functions = [room.function for room in rooms]
-        patches   = [room.geom for room in rooms]
-        colors    = [self.colors[function] for function in functions]
-            
-        
-        self.plot_fig.plot_plan_intermediate(
-            centers=centers, 
-            functions=functions, 
-            patches=patches, 
-            colors=colors, 
-            title="plan_searching(round %d)" % i
-        )
+        for observer in self.observers: observer.update(self, i)
+
+
+    def _close_observers(self,):
+        """ Close the observers when the random walk or search stops, like
+        waiting for the recorder to render the queued frames.
+        """
+        for observer in self.observers: observer.close()
 
 
-    def _pprint_rooms(self,):
-        """ pprint the states of all rooms in this plan.
+    def _format_rooms(self,):
+        """ Format the states of all rooms in this plan.
         """
         f = lambda x: {'rid':x.rid, 'function':x.function, 'xys':x.xys}
-        pprint(["None" if room is None else f(room) for room in self.rooms])
+        return pformat(["None" if room is None else f(room) \
+            for room in self.rooms])
      
 
 
@@ -0,0 +1,158 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the binary plan file format for
+architectural_plan_generator. A plan file is:
+
+    magic (8 bytes) | version (uint32) | header length (uint32) |
+    JSON header | padding | raw arrays, each aligned to 64 bytes
+
+The header keeps the function params, the function table, the function of
+each room as an index into the table, the openings of walls and the dtype, 
+shape and offset of each array. The arrays are the label grid and the coordinates of grids inside
+boundary in little-endian int32, and any other named arrays like the ones in 
+a search checkpoint, so they can be memory-mapped directly. No pickle is 
+involved.
+
+Author: Xian Lai
+Date: Feb.22, 2018
+"""
+
+
+import os
+import json
+import struct
+import numpy as np
+
+
+MAGIC   = b'APGPLAN\x00'
+VERSION = 1
+ALIGN   = 64  # the alignment of arrays in bytes
+PREAMBLE = struct.Struct('<8sII')  # magic, version, header length
+
+
+# ---------------------------- global functions ------------------------------
+align = lambda n: (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _to_json(obj):
+    """ Convert the numpy scalars in function params into python numbers.
+    """
+    if isinstance(obj, np.generic): return obj.item()
+    raise TypeError("%r is not JSON serializable" % obj)
+
+
+def save_state(path, state, function_params, grid_coords, extra=None,
+        arrays=None):
+    """ Save a plan state into a plan file. The file is written to a temporary
+    file first and then moved onto given path, so an existing file is never
+    left half written.
+
+    Args:
+        path (str): the path of plan file
+        state (dict): the plan state from Plan.get_state
+        function_params (dict): the requirements for each function
+        grid_coords (np.ndarray): the x's and y's of grids inside boundary
+        extra (dict): other JSON-serializable data kept in the header
+        arrays (dict): other named arrays saved in their own dtypes
+    """
+    functions = list(function_params)
+    others = {name:np.ascontiguousarray(array, 
+        dtype=np.asarray(array).dtype.newbyteorder('<')) \
+        for name, array in (arrays or {}).items()}
+    arrays = {
+        'labels':np.ascontiguousarray(state['labels'], dtype='<i4'),
+        'coords':np.ascontiguousarray(grid_coords, dtype='<i4'),
+    }
+    arrays.update(others)
+
+    # the offsets of arrays are relative to the start of data section
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype':array.dtype.str, 'shape':list(array.shape),
+            'offset':offset}
+        offset = align(offset + array.nbytes)
+
+    header = json.dumps({
+        'function_params':function_params,
+        'functions':functions,
+        'rooms':[-1 if function is None else functions.index(function) \
+            for function in state['functions']],
+        'openings':state.get('openings', []),
+        'arrays':layout,
+        'extra':extra or {},
+    }, default=_to_json).encode('utf-8')
+    start = align(PREAMBLE.size + len(header))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(start + layout[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_state(path, mmap=True):
+    """ Load a plan file.
+
+    Args:
+        path (str): the path of plan file
+        mmap (bool): memory-map the arrays read-only instead of reading them
+
+    Returns:
+        plan_file (dict): {
+            'state': the plan state for Plan.set_state,
+            'function_params': the requirements for each function,
+            'grid_coords': the n by 2 array of grids inside boundary,
+            'extra': the other data kept in the header,
+            'arrays': the other named arrays
+        }
+    """
+    with open(path, 'rb') as f:
+        magic, version, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError("Not a plan file: %s" % path)
+        if version > VERSION:
+            raise ValueError("Plan file version %d is newer than %d: %s" % (
+                version, VERSION, path))
+        header = json.loads(f.read(length).decode('utf-8'))
+        start  = align(PREAMBLE.size + length)
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+            if mmap:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r',
+                    offset=start + spec['offset'], shape=shape)
+            else:
+                f.seek(start + spec['offset'])
+                arrays[name] = np.fromfile(f, dtype=dtype,
+                    count=int(np.prod(shape))).reshape(shape)
+
+    functions = header['functions']
+    return {
+        'state':{
+            'labels':arrays['labels'],
+            'functions':[None if i < 0 else functions[i] \
+                for i in header['rooms']],
+            'openings':header.get('openings', [])
+        },
+        'function_params':header['function_params'],
+        'grid_coords':arrays.pop('coords'),
+        'extra':header['extra'],
+        'arrays':{name:array for name, array in arrays.items() \
+            if name != 'labels'},
+    }
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
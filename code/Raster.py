@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the raster geometry functions for
+architectural_plan_generator. The geometry of rooms is fully described by
+the grids they occupy in the label grid, so the stats like area, center and
+bounds are simply counts, coordinate moments and min/max of grids. Shapely
+polygons are only built from the grids when they are asked for.
+
+Author: Xian Lai
+Date: Feb.10, 2018
+"""
+
+
+import numpy as np
+
+
+def moments(xs, ys):
+    """ Find the moments [n, sum of x, sum of y] of given grids.
+
+    Args:
+        xs, ys (np.ndarray): the x's and y's of grids
+    """
+    return [len(xs), int(xs.sum()), int(ys.sum())]
+
+
+def bounds(xs, ys):
+    """ Find the bounds (min_x, min_y, max_x, max_y) of given grids. Return
+    None if there is no grid.
+
+    Args:
+        xs, ys (np.ndarray): the x's and y's of grids
+    """
+    if len(xs) == 0: return None
+
+    return (int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max()))
+
+
+def label_moments(labels, n):
+    """ Find the moments of every label in range(n) in one pass over the
+    label array.
+
+    Args:
+        labels (np.ndarray): the 2d array of labels, negative for no label
+        n (int): the number of labels
+
+    Returns:
+        sums (np.ndarray): the n by 3 array of [n, sum of x, sum of y] in
+            array indices
+    """
+    ix, iy = np.nonzero(labels >= 0)
+    flat   = labels[ix, iy]
+    sums   = [np.bincount(flat, weights=w, minlength=n) for w in (None, ix, iy)]
+
+    return np.stack(sums, axis=1).astype(np.int64)
+
+
+def label_bounds(labels, n):
+    """ Find the bounds of every label in range(n) in one pass over the label
+    array. The labels without grid have bounds of (big, big, -1, -1).
+
+    Args:
+        labels (np.ndarray): the 2d array of labels, negative for no label
+        n (int): the number of labels
+
+    Returns:
+        bounds (np.ndarray): the n by 4 array of (min_x, min_y, max_x, max_y)
+            in array indices
+    """
+    ix, iy = np.nonzero(labels >= 0)
+    flat   = labels[ix, iy]
+    big    = max(labels.shape)
+    bounds = np.tile(np.array([big, big, -1, -1], dtype=np.int64), (n, 1))
+    np.minimum.at(bounds[:, 0], flat, ix)
+    np.minimum.at(bounds[:, 1], flat, iy)
+    np.maximum.at(bounds[:, 2], flat, ix)
+    np.maximum.at(bounds[:, 3], flat, iy)
+
+    return bounds
+
+
+def union_bounds(a, b):
+    """ Find the bounds covering both given bounds. Either of them can be None.
+    """
+    if a is None: return b
+    if b is None: return a
+
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def row_runs(xs, ys):
+    """ Group given grids into runs of consecutive x in each row.
+
+    Args:
+        xs, ys (np.ndarray): the x's and y's of grids
+
+    Returns:
+        runs (np.ndarray): the k by 3 array of (y, start x, end x) of each run
+    """
+    if len(xs) == 0: return np.empty((0, 3), dtype=np.int64)
+    order  = np.lexsort((xs, ys))
+    xs, ys = xs[order], ys[order]
+
+    # a run breaks when y changes or x is not consecutive
+    breaks = np.flatnonzero((np.diff(ys) != 0) | (np.diff(xs) != 1)) + 1
+    starts = np.concatenate([[0], breaks])
+    ends   = np.concatenate([breaks - 1, [len(xs) - 1]])
+
+    return np.stack([ys[starts], xs[starts], xs[ends]], axis=1)
+
+
+def connected_components(xs, ys):
+    """ Label the 4-connected components of given grids. The grids are grouped
+    into row runs first, then the runs overlapping in adjacent rows are joined
+    by union-find. So it's linear in the number of grids and correct for 
+    grids of any shape.
+
+    Args:
+        xs, ys (np.ndarray): the x's and y's of grids
+
+    Returns:
+        labels (np.ndarray): the component index of each given grid
+        n (int): the number of components
+    """
+    if len(xs) == 0: return np.empty(0, dtype=np.int64), 0
+    order  = np.lexsort((xs, ys))
+    sx, sy = xs[order], ys[order]
+
+    # the runs of consecutive x in each row, [start, end) in sorted grids
+    breaks = np.flatnonzero((np.diff(sy) != 0) | (np.diff(sx) != 1)) + 1
+    starts = np.concatenate([[0], breaks])
+    ends   = np.concatenate([breaks, [len(sx)]])
+    run_y  = sy[starts].tolist()
+    run_x0 = sx[starts].tolist()
+    run_x1 = sx[ends - 1].tolist()
+
+    parent = list(range(len(starts)))
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    # walk through the runs row by row. the runs of previous row and current
+    # row are both sorted by x, so the overlapping pairs are found by 2
+    # pointers.
+    prev, curr = (0, 0), (0, 0)
+    for k in range(len(run_y) + 1):
+        if k < len(run_y) and k > curr[0] and run_y[k] == run_y[curr[0]]:
+            continue
+        # the current row ends at k
+        curr = (curr[0], k)
+        if curr[0] > 0 and run_y[prev[0]] == run_y[curr[0]] - 1:
+            i, j = prev
+            m, n = curr
+            while i < j and m < n:
+                if run_x0[i] <= run_x1[m] and run_x0[m] <= run_x1[i]:
+                    parent[find(i)] = find(m)
+                if run_x1[i] < run_x1[m]: i += 1
+                else: m += 1
+        prev, curr = curr, (k, k)
+
+    roots = np.array([find(a) for a in range(len(parent))])
+    _, run_labels = np.unique(roots, return_inverse=True)
+    labels = np.empty(len(xs), dtype=np.int64)
+    labels[order] = np.repeat(run_labels, ends - starts)
+
+    return labels, int(run_labels.max()) + 1
+
+
+def to_polygon(xs, ys, unit=1):
+    """ Build the shapely geometry of given grids. Each grid is a unit square
+    centered at its xy, so the geometry is the union of one box per row run
+    instead of one box per grid.
+
+    Args:
+        xs, ys (np.ndarray): the x's and y's of grids
+        unit (float): the size of grids
+    """
+    from shapely.geometry import box
+    from shapely.ops import unary_union
+
+    h = unit / 2
+    boxes = [box(x0 - h, y - h, x1 + h, y + h) \
+        for y, x0, x1 in row_runs(xs, ys).tolist()]
+
+    return unary_union(boxes)
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the FrameRecorder class for architectural_plan_generator.
+The recorder is a plan observer that only pushes lightweight snapshots of the
+plan state onto a queue. A background thread or process renders them into
+PNG frames, an animated GIF or an MP4 at its own pace, so visualization never
+slows down the searching. The searches notify it every notify_every accepted
+moves and close it when they stop:
+
+    plan.add_observer(FrameRecorder(plan, 'frames', fmt='gif'))
+    SimulatedAnnealing(max_iters=5000, notify_every=50).run(plan)
+
+Author: Xian Lai
+Date: Feb.16, 2018
+"""
+
+
+import os
+import sys
+import queue
+import shutil
+import threading
+import subprocess
+import multiprocessing
+import numpy as np
+
+import Raster
+
+
+# ---------------------------- renderer --------------------------------------
+def _render_frames(frames, out_dir, fmt, functions, fps, dpi):
+    """ Render the snapshots from given queue until receiving None. This is
+    the loop of the background thread or process, so matplotlib is imported
+    here and only the Agg canvas is used. No display backend is touched.
+
+    Args:
+        frames (Queue): the queue of snapshots (i, objective, labels, rids
+            to function indices)
+        out_dir (str): the directory of output files
+        fmt (str): 'png' for frame files, 'gif' or 'mp4' for one animation
+        functions (list): all the functions in plan
+        fps (int): the frames per second of animation
+        dpi (int): the resolution of frames
+    """
+    from matplotlib import colormaps
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    cmap   = colormaps['Spectral']
+    colors = np.array([cmap(i / len(functions)) for i in range(len(functions))]
+        + [(1., 1., 1., 1.)])  # the last color is for grids outside rooms
+    images, ffmpeg = [], None
+
+    while True:
+        frame = frames.get()
+        if frame is None: break
+        i, objective, labels, room_functions = frame
+
+        # color each grid by the function of its room
+        lut = np.append(room_functions, len(functions))
+        img = colors[lut[labels]].transpose(1, 0, 2)
+
+        fig = Figure(figsize=(6, 6), dpi=dpi)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        ax.imshow(img, origin='lower', interpolation='nearest')
+        ax.set_axis_off()
+        ax.set_title("plan_searching(round %d) objective: %.3f" % (i, objective))
+
+        # tag each room with its function at the center of its grids
+        sums = Raster.label_moments(labels, len(room_functions))
+        for rid in np.flatnonzero(sums[:, 0]):
+            n, sum_x, sum_y = sums[rid]
+            ax.text(sum_x / n, sum_y / n, functions[room_functions[rid]],
+                ha='center', va='center', fontsize=8)
+
+        canvas.draw()
+        rgb = np.asarray(canvas.buffer_rgba())[:, :, :3]
+
+        if fmt == 'png':
+            fig.savefig(os.path.join(out_dir, "frame_%06d.png" % i))
+        elif fmt == 'gif':
+            images.append(rgb.copy())
+        elif fmt == 'mp4':
+            if ffmpeg is None: ffmpeg = _open_ffmpeg(out_dir, rgb.shape, fps)
+            ffmpeg.stdin.write(rgb.tobytes())
+
+    if fmt == 'gif' and images:
+        from PIL import Image
+        images = [Image.fromarray(img) for img in images]
+        images[0].save(os.path.join(out_dir, "search.gif"), save_all=True,
+            append_images=images[1:], duration=int(1000 / fps), loop=0)
+    if ffmpeg is not None:
+        ffmpeg.stdin.close()
+        ffmpeg.wait()
+
+
+def _render_guarded(frames, errors, *args):
+    """ Render the snapshots like _render_frames. If the renderer fails,
+    the exception is put onto the errors queue for close to raise it in the
+    searching process.
+
+    Returns:
+        ok (bool): whether the rendering finished
+    """
+    try:
+        _render_frames(frames, *args)
+    except Exception as error:
+        errors.put(error)
+        return False
+
+    return True
+
+
+def _render_process(frames, errors, *args):
+    """ The renderer process. It exits with code 1 if the rendering failed.
+    """
+    if not _render_guarded(frames, errors, *args): sys.exit(1)
+
+
+def _check_format(fmt):
+    """ Check the format is known and the packages and tools it needs are
+    available, so the recorder fails before searching instead of in the
+    renderer.
+    """
+    if fmt not in ('png', 'gif', 'mp4'):
+        raise ValueError("Unknown frame format: %s" % fmt)
+    try:
+        import matplotlib
+        if fmt == 'gif': import PIL
+    except ImportError as error:
+        raise RuntimeError("%s is needed to record %s." % (error.name, fmt))
+    if fmt == 'mp4' and shutil.which('ffmpeg') is None:
+        raise RuntimeError("ffmpeg is needed to record mp4.")
+
+
+def _open_ffmpeg(out_dir, shape, fps):
+    """ Open a ffmpeg process encoding raw rgb frames of given shape into mp4.
+    """
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError("ffmpeg is needed to record mp4.")
+    h, w = shape[:2]
+    cmd  = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo',
+        '-pix_fmt', 'rgb24', '-s', '%dx%d' % (w, h), '-r', str(fps), '-i', '-',
+        '-pix_fmt', 'yuv420p', os.path.join(out_dir, "search.mp4")]
+
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+
+class FrameRecorder(object):
+
+    """
+    The frame recorder class implements a plan observer recording the plan
+    states in the middle of searching. When notified, it only copies the label
+    array and room functions onto a bounded queue. If the renderer falls
+    behind and the queue is full, the frame is dropped instead of waiting.
+    The packages and tools the format needs are checked at initialization,
+    and if the renderer still fails, its exception is raised from close.
+
+    Inputs:
+    -------
+    - plan (Plan): the plan to record
+    - out_dir (str): the directory of output files
+    - fmt (str): 'png' for frame files, 'gif' or 'mp4' for one animation
+    - every (int): record once every given notifications
+    - max_queue (int): the maximal number of snapshots waiting to be rendered
+    - use_process (bool): render in a background process instead of thread
+    - fps (int): the frames per second of animation
+    - dpi (int): the resolution of frames
+
+    Attributes:
+    -----------
+    - stats: {'recorded', 'dropped'} numbers of frames
+
+    Methods:
+    --------
+    - update: Push a snapshot of plan state onto the queue.
+    - close: Wait for the renderer to finish the queued frames and raise
+        its exception if it failed.
+    """
+
+    def __init__(self, plan, out_dir, fmt='png', every=1, max_queue=16,
+            use_process=False, fps=5, dpi=80):
+        """
+        """
+        _check_format(fmt)
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.functions = list(plan.functions)
+        self.every     = every
+        self.n_updates = 0
+        self.stats     = {'recorded':0, 'dropped':0}
+
+        args = (out_dir, fmt, self.functions, fps, dpi)
+        if use_process:
+            self.frames   = multiprocessing.Queue(maxsize=max_queue)
+            self.errors   = multiprocessing.Queue()
+            self.renderer = multiprocessing.Process(target=_render_process,
+                args=(self.frames, self.errors) + args, daemon=True)
+        else:
+            self.frames   = queue.Queue(maxsize=max_queue)
+            self.errors   = queue.Queue()
+            self.renderer = threading.Thread(target=_render_guarded,
+                args=(self.frames, self.errors) + args, daemon=True)
+        self.renderer.start()
+
+
+    def update(self, plan, i):
+        """ Push a snapshot of plan state onto the queue. The functions of
+        rooms are encoded as indices into self.functions, -1 for deleted rooms.
+
+        Args:
+            plan (Plan): the plan to record
+            i (int): the iteration
+        """
+        self.n_updates += 1
+        if (self.n_updates - 1) % self.every: return
+
+        index = {f:k for k, f in enumerate(self.functions)}
+        room_functions = np.array([-1 if room is None else \
+            index[room.function] for room in plan.rooms], dtype=np.int32)
+        frame = (i, plan.objective, plan.grids.labels.copy(), room_functions)
+        try:
+            self.frames.put_nowait(frame)
+            self.stats['recorded'] += 1
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+
+    def close(self,):
+        """ Wait for the renderer to finish the queued frames and write the
+        animation. The end of frames is only waited to be queued while the
+        renderer is alive, so a failed renderer never blocks closing.
+
+        Raises:
+            the exception stopping the renderer, if any
+        """
+        while self.renderer.is_alive():
+            try:
+                self.frames.put(None, timeout=.1)
+                break
+            except queue.Full:
+                continue
+        self.renderer.join()
+
+        # a failed renderer process exits with code 1 after putting its error.
+        # the frames left in its queue are never read, so they are not 
+        # flushed when this process exits.
+        try:
+            if getattr(self.renderer, 'exitcode', 0):
+                self.frames.cancel_join_thread()
+                error = self.errors.get(timeout=1)
+            else:
+                error = self.errors.get_nowait()
+        except queue.Empty:
+            error = None
+        if error is not None: raise error
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
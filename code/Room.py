@@ -2,15 +2,17 @@
 # -*- coding: utf-8 -*-
 """ 
 This script implements the Room class for architectural_plan_generator.
+The stats of rooms are parsed from their grids by the raster functions and 
+the shapely geometry is only built when asked for.
 
 Author: Xian Lai
 Date: Dec.21, 2017
 """
 
 
+import numpy as np
+import Raster
 from Wall import Wall
-from shapely.geometry import Polygon, box
-from shapely.ops import cascaded_union as union
 
 
 flatten = lambda l: list(set([item for sublist in l for item in sublist]))
@@ -29,7 +31,7 @@ def calc_convex_aspect(bounds):
     return max(aspect, 1 / aspect)
 
 
-class Room(Polygon):
+class Room(object):
 
     """
     The room class implements the real-world room objects. It has states 
@@ -39,59 +41,122 @@ class Room(Polygon):
     Inputs:
     -------
     - rid: room id which is its index in main walls list
-    - xys: the indices of grids this room contains
     - function: function of room like hallway, service room, etc.
+    - grids: the LabelGrid of plan. The grids labeled by rid are the grids 
+        this room contains.
+    - walls: the Walls of plan tracing the walls of this room, optional.
     
     Attributes:
     -----------
     - rid: room id
-    - walls: the walls enclosing it.
+    - walls: the walls enclosing it. They are traced by the Walls of plan
+        when asked for.
     - function: room function
+    - grids: the LabelGrid of plan
+    - xys: the xys of grids this room contains. This is a view derived from
+        the label grid.
+    - grid_bounds: the (min_x, min_y, max_x, max_y) of grids in this room.
+        After losing grids on its edge, it is a superset of the real bounds 
+        until the room is parsed again.
+    - sums: the running sums [n, sum of x, sum of y] of grids in this room, 
+        updated every time grids are added or removed.
+    - geom: the shapely polygon of this room. It is built lazily from the 
+        grids when asked for, for example when plotting.
     - stats: a dictionary of its properties:
         {
         'area':0,
         'convexAspect':0.0,
-        'center': the center point of room for adding room tags,
+        'center': the (x, y) of center of room for adding room tags,
         'min_x': minimal x value,
         'max_x': maximal x value,
         'min_y': minimal y value,
         'max_y': maximal y value,
         }
 
+    The attributes are kept in slots instead of an instance dictionary to
+    keep the rooms of many plan replicas small.
+
     Methods:
     --------
     - parse: Parse the geometry and stats of this room given states.
     - find_adjacent_rids: Find the rids of rooms adjacent to this room.
     - find_boundary_xys: Find the xys on boundary(inward) and corresponding 
         outward xys in other rooms.
+    - _add_xys: Update the running sums and bounds with added xys.
+    - _remove_xys: Update the running sums and bounds with removed xys.
+    - preview: Find the area and bounds of this room after given change
+        without applying it.
+    - _reset: Reset the running sums and bounds of this room.
 
     """
 
-    def __init__(self, rid, xys, function):
+    __slots__ = ['rid', 'function', 'grids', 'grid_bounds', 'sums', 'stats',
+        '_walls', '_stale', '_geom']
+
+    def __init__(self, rid, function, grids, walls=None):
         """ 
         """
-        self.rid       = rid
-        self.xys       = xys
-        self.function  = function
-        self._parse()
+        self.rid         = rid
+        self.function    = function
+        self.grids       = grids
+        self._walls      = walls
+        self.grid_bounds = None
+        self.sums        = [0, 0, 0]
+        self._stale      = False
+        self._geom       = None
+
+
+    @property
+    def xys(self):
+        """ The xys of grids in this room derived from the label grid.
+        """
+        return self.grids.find_xys(self.rid, self.grid_bounds)
+
+
+    @property
+    def walls(self):
+        """ The walls enclosing this room, traced again if stale.
+        """
+        if self._walls is None: return []
+        return self._walls.of(self.rid)
+
+
+    @property
+    def geom(self):
+        """ The shapely polygon of this room. It's built from the grids only
+        when asked for and cached until this room changes.
+        """
+        if self._geom is None:
+            xs, ys = self.grids.find_grids(self.rid, self.grid_bounds)
+            self._geom = Raster.to_polygon(xs, ys)
+
+        return self._geom
         
 
     def _parse(self, ):
-        """ Parse the geometry and stats of this room given states
+        """ Parse the geometry and stats of this room given states. The area
+        and center come from the running sums. The bounds are only rescanned
+        inside the old bounds when this room lost grids on its edge.
         """
-        # init each grid in this room as a box and union them as a polygon
-        init_box = lambda xy: box(xy[0]-0.5, xy[1]-0.5, xy[0]+0.5, xy[1]+0.5)
-        self.geom  = union([init_box(xy) for xy in self.xys])
-
-        # parse the stats based on the polygon geometry of this room
+        if self._stale:
+            self.grid_bounds = self.grids.find_bounds(self.rid, self.grid_bounds)
+            self._stale = False
+
+        # parse the stats based on the running sums and bounds of this room.
+        # the bounds of geometry are the bounds of grid centers +/- 0.5.
+        n, sum_x, sum_y = self.sums
+        bounds = (
+            self.grid_bounds[0] - 0.5, self.grid_bounds[1] - 0.5, 
+            self.grid_bounds[2] + 0.5, self.grid_bounds[3] + 0.5
+        )
         self.stats = {
-            'area':self.geom.area,
-            'center':self.geom.centroid,
-            'convex_aspect':calc_convex_aspect(self.geom.bounds),
-            'min_x':self.geom.bounds[0],
-            'max_x':self.geom.bounds[2],
-            'min_y':self.geom.bounds[1],
-            'max_y':self.geom.bounds[3]
+            'area':n,
+            'center':(sum_x / n, sum_y / n),
+            'convex_aspect':calc_convex_aspect(bounds),
+            'min_x':bounds[0],
+            'max_x':bounds[2],
+            'min_y':bounds[1],
+            'max_y':bounds[3]
         }
 
 
@@ -99,56 +164,104 @@ class Room(Polygon):
         """ Find the rids of rooms adjacent to this room.
 
         Args:
-            grids (dict): the grids of the whole plan
+            grids (LabelGrid): the grids of the whole plan
 
         Returns: 
             the rids of adjacent rooms as a list
         """
-        # find all outward xys of this room
-        _, outward_xys = self.find_boundary_xys(grids)
+        return grids.find_adjacent_rids(self.rid, self.grid_bounds)
 
-        # the adjacent rids are the list of rid for each outward xy
-        adjacent_rids = []
-        for xy in flatten(outward_xys):
-            if grids[xy].rid not in adjacent_rids:
-                adjacent_rids.append(grids[xy].rid)
 
-        return adjacent_rids
-
-
-    def find_boundary_xys(self, global_xys):
+    def find_boundary_xys(self, grids):
         """ Find the xys on boundary(inward) and corresponding outward xys in
         other rooms.
 
         Args: 
-            global_xys (list): the xys of the whole plan
+            grids (LabelGrid): the grids of the whole plan
 
         Returns:
             boundary_xys (list): the xys on boundary(inward)
             outward_xys (list): corresponding outward xys in other rooms
         """
-        boundary_xys = []
-        outward_xys  = []
-    
-        # for each xy in this room
-        for xy in self.xys:
-            # find the neighbor xys of this xy
-            ngbrs = [
-                (xy[0] - 1, xy[1]), (xy[0] + 1, xy[1]),
-                (xy[0], xy[1] + 1), (xy[0], xy[1] - 1)
-            ]
-            # the outward neighbor xys are the ones not in this room but not 
-            # out of the boundary of plan
-            outward_ngbrs = [ngbr for ngbr in ngbrs \
-                if (ngbr not in self.xys) and (ngbr in global_xys)]
-            
-            # if there is outward neighbor xys for this xy, then this xy is on
-            # boundary and we record the corresponding outward xys in a list
-            if len(outward_ngbrs) > 0:
-                boundary_xys.append(xy)
-                outward_xys.append(outward_ngbrs)
-
-        return boundary_xys, outward_xys
+        return grids.find_boundary_xys(self.rid)
+
+
+    def _add_xys(self, xs, ys):
+        """ Update the running sums with the xys newly assigned to this room 
+        and widen the bounds to include them, so the views derived from the 
+        label grid are complete before the room is parsed again.
+
+        Args:
+            xs, ys (np.ndarray): the x's and y's of added grids
+        """
+        if len(xs) == 0: return
+        self.sums  = [a + b for a, b in zip(self.sums, Raster.moments(xs, ys))]
+        self._geom = None
+
+        self.grid_bounds = Raster.union_bounds(
+            self.grid_bounds, Raster.bounds(xs, ys))
+
+
+    def _remove_xys(self, xs, ys):
+        """ Update the running sums with the xys taken away from this room. If
+        any of them is on the edge of bounds, the bounds are marked stale and 
+        will be rescanned when parsing.
+
+        Args:
+            xs, ys (np.ndarray): the x's and y's of removed grids
+        """
+        if len(xs) == 0: return
+        self.sums  = [a - b for a, b in zip(self.sums, Raster.moments(xs, ys))]
+        self._geom = None
+
+        if self._on_edge(xs, ys): self._stale = True
+
+
+    def _reset(self, sums, bounds):
+        """ Reset the running sums and bounds of this room, for example when 
+        the whole label grid is replaced.
+
+        Args:
+            sums (list): the moments [n, sum of x, sum of y] of grids
+            bounds (tuple): the (min_x, min_y, max_x, max_y) of grids
+        """
+        self.sums        = [int(v) for v in sums]
+        self.grid_bounds = tuple(int(v) for v in bounds)
+        self._stale      = False
+        self._geom       = None
+
+
+    def _on_edge(self, xs, ys):
+        """ Whether any of given grids is on the edge of bounds of this room.
+        """
+        min_x, min_y, max_x, max_y = self.grid_bounds
+
+        return bool(xs.min() == min_x or xs.max() == max_x or \
+            ys.min() == min_y or ys.max() == max_y)
+
+
+    def preview(self, xs_add, ys_add, xs_rm, ys_rm):
+        """ Find the area and bounds of this room if given grids are added to 
+        and removed from it, without changing anything. The bounds are only
+        rescanned when removed grids are on the edge of bounds.
+
+        Args:
+            xs_add, ys_add (np.ndarray): the x's and y's of grids to add
+            xs_rm, ys_rm (np.ndarray): the x's and y's of grids to remove
+
+        Returns:
+            area (int): the number of grids after change
+            bounds (tuple): the bounds of grids after change
+        """
+        area   = self.sums[0] + len(xs_add) - len(xs_rm)
+        bounds = self.grid_bounds
+        if len(xs_rm) > 0 and self._on_edge(xs_rm, ys_rm):
+            xs, ys = self.grids.find_grids(self.rid, bounds)
+            key    = lambda xs, ys: xs * (1 << 20) + ys
+            kept   = ~np.isin(key(xs, ys), key(xs_rm, ys_rm))
+            bounds = Raster.bounds(xs[kept], ys[kept])
+
+        return area, Raster.union_bounds(bounds, Raster.bounds(xs_add, ys_add))
 
 
 
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the adaptive action schedulers for
+architectural_plan_generator. Instead of the fixed pr_actions of Transition,
+a scheduler learns which actions pay off on the plan being searched: the
+reward of a step is the improvement of objective value per second of CPU
+time spent on it, so the cheap but unproductive actions and the productive
+but expensive ones are weighed against each other.
+
+Note the rewards depend on timing, so a search with a scheduler doesn't take
+exactly the same steps when repeated with the same seed.
+
+Author: Xian Lai
+Date: Feb.27, 2018
+"""
+
+
+from math import log
+import numpy as np
+from numpy.random import choice as random_pick
+
+
+class Scheduler(object):
+
+    """
+    The scheduler class implements the common parts of adaptive action
+    schedulers: the running quality of each action and the bookkeeping of
+    the action picked last. The children classes implement picking and
+    updating the weights.
+
+    Inputs:
+    -------
+    - actions (list): the names of actions to pick from
+    - alpha (float): the step size of running quality. The larger, the faster
+        the old rewards are forgotten.
+
+    Attributes:
+    -----------
+    - quality: the running average reward of each action
+    - counts: the number of times each action is picked
+    - probs: the current probability of picking each action
+    - weights: the probabilities keyed by the names of actions
+    - action: the action picked last
+    - picked: whether an action is picked and not rewarded yet
+
+    Methods:
+    --------
+    - pick: Pick an action.
+    - update: Update by the reward of the action picked last. Each pick is
+        rewarded once.
+    - get_state: Get the learned state to save in checkpoints.
+    - set_state: Restore the learned state.
+    """
+
+    def __init__(self, actions=('expand', 'swap', 'split', 'merge'),
+            alpha=.1):
+        """
+        """
+        self.actions = list(actions)
+        self.alpha   = alpha
+        self.quality = np.zeros(len(actions))
+        self.counts  = np.zeros(len(actions), dtype=int)
+        self.probs   = np.full(len(actions), 1. / len(actions))
+        self.action  = None
+        self._k      = None
+
+
+    @property
+    def picked(self):
+        """ Whether an action is picked and not rewarded yet.
+        """
+        return self._k is not None
+
+
+    @property
+    def weights(self):
+        """ The current probability of picking each action keyed by name.
+        """
+        return dict(zip(self.actions, self.probs.tolist()))
+
+
+    def pick(self,):
+        """ Pick an action by current probabilities.
+
+        Returns:
+            action (str): the name of picked action
+        """
+        self._k = random_pick(len(self.actions), p=self.probs)
+        self.action = self.actions[self._k]
+
+        return self.action
+
+
+    def update(self, reward):
+        """ Update the quality and probabilities by the reward of the action
+        picked last.
+
+        Args:
+            reward (float): the improvement of objective value per CPU second
+        """
+        k, self._k = self._k, None
+        self.counts[k] += 1
+        self.quality[k] += self.alpha * (reward - self.quality[k])
+        self._update_probs()
+
+
+    def _update_probs(self,):
+        """ Update the probabilities from the qualities.
+        """
+        raise NotImplementedError
+
+
+    def get_state(self,):
+        """ Get the learned state as a JSON-serializable dictionary.
+        """
+        return {'quality':self.quality.tolist(), 'counts':self.counts.tolist(),
+            'probs':self.probs.tolist()}
+
+
+    def set_state(self, state):
+        """ Restore the learned state from get_state.
+        """
+        self.quality = np.array(state['quality'], dtype=float)
+        self.counts  = np.array(state['counts'], dtype=int)
+        self.probs   = np.array(state['probs'], dtype=float)
+
+
+
+class AdaptivePursuit(Scheduler):
+
+    """
+    The adaptive pursuit scheduler moves the probability of the action with
+    best quality towards p_max and the others towards p_min by rate beta.
+    Only the ranking of qualities matters, so the scale of rewards doesn't.
+
+    Inputs:
+    -------
+    - p_min (float): the least probability of any action, so every action
+        keeps being tried as the plan changes.
+    - beta (float): the learning rate of probabilities
+    - the inputs of Scheduler
+    """
+
+    def __init__(self, actions=('expand', 'swap', 'split', 'merge'),
+            alpha=.1, beta=.1, p_min=.05):
+        """
+        """
+        Scheduler.__init__(self, actions, alpha)
+        self.beta  = beta
+        self.p_min = p_min
+        self.p_max = 1 - (len(self.actions) - 1) * p_min
+
+
+    def _update_probs(self,):
+        """ Pursue the action with best quality. Nothing is pursued before
+        any action pays off.
+        """
+        if not self.quality.any(): return
+        target = np.full(len(self.actions), self.p_min)
+        target[np.argmax(self.quality)] = self.p_max
+        self.probs += self.beta * (target - self.probs)
+        self.probs /= self.probs.sum()
+
+
+
+class UCB(Scheduler):
+
+    """
+    The UCB scheduler picks the action with the highest upper confidence
+    bound of its quality. The qualities are normalized by the best one, so 
+    the scale of rewards doesn't matter. Every action is picked once first.
+    The quality is the average of all rewards unless alpha is given. The 
+    probabilities reported are the fractions of picks.
+
+    Inputs:
+    -------
+    - c (float): the weight of exploration
+    - the inputs of Scheduler
+    """
+
+    def __init__(self, actions=('expand', 'swap', 'split', 'merge'),
+            alpha=None, c=.5):
+        """
+        """
+        Scheduler.__init__(self, actions, alpha)
+        self.c = c
+
+
+    def pick(self,):
+        """ Pick the action with the highest upper confidence bound.
+        """
+        if self.counts.min() == 0:
+            self._k = int(np.argmin(self.counts))
+        else:
+            best   = self.quality.max()
+            bounds = (self.quality / best if best > 0 else self.quality) + \
+                self.c * np.sqrt(log(self.counts.sum()) / self.counts)
+            self._k = int(np.argmax(bounds))
+        self.action = self.actions[self._k]
+
+        return self.action
+
+
+    def update(self, reward):
+        """ Update the quality by the reward, as a running average if alpha
+        is given or else the average of all rewards.
+        """
+        if self.alpha is not None: return Scheduler.update(self, reward)
+
+        k, self._k = self._k, None
+        self.counts[k] += 1
+        self.quality[k] += (reward - self.quality[k]) / self.counts[k]
+        self._update_probs()
+
+
+    def _update_probs(self,):
+        """ The probabilities are the fractions of picks.
+        """
+        self.probs = self.counts / self.counts.sum()
+
+
+
+SCHEDULERS = {
+    'pursuit':AdaptivePursuit,
+    'ucb':UCB,
+}
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,571 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the searching classes for architectural_plan_generator.
+The searches change the plan state by the moves proposed by Transition and
+are directed by the objective value of Plan. They run without plotting and
+report the throughput in iterations per second. A long search can write 
+checkpoints periodically and be resumed from the last one.
+
+Besides simulated annealing over random proposals, the tabu search and the
+steepest descent scan the whole neighborhood of the plan every step and
+commit the best move, see Neighborhood.py.
+
+Author: Xian Lai
+Date: Feb.12, 2018
+"""
+
+
+import time
+from time import process_time
+from math import exp, log
+import numpy as np
+from numpy.random import random as random_uniform
+
+import Log
+import PlanIO
+from Plan import Plan
+from Transition import Transition
+from Scheduler import SCHEDULERS
+from Neighborhood import Neighborhood, ACTIONS, EXPAND, MERGE
+from Telemetry import timed
+
+
+# ---------------------------- cooling schedules -----------------------------
+# each schedule maps (iteration, progress in the budget from 0 to 1) to the
+# temperature.
+def exponential_cooling(t0=1., alpha=0.999):
+    """ T = t0 * alpha ^ i
+    """
+    return lambda i, progress: t0 * alpha ** i
+
+
+def linear_cooling(t0=1., t_min=1e-3):
+    """ T goes linearly from t0 down to t_min over the budget.
+    """
+    return lambda i, progress: t0 - (t0 - t_min) * min(progress, 1.)
+
+
+def logarithmic_cooling(t0=1.):
+    """ T = t0 / log(i + 2)
+    """
+    return lambda i, progress: t0 / log(i + 2)
+
+
+COOLING = {
+    'exponential':exponential_cooling,
+    'linear':linear_cooling,
+    'logarithmic':logarithmic_cooling,
+}
+
+
+class Search(object):
+
+    """
+    The search class implements the common parts of searching algorithms: the
+    iteration and time budgets, the early stopping by objective threshold and
+    the best-so-far plan state. The children classes implement the step.
+
+    Inputs:
+    -------
+    - transition (Transition): the transition model proposing moves. If not
+        given, a Transition is built from pr_actions and scheduler. If it has
+        a scheduler, the scheduler is rewarded after every step it picks the
+        action of, by the improvement of objective value per CPU second of
+        this step.
+    - pr_actions (list): the probabilities of actions of the Transition 
+        built when no transition is given. Default is all 4 actions equally
+        weighted.
+    - scheduler (Scheduler or str): the scheduler of the Transition built 
+        when no transition is given, or the name of one in SCHEDULERS.
+    - max_iters (int): stop after given iterations
+    - max_time (float): stop after given seconds
+    - threshold (float): stop when the objective value reaches it
+    - silent (bool): do not log the searching process. If False, the 
+        progress is logged at the level of 'search' set by Log.configure or
+        --log-level, see Log.
+    - checkpoint (str): the path of checkpoint file. If given, a checkpoint
+        is written every checkpoint_every iterations and when stopping.
+    - checkpoint_every (int): the iterations between checkpoints
+    - telemetry (Telemetry): records every step and times the phases of
+        each action if given. It's attached to the plan and transition when
+        running. See Telemetry.
+    - notify_every (int): notify the observers of plan, like FrameRecorder
+        or the plotter of Plan(plot=True), once every given accepted moves.
+        Default is plan.plot_freq. The observers are closed when the search
+        stops.
+
+    Attributes:
+    -----------
+    - best_state: the plan state with best objective value so far
+    - best_objective: the best objective value so far
+    - stats: a dictionary of properties of last run:
+        {
+            'iters': number of iterations,
+            'accepted': number of accepted moves,
+            'elapsed': running time in seconds,
+            'iters_per_sec': iterations per second,
+            'best_objective': the best objective value,
+            'stop': the reason of stopping
+        }
+    - stopped: the reason of stopping set by a step, like 'local_optimum'
+
+    Methods:
+    --------
+    - run: Search from the current state of given plan.
+    - resume: Resume the search from a checkpoint file.
+    - save_checkpoint: Write a checkpoint of the search and plan.
+    - _loop: Take steps until stopping.
+    - _step: Take one step of search. Implemented by children classes.
+    - _progress: The fraction of budget used.
+    - _stop_reason: Check the budgets, threshold and the stopping by steps.
+    """
+
+    def __init__(self, transition=None, max_iters=1000, max_time=None,
+            threshold=None, silent=True, checkpoint=None, 
+            checkpoint_every=1000, telemetry=None, pr_actions=None,
+            scheduler=None, notify_every=None):
+        """
+        """
+        if transition is None:
+            if isinstance(scheduler, str): scheduler = SCHEDULERS[scheduler]()
+            transition = Transition(silent=True, scheduler=scheduler,
+                pr_actions=[.25] * 4 if pr_actions is None else pr_actions)
+        elif pr_actions is not None or scheduler is not None:
+            raise ValueError("pr_actions and scheduler are set on the "
+                "transition when a transition is given.")
+        self.transition = transition
+        self.max_iters  = max_iters
+        self.max_time   = max_time
+        self.threshold  = threshold
+        self.silent     = silent
+        self.log        = Log.get_logger('search', silent)
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.telemetry  = telemetry
+        self.notify_every = notify_every
+
+
+    def run(self, plan):
+        """ Search from the current state of given plan. The plan is left in
+        its last state and the best state is kept in self.best_state.
+
+        Args:
+            plan (Plan): the plan to search on
+
+        Returns:
+            best_objective (float): the best objective value found
+        """
+        self.best_state     = plan.get_state()
+        self.best_objective = plan.objective
+        self.i, self.accepted = 0, 0
+        self.start = time.time()
+        self._checkpointed = None
+
+        return self._loop(plan)
+
+
+    def resume(self, path):
+        """ Resume the search from a checkpoint file written by this kind of
+        search with the same settings. The plan, the best state, the counters,
+        the weights learned by the scheduler and the random state are 
+        restored and the search continues exactly where the checkpoint was 
+        written, as long as the budgets are given in iterations and there is
+        no scheduler, whose rewards depend on timing.
+
+        Args:
+            path (str): the path of checkpoint file
+
+        Returns:
+            plan (Plan): the plan searched to the end. The best state and 
+                objective are kept in self.best_state and self.best_objective.
+        """
+        checkpoint = PlanIO.load_state(path, mmap=False)
+        extra, arrays = checkpoint['extra'], checkpoint['arrays']
+        plan = Plan(function_params=checkpoint['function_params'],
+            grid_coords=checkpoint['grid_coords'], state=checkpoint['state'],
+            silent=True)
+
+        self.i        = extra['i']
+        self.accepted = extra['accepted']
+        self.start    = time.time() - extra['elapsed']
+        self.best_objective = extra['best_objective']
+        self.best_state     = {
+            'labels':arrays['best_labels'],
+            'functions':extra['best_functions']
+        }
+        rng = extra['rng']
+        np.random.set_state((rng['name'], arrays['rng_keys'], rng['pos'],
+            rng['has_gauss'], rng['cached_gaussian']))
+        if self.transition.scheduler is not None and 'scheduler' in extra:
+            self.transition.scheduler.set_state(extra['scheduler'])
+        self._checkpointed = self.i
+        self._loop(plan)
+
+        return plan
+
+
+    def save_checkpoint(self, plan):
+        """ Write a checkpoint of the search and the plan it's running on. The
+        objective totals of plan are summed again exactly first, as they are
+        when the plan is rebuilt from the checkpoint, so the search from here
+        takes exactly the same steps as a search resumed from this 
+        checkpoint. The plan is not changed otherwise. The file is replaced
+        atomically, see PlanIO.
+
+        Args:
+            plan (Plan): the plan of this search
+        """
+        plan.objective_fn.resum()
+        plan._evaluate()
+        state = plan.get_state()
+        name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+        extra = {
+            'i':self.i,
+            'accepted':self.accepted,
+            'elapsed':time.time() - self.start,
+            'best_objective':self.best_objective,
+            'best_functions':self.best_state['functions'],
+            'rng':{'name':name, 'pos':pos, 'has_gauss':has_gauss, 
+                'cached_gaussian':cached_gaussian},
+        }
+        if self.transition.scheduler is not None:
+            extra['scheduler'] = self.transition.scheduler.get_state()
+        arrays = {'best_labels':self.best_state['labels'], 'rng_keys':keys}
+        PlanIO.save_state(self.checkpoint, state, plan.function_params,
+            plan.grids.coords, extra, arrays)
+        self._checkpointed = self.i
+
+
+    def _loop(self, plan):
+        """ Take steps until stopping, writing checkpoints and notifying the
+        observers of plan if asked for. The observers are closed when 
+        stopping, even by an error.
+
+        Returns:
+            best_objective (float): the best objective value found
+        """
+        telemetry = self.telemetry
+        scheduler = self.transition.scheduler
+        notify_every = self.notify_every or plan.plot_freq
+        if telemetry is not None: telemetry.attach(plan, self.transition)
+        self.stopped = None
+        try:
+            while True:
+                if self.checkpoint and self.i % self.checkpoint_every == 0 \
+                        and self.i != self._checkpointed:
+                    self.save_checkpoint(plan)
+                reason = self._stop_reason()
+                if reason: break
+                if scheduler is not None: 
+                    objective, cpu = plan.objective, process_time()
+                accepted = self._step(plan, self.i)
+                if scheduler is not None and scheduler.picked:
+                    scheduler.update(max(plan.objective - objective, 0.) / \
+                        max(process_time() - cpu, 1e-6))
+                if accepted:
+                    self.accepted += 1
+                    if plan.objective > self.best_objective:
+                        self.best_objective = plan.objective
+                        self.best_state     = plan.get_state()
+                    if plan.observers and \
+                            self.accepted % notify_every == 0:
+                        plan._notify(self.i)
+                if telemetry is not None:
+                    telemetry.step(self.i, accepted, plan.objective, 
+                        self.best_objective, scheduler and scheduler.weights)
+                self.i += 1
+        finally:
+            plan._close_observers()
+
+        elapsed = time.time() - self.start
+        self.stats = {
+            'iters':self.i,
+            'accepted':self.accepted,
+            'elapsed':elapsed,
+            'iters_per_sec':self.i / elapsed if elapsed > 0 else float('inf'),
+            'best_objective':self.best_objective,
+            'stop':reason
+        }
+        if self.checkpoint and self.i != self._checkpointed:
+            self.save_checkpoint(plan)
+        self.log.info("%d iters in %.2fs (%.1f iters/s), best objective: %s",
+            self.i, elapsed, self.stats['iters_per_sec'], self.best_objective)
+
+        return self.best_objective
+
+
+    def _step(self, plan, i):
+        """ Take one step of search. Return whether a move is accepted.
+        """
+        raise NotImplementedError
+
+
+    def _progress(self,):
+        """ The fraction of budget used, the larger one of iterations and time.
+        """
+        progress = 0.
+        if self.max_iters: progress = self.i / self.max_iters
+        if self.max_time:
+            progress = max(progress, (time.time() - self.start) / self.max_time)
+
+        return progress
+
+
+    def _stop_reason(self,):
+        """ Check the budgets and threshold. Return the reason of stopping or
+        None to continue.
+        """
+        if self.stopped: return self.stopped
+        if self.threshold is not None and self.best_objective >= self.threshold:
+            return 'threshold'
+        if self.max_iters is not None and self.i >= self.max_iters:
+            return 'max_iters'
+        if self.max_time is not None and time.time() - self.start >= self.max_time:
+            return 'max_time'
+
+        return None
+
+
+
+class SimulatedAnnealing(Search):
+
+    """
+    The simulated annealing class implements the searching by simulated
+    annealing. Each step proposes a move, scores it from its delta without
+    applying, and accepts it if it improves the objective value or with
+    probability exp(delta / T) otherwise. Only accepted moves are applied.
+
+    Inputs:
+    -------
+    - schedule: the cooling schedule mapping (iteration, progress) to
+        temperature, or the name of one in COOLING.
+    - the inputs of Search
+
+    Attributes:
+    -----------
+    - temperature: the temperature of last step
+    - the attributes of Search
+
+    Methods:
+    --------
+    - _step: Propose, score and maybe apply a move.
+    - _accept: Metropolis acceptance rule.
+    """
+
+    def __init__(self, schedule='exponential', **kwargs):
+        """
+        """
+        Search.__init__(self, **kwargs)
+        if isinstance(schedule, str): schedule = COOLING[schedule]()
+        self.schedule    = schedule
+        self.temperature = None
+
+
+    def _step(self, plan, i):
+        """ Propose, score and maybe apply a move.
+        """
+        self.temperature = self.schedule(i, self._progress())
+        move = self.transition.propose(plan)
+        if move is None: return False
+
+        delta = self.transition.score(plan, move)
+        if not self._accept(delta, self.temperature): return False
+
+        self.transition.apply(plan, move)
+        plan._parse()
+        plan._evaluate()
+
+        return True
+
+
+    @staticmethod
+    def _accept(delta, temperature):
+        """ Accept improving moves, and worsening moves with probability
+        exp(delta / temperature).
+        """
+        if delta >= 0: return True
+        if temperature <= 0: return False
+
+        return random_uniform() < exp(delta / temperature)
+
+
+class TabuSearch(Search):
+
+    """
+    The tabu search class implements the searching by scanning the whole 
+    neighborhood of the plan every step: every single-wall expand, every 
+    split line and every merge is scored in one batch by Neighborhood, the
+    best ones are made into moves and scored exactly by Transition, and the
+    best non-tabu move is committed even if it's worse than the current one.
+
+    The grids changing owner in an expand and the rooms created by a move are
+    tabu for tenure steps: the grids can't be expanded over and the rooms
+    can't be split or merged. A tabu move is still allowed if it leads to a
+    better objective value than the best so far.
+
+    Inputs:
+    -------
+    - tenure (int): the steps a changed grid or a new room stays tabu
+    - n_exact (int): the number of best moves by batch score to be scored
+        exactly before committing. The batch score is only approximate for
+        moves breaking a room into more than 2 pieces.
+    - actions (tuple): the actions in neighborhood, see Neighborhood.ACTIONS
+    - the inputs of Search
+
+    Attributes:
+    -----------
+    - neighborhood: the neighborhood scanned in last step
+    - the attributes of Search
+
+    Methods:
+    --------
+    - run: Search from the current state of given plan with empty tabu list.
+    - _step: Scan the neighborhood and commit the best admissible move.
+    - _scan: Enumerate and batch score the neighborhood.
+    - _tabu: Find the tabu moves in the neighborhood.
+    - _make_tabu: Make the grids and rooms of a committed move tabu.
+    """
+
+    def __init__(self, tenure=10, n_exact=8, actions=ACTIONS, **kwargs):
+        """
+        """
+        Search.__init__(self, **kwargs)
+        self.tenure  = tenure
+        self.n_exact = n_exact
+        self.actions = actions
+        self.neighborhood = None
+        self._grid_until  = None
+        self._room_until  = {}
+
+
+    def run(self, plan):
+        """ Search from the current state of given plan with empty tabu list.
+        """
+        self._grid_until = None
+        self._room_until = {}
+
+        return Search.run(self, plan)
+
+
+    def _step(self, plan, i):
+        """ Scan the neighborhood and commit the best admissible move.
+        """
+        if self._grid_until is None or \
+                self._grid_until.shape != plan.grids.labels.shape:
+            self._grid_until = np.full(plan.grids.labels.shape, -1)
+        nb = self.neighborhood = self._scan(plan)
+
+        # the tabu moves are admissible only if leading to the best objective
+        # value so far
+        tabu  = self._tabu(nb, i)
+        admit = ~tabu | (plan.objective + nb.scores > self.best_objective)
+        ks    = np.flatnonzero(admit)
+        ks    = ks[np.argsort(-nb.scores[ks], kind='stable')][:self.n_exact]
+
+        best_move, best_delta = None, -np.inf
+        for k in ks.tolist():
+            move  = nb.move(k, self.transition)
+            delta = self.transition.score(plan, move)
+            if tabu[k] and plan.objective + delta <= self.best_objective:
+                continue
+            if delta > best_delta: best_move, best_delta = move, delta
+
+        if best_move is None:
+            self.stopped = 'no_moves'
+            return False
+        if not self._accept(best_delta): return False
+
+        self.transition.apply(plan, best_move)
+        plan._parse()
+        plan._evaluate()
+        self._make_tabu(plan, best_move, i)
+
+        return True
+
+
+    def _accept(self, delta):
+        """ The best admissible move is always committed.
+        """
+        return True
+
+
+    @timed('propose')
+    def _scan(self, plan):
+        """ Enumerate and batch score the neighborhood. Its time is counted as
+        the action 'neighborhood' in telemetry.
+        """
+        if self.telemetry is not None: self.telemetry.action = 'neighborhood'
+
+        return Neighborhood(plan, self.actions)
+
+
+    def _tabu(self, nb, i):
+        """ Find the tabu moves in the neighborhood: the expands taking tabu
+        grids and the splits and merges of tabu rooms.
+
+        Returns:
+            tabu (np.ndarray): whether each move is tabu
+        """
+        tabu = nb.expand_max(self._grid_until) >= i
+        if self._room_until:
+            rids  = [rid for rid, step in self._room_until.items() if step >= i]
+            rooms = nb.kinds != EXPAND
+            tabu[rooms] = np.isin(nb.rids[rooms], rids)
+            merge = nb.kinds == MERGE
+            tabu[merge] |= np.isin(nb.others[merge], rids)
+
+        return tabu
+
+
+    def _make_tabu(self, plan, move, i):
+        """ Make the grids changing owner in an expand and the rooms created 
+        by given move tabu for tenure steps.
+        """
+        if self.tenure <= 0: return
+        if move.action == 'expand':
+            self._grid_until[plan.grids.to_indices(move.xys)] = i + self.tenure
+        self._room_until = {rid:step for rid, step in \
+            self._room_until.items() if step >= i}
+        for rid in move.created: self._room_until[rid] = i + self.tenure
+
+
+
+class SteepestDescent(TabuSearch):
+
+    """
+    The steepest descent class implements the searching by committing the
+    best move of the whole neighborhood every step, as long as it improves
+    the objective value. It stops at the local optimum. Nothing is tabu.
+
+    Inputs:
+    -------
+    - n_exact (int): the number of best moves by batch score to be scored
+        exactly before committing
+    - actions (tuple): the actions in neighborhood
+    - the inputs of Search
+    """
+
+    def __init__(self, n_exact=8, actions=ACTIONS, **kwargs):
+        """
+        """
+        TabuSearch.__init__(self, tenure=0, n_exact=n_exact, actions=actions,
+            **kwargs)
+
+
+    def _accept(self, delta):
+        """ Only the improving move is committed, otherwise it's the local
+        optimum.
+        """
+        if delta > 0: return True
+        self.stopped = 'local_optimum'
+
+        return False
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
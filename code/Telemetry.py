@@ -0,0 +1,250 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the telemetry of searching for
+architectural_plan_generator. The hot paths of Plan and Transition are timed
+per action and phase, and the searches record every step. The records go to
+pluggable sinks: in memory, CSV or JSON lines.
+
+Telemetry is off unless a Telemetry object is attached to the plan, the
+transition and the search. When off, a timed method costs one attribute check.
+
+Author: Xian Lai
+Date: Feb.25, 2018
+"""
+
+
+import csv
+import json
+from time import perf_counter
+from functools import wraps
+
+
+PHASES = ('propose', 'score', 'apply', 'undo', 'parse', 'evaluate')
+
+
+# ---------------------------- global functions ------------------------------
+def timed(phase):
+    """ The decorator timing a method of an object with a telemetry attribute
+    as given phase of the current action. The method is called directly if
+    the telemetry is None.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            telemetry = self.telemetry
+            if telemetry is None: return method(self, *args, **kwargs)
+            start = perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                telemetry.add_time(phase, perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+
+# ---------------------------- sinks -----------------------------------------
+class MemorySink(object):
+
+    """
+    The memory sink keeps the records in a list.
+
+    Attributes:
+    -----------
+    - records: the list of records received
+    """
+
+    def __init__(self,):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def close(self,):
+        pass
+
+
+
+class CSVSink(object):
+
+    """
+    The CSV sink writes the step records into a CSV file, one row per step.
+    The other records like the summary are not tabular and are skipped.
+
+    Inputs:
+    -------
+    - path (str): the path of CSV file
+    """
+
+    FIELDS = ['i', 'action', 'accepted', 'objective', 'best_objective',
+        'elapsed']
+
+    def __init__(self, path):
+        self.file   = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.FIELDS,
+            extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, record):
+        if record['type'] == 'step': self.writer.writerow(record)
+
+    def close(self,):
+        self.file.close()
+
+
+
+class JSONLSink(object):
+
+    """
+    The JSON lines sink writes every record as a line of JSON.
+
+    Inputs:
+    -------
+    - path (str): the path of JSON lines file
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self,):
+        self.file.close()
+
+
+
+# ---------------------------- telemetry -------------------------------------
+class Telemetry(object):
+
+    """
+    The telemetry class collects the counters and timers per action and the
+    trajectory of searching. The time spent in each phase is credited to the
+    action being proposed or applied, so the parsing and evaluating after a
+    move count towards the action of this move.
+
+    Inputs:
+    -------
+    - sinks (list): the sinks receiving records. Default is a MemorySink.
+    - every (int): write a step record every given steps. The counters and
+        timers still count every step.
+
+    Attributes:
+    -----------
+    - action: the current action the time is credited to
+    - counts: the counters per action: {action: {'steps', 'accepted'}}
+    - times: the seconds and calls per action and phase:
+        {action: {phase: [seconds, calls]}}
+    - weights: the latest weights of the adaptive action scheduler if any
+    - start: the time when attached
+
+    Methods:
+    --------
+    - attach: Attach this telemetry to plans, transitions and searches.
+    - add_time: Add the time of a phase to the current action.
+    - step: Record a step of searching.
+    - summary: The counters, timers and accept rate per action.
+    - close: Write the summary and close the sinks.
+    """
+
+    def __init__(self, sinks=None, every=1):
+        """
+        """
+        self.sinks  = [MemorySink()] if sinks is None else sinks
+        self.every  = every
+        self.action = None
+        self.counts = {}
+        self.times  = {}
+        self.weights = None
+        self.start  = perf_counter()
+
+
+    def attach(self, *objs):
+        """ Attach this telemetry to given plans, transitions and searches.
+        """
+        for obj in objs: obj.telemetry = self
+        self.start = perf_counter()
+
+
+    def add_time(self, phase, seconds):
+        """ Add the time of a phase to the current action.
+        """
+        timers = self.times.setdefault(self.action, {})
+        timer  = timers.get(phase)
+        if timer is None: timers[phase] = [seconds, 1]
+        else:
+            timer[0] += seconds
+            timer[1] += 1
+
+
+    def step(self, i, accepted, objective, best_objective, weights=None):
+        """ Record a step of searching taking the current action.
+
+        Args:
+            i (int): the iteration
+            accepted (bool): whether the move is accepted
+            objective (float): the objective value after this step
+            best_objective (float): the best objective value so far
+            weights (dict): the weights of actions learned by the scheduler
+        """
+        counts = self.counts.get(self.action)
+        if counts is None:
+            counts = self.counts[self.action] = {'steps':0, 'accepted':0}
+        counts['steps'] += 1
+        counts['accepted'] += bool(accepted)
+        self.weights = weights
+        if i % self.every: return
+
+        record = {
+            'type':'step',
+            'i':i,
+            'action':self.action,
+            'accepted':bool(accepted),
+            'objective':objective,
+            'best_objective':best_objective,
+            'elapsed':perf_counter() - self.start,
+        }
+        if weights is not None: record['weights'] = weights
+        for sink in self.sinks: sink.write(record)
+
+
+    def summary(self,):
+        """ The counters, timers and accept rate per action.
+
+        Returns:
+            summary (dict): {action: {
+                'steps', 'accepted', 'accept_rate',
+                '<phase>_time': total seconds, '<phase>_calls': calls
+            }}
+        """
+        summary = {}
+        for action in set(self.counts) | set(self.times):
+            counts = self.counts.get(action, {'steps':0, 'accepted':0})
+            entry  = dict(counts)
+            entry['accept_rate'] = counts['accepted'] / counts['steps'] \
+                if counts['steps'] else None
+            for phase, (seconds, calls) in self.times.get(action, {}).items():
+                entry[phase + '_time']  = seconds
+                entry[phase + '_calls'] = calls
+            summary[str(action)] = entry
+
+        return summary
+
+
+    def close(self,):
+        """ Write the summary and close the sinks.
+        """
+        record = {'type':'summary', 'actions':self.summary(),
+            'weights':self.weights, 'elapsed':perf_counter() - self.start}
+        for sink in self.sinks:
+            sink.write(record)
+            sink.close()
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
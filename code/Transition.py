@@ -7,12 +7,15 @@ Author: Xian Lai
 Date: Dec.21, 2017
 """
 
-from pprint import pprint
 import numpy as np
 from numpy.random import choice as random_pick
 from Room import Room
+from Wall import Wall
 from collections import defaultdict
-from itertools import groupby
+
+import Log
+import Raster
+from Telemetry import timed
 
 
 # ---------------------------- global functions ------------------------------
@@ -31,14 +34,73 @@ def random_choice(seq, n=1):
         return [seq[i] for i in random_pick(indices(seq), size=n)]
 
 
-def any_in_any(a, b):
-    """ return true if any element in iterable a is in iterable b.
+class Move(object):
+
+    """
+    The move class implements the compact record of a proposed action. A move
+    is nothing but the grids changing owner, the rooms created and the rooms
+    changing function. So it can be scored, applied and undone without 
+    copying the plan.
+
+    Inputs:
+    -------
+    - action (str): the name of action proposing this move
+    - room_count (int): the room counter of plan when proposing. The new rooms
+        of this move take the rids starting from it.
+
+    Attributes:
+    -----------
+    - action: the name of action
+    - room_count: the room counter of plan when proposing
+    - xys: the xys changing owner
+    - rids: the new rid of each xy
+    - functions: the new functions of rooms keyed by rid, including the new
+        rooms and the rooms changing function.
+    - created: the rids of new rooms
+    - old_rids: the rid of each xy before applying. Filled when applied.
+    - old_functions: the functions before applying. Filled when applied.
+    - deleted: the rooms emptied by this move keyed by rid. Filled when 
+        applied and restored when undone.
+
+    Methods:
+    --------
+    - relabel: Record given xys changing owner to given rid.
+    - new_room: Record a new room with given function and return its rid.
     """
-    for i in a:
-        if i in b: 
-            return True
 
-    return False
+    __slots__ = ['action', 'room_count', 'xys', 'rids', 'functions', 'created',
+        'old_rids', 'old_functions', 'deleted']
+
+    def __init__(self, action, room_count):
+        """
+        """
+        self.action        = action
+        self.room_count    = room_count
+        self.xys           = []
+        self.rids          = []
+        self.functions     = {}
+        self.created       = []
+        self.old_rids      = None
+        self.old_functions = {}
+        self.deleted       = {}
+
+
+    def relabel(self, xys, rid):
+        """ Record given xys changing owner to given rid.
+        """
+        self.xys  += xys
+        self.rids += [rid] * len(xys)
+
+
+    def new_room(self, function):
+        """ Record a new room with given function and return its rid.
+        """
+        rid = self.room_count + len(self.created)
+        self.created.append(rid)
+        self.functions[rid] = function
+
+        return rid
+
 
 
 class Transition(object):
@@ -49,11 +111,22 @@ class Transition(object):
     merge. This class provides method to randomly pick one of them, pick one of
     them by different probabilities or pick all of them.
 
+    Every action is split into a proposal and its application. The proposal
+    returns a compact Move record without changing the plan, so it can be 
+    scored before applying. And an applied move can be undone by restoring 
+    only the grids and rooms it touched, which makes rejected moves cheap.
+
     Inputs:
     -------
-    - silent (bool): whether print the immediate process to screen.
+    - silent (bool): whether log the immediate process. If False, the debug
+        traces are logged at the level of 'transition' set by Log.configure
+        or --log-level, see Log.
     - pr_actions (list): the probability for each action when using 
         stratified sampling.
+    - telemetry (Telemetry): times proposing, scoring, applying and undoing
+        moves per action if given. See Telemetry.
+    - scheduler (Scheduler): picks the actions adaptively instead of by
+        pr_actions if given. See Scheduler.
 
     Attributes:
     -----------
@@ -62,18 +135,22 @@ class Transition(object):
         manipulate walls when the walls attributes are added.
     - pr_actions: the probability distribution used when randomly pick action
         in random walk process. This won't be in use in search process.
-    - silent (bool): do not print out the searching process
+    - silent (bool): do not log the searching process
+    - telemetry: the attached Telemetry or None
+    - scheduler: the adaptive action scheduler or None
 
     Methods:
     --------
+    - propose: Propose a move of given or randomly picked action.
+    - score: Score the change of objective value of a proposed move.
+    - apply: Apply a proposed move to plan.
+    - undo: Undo an applied move.
     - expand: Expand a random portion of boundary of a random room.
+    - _propose_expand: Propose an expand move.
+    - _expand_move: Make the move of expanding a room to given xys.
     - _group_xys_by_room: Group the given xys by room rids.
-    - _group_xys_by_adjacency: Get the groups of consective tuples given 
-        scattered tuples.
-    - _group_by_consective_x: group the points by whether they have consective
-        x values.
-    - _get_component_bounds: Get the maximal y value and x values of a given 
-        component.
+    - _group_xys_by_adjacency: Get the 4-connected groups of given scattered
+        xys.
     - _check_room_continuity: Check whether the xys in given room are still 
         continuous. If yes, keep it, else, split it into new rooms and set it 
         to None.
@@ -82,81 +159,200 @@ class Transition(object):
     - _slice_a_subsequence: Randomly slice a consecutive subsequence out of 
         given sequence.
     - swap: Swap the functions of 2 random picked rooms
+    - _propose_swap: Propose a swap move.
     - split: Split a room into 2 same-function rooms by a random x or y axis
         inside this room's x, y ranges. 
+    - _propose_split: Propose a split move.
+    - _split_move: Make the move of splitting a room by given line.
     - merge: Merge 2 same-function, adjacent rooms together.
-    - _group_rooms_by_function: Group the valid rooms(not None) by their 
-        functions.
-    - move_door: Move the location of door on the boundary. 
-    - change_wall: change the wall type from wall to door or from door to 
-        wall. To be added later.
+    - _propose_merge: Propose a merge move.
+    - _merge_move: Make the move of merging 2 given rooms.
+    - _move_door: Move the location of a random door or entrance along its
+        wall.
+    - _change_wall: Change the opening type of a random wall of a random
+        room. The exterior walls can be wall, window or entrance and the 
+        interior walls can be wall or door.
         Possible opening types: 
         {0:’wall’, 1:’window’, 2:’door’, 3:'entrance'}
     """
     
-    def __init__(self, silent=False, pr_actions=[1, 0, 0, 0]):
+    def __init__(self, silent=False, pr_actions=[1, 0, 0, 0], telemetry=None,
+            scheduler=None):
 
         self.silent     = silent
+        self.log        = Log.get_logger('transition', silent)
         self.actions    = ['expand', 'swap', 'split', 'merge']
         self.pr_actions = pr_actions
- 
+        self.telemetry  = telemetry
+        self.scheduler  = scheduler
+
+
+# ---------------------------- moves -----------------------------------------
+    @timed('propose')
+    def propose(self, plan, action=None):
+        """ Propose a move of given action without changing the plan. If the
+        action is not given, it's picked by the scheduler if there is one or
+        randomly by pr_actions.
+
+        Args:
+            plan (Plan): the parsed plan we are operating on.
+            action (str): the name of action
+
+        Returns:
+            move (Move): the proposed move, None if the picked action is not
+                applicable to the picked room(s).
+        """
+        if action is None:
+            if self.scheduler is not None: action = self.scheduler.pick()
+            else: action = random_pick(self.actions, p=self.pr_actions)
+        if self.telemetry is not None: self.telemetry.action = action
+
+        return getattr(self, "_propose_" + action)(plan)
+
+
+    @timed('score')
+    def score(self, plan, move):
+        """ Score the change of objective value of a proposed move without 
+        applying it.
+
+        Args:
+            plan (Plan): the parsed plan we are operating on.
+            move (Move): the proposed move
+        """
+        return plan.objective_fn.score_change(
+            plan, move.xys, move.rids, move.functions)
+
+
+    @timed('apply')
+    def apply(self, plan, move):
+        """ Apply a proposed move to plan. The old owners and functions are 
+        recorded in the move for undoing. The stats are not parsed here.
+
+        Args:
+            plan (Plan): the plan the move is proposed on.
+            move (Move): the proposed move
+        """
+        if move is None: return
+        if self.telemetry is not None: self.telemetry.action = move.action
+        if move.room_count != plan.room_count:
+            raise ValueError("The move is not proposed on current plan state.")
+
+        for rid in move.created: 
+            plan._create_room(move.functions[rid], [])
+        move.old_functions = {rid:plan.rooms[rid].function \
+            for rid in move.functions if rid not in move.created}
+        for rid in move.old_functions:
+            plan._set_function(rid, move.functions[rid])
+
+        xys  = np.asarray(move.xys, dtype=int).reshape(-1, 2)
+        rids = np.asarray(move.rids, dtype=int)
+        move.old_rids = plan.grids.rid_at(xys)
+        for rid in np.unique(rids).tolist():
+            plan._assign_xys(xys[rids == rid], rid)
+
+        # the rooms emptied by this move are set to None
+        move.deleted = {}
+        for rid in np.unique(move.old_rids).tolist():
+            if plan.rooms[rid].sums[0] == 0:
+                move.deleted[rid] = plan.rooms[rid]
+                plan._delete_room(rid)
+
+
+    @timed('undo')
+    def undo(self, plan, move):
+        """ Undo an applied move. Only the grids and rooms touched by this 
+        move are restored. Moves must be undone in the reversed order they
+        are applied.
+
+        Args:
+            plan (Plan): the plan the move is applied on.
+            move (Move): the applied move
+        """
+        if move is None: return
+        for rid, room in move.deleted.items():
+            plan._restore_room(room)
+
+        xys = np.asarray(move.xys, dtype=int).reshape(-1, 2)
+        for rid in np.unique(move.old_rids).tolist():
+            plan._assign_xys(xys[move.old_rids == rid], rid)
+
+        for rid, function in move.old_functions.items():
+            plan._set_function(rid, function)
+        plan._drop_rooms(len(move.created))
+
 
 # ---------------------------- expand ----------------------------------------
     def expand(self, plan):
         """ Expand a random portion of boundary of a random room.
         
+        Args:
+            plan (Plan): the plan we are operating on.
+        """
+        self.apply(plan, self._propose_expand(plan))
+
+
+    def _propose_expand(self, plan):
+        """ Propose to expand a random portion of boundary of a random room.
+        
         Args:
             plan (Plan): the plan we are operating on.
         """
         # randomly pick a room from given plan and find its surrounding xys
         room = plan._pick_a_room()
-        _, srd_xys = room.find_boundary_xys(plan.xys)
-        if not self.silent: print("Pick room: %d" % room.rid)
+        _, srd_xys = room.find_boundary_xys(plan.grids)
+        self.log.debug("Pick room: %d", room.rid)
 
         # if there is no surrounding xys found, return. This is a rare 
         # situation when this room occupies the whole plan.
         if len(srd_xys) == 0: 
-            if not self.silent: print("This room has no surrounding xys.")
-            return
+            self.log.debug("This room has no surrounding xys.")
+            return None
 
         # group the surrounding xys into surrounding walls(only the xys 
         # connecting by convex corners are seperated)
         srd_walls = self._group_xys_by_adjacency(flatten(srd_xys))
-        if not self.silent: print("outward walls: ", srd_walls)
+        self.log.debug("outward walls: %s", srd_walls)
 
         # randomly pick a portion of 1 wall, 1 wall or multiple walls to 
         # expand outward
         outward_xys = self._random_pick_walls_to_expand(srd_walls)
 
+        return self._expand_move(plan, room, outward_xys)
+
+
+    def _expand_move(self, plan, room, outward_xys):
+        """ Make the move of expanding given room to given outward xys.
+
+        Args:
+            plan (Plan): the plan we are operating on.
+            room (Room): the room to expand
+            outward_xys (list): the xys outside this room to take
+        """
         # group the outward xys by rooms and iterate through each group to 
-        # update the grids and rooms.
+        # record the grids changing owner.
         outward_groups = self._group_xys_by_room(outward_xys, plan)
-        if not self.silent: print("Outward groups:", outward_groups)
+        self.log.debug("Outward groups: %s", outward_groups)
+        move = Move('expand', plan.room_count)
         for rid, xys in outward_groups.items():
-            # add this xy into this room's xys list
-            room.xys += xys
-
-            # remove this xy from its corresponding outward room
-            for xy in xys: plan.rooms[rid].xys.remove(xy)
-            if not self.silent:
-                print(xys, "in Room %d is taken by this expand" % rid)
-                print(plan.rooms[rid].xys, "is the xys left in this room.")
-
-            # if the outward room's xys list is empty after removing, change 
-            # this room to None.
-            if not plan.rooms[rid].xys: 
-                if not self.silent:
-                    print("Room %d is eaten up by this expand" % rid)
-                plan.rooms[rid] = None
+            # relabel these xys to this room, which removes them from their 
+            # corresponding outward room at the same time
+            move.relabel(xys, room.rid)
+            xys_left = self._find_xys_left(plan.rooms[rid], xys, plan)
+            self.log.debug("%s in Room %d is taken by this expand", xys, rid)
+            self.log.debug("%s is the xys left in this room.", xys_left)
+
+            # if the outward room's xys list is empty after removing, this 
+            # room will be set to None when applying.
+            if not xys_left: 
+                self.log.debug("Room %d is eaten up by this expand", rid)
 
             # if the outward room's xys list doesn't parse to a single Polygon 
             # which means it's split by this expand action, split it to n rooms.
             # here n refers to the number of continuous groups of grids it has.
             else:
-                self._check_room_continuity(rid, plan)
+                self._check_room_continuity(rid, xys_left, plan, move)
 
-            # update the rid of this xy
-            for xy in xys: plan.grids[xy].rid = room.rid
+        return move
 
 
     def _group_xys_by_room(self, xys, plan):
@@ -169,7 +365,8 @@ class Transition(object):
         """
         # group the xys by their rid
         groups = defaultdict(list)
-        for xy in xys: groups[plan.grids[xy].rid].append(xy)
+        for xy, rid in zip(xys, plan.grids.rid_at(xys).tolist()): 
+            groups[rid].append(xy)
         
         # remove duplicated xys in the groups
         for k, v in groups.items(): groups[k] = list(set(v))
@@ -177,108 +374,71 @@ class Transition(object):
         return groups
 
 
-    def _group_xys_by_adjacency(self, xys):
-        """ Get the groups of consective xys given scattered xys.
+    def _find_xys_left(self, room, xys_taken, plan):
+        """ Find the xys left in given room after the given xys are taken.
 
         Args:
-            xys (list): the xys to be grouped
-
+            room (Room): the room losing grids
+            xys_taken (list): the xys taken from this room
+            plan (Plan): the plan contains this given room
         """
-        d = defaultdict(list)
-        # divide the xys into rows by their y values
-        for x, y in xys: 
-            d[y].append((x,y))
-
-        # divide the xys in each room into consective components
-        for k, v in d.items(): 
-            d[k] = self._group_xys_by_consective_x(v)
-
-        ys = sorted(d.keys())
-        # set the components in first row as groups
-        groups = [component for component in d[ys[0]]]
-
-        # for each component in upper rows, if there is one group right below 
-        # it(group_maxy = component_maxy - 1) and their x values overlap. Then
-        # this component is connecting to that group and will be merged to it.
-        # if there is no such group, make a new group with this component.
-        for i in ys[1:]:
-            for component in d[i]:
-                connecting = False
-                c_y, c_xs = self._get_component_bounds(component)
-                for group in groups:
-                    g_y, g_xs = self._get_component_bounds(group)
-                    if (c_y == g_y + 1) and (any_in_any(c_xs, g_xs)):
-                        connecting = True
-                        group += component
-                        break
-                if not connecting:
-                    groups.append(component)
-        
-        return groups
+        min_x, min_y, max_x, max_y = room.grid_bounds
+        xs, ys = plan.grids.find_grids(room.rid, room.grid_bounds)
 
+        # mark the taken grids inside the bounds of room
+        taken  = np.zeros((max_x - min_x + 1, max_y - min_y + 1), dtype=bool)
+        tx, ty = np.asarray(xys_taken, dtype=int).reshape(-1, 2).T
+        taken[tx - min_x, ty - min_y] = True
+        left   = ~taken[xs - min_x, ys - min_y]
 
-    def _group_xys_by_consective_x(self, xys):
-        """ Group given xys by consective x values
-
-        Args:
-            xys: the xys to be grouped.
-            
-        """
-        # the key function is index - element, for every group of consective
-        # elements, this function should have same result
-        groupby_key = lambda x: x[0] - x[1][0]
-        gb = groupby(enumerate(sorted(xys, key=lambda xy: xy[0])), groupby_key)
-
-        return [[x[1] for x in list(g)] for _,g in gb]
+        return list(zip(xs[left].tolist(), ys[left].tolist()))
 
 
-    def _get_component_bounds(self, component):
-        """ Get the maximal y value and x values of a given component.
+    def _group_xys_by_adjacency(self, xys):
+        """ Get the 4-connected groups of given scattered xys. The xys in each
+        group are sorted by y then x.
 
         Args:
-            component: the horizontal band of xys we want to parse
+            xys (list): the xys to be grouped
+
         """
-        maxy = component[-1][1]
-        xs   = [xy[0] for xy in component]
+        if len(xys) == 0: return []
+        xs, ys = np.asarray(xys, dtype=int).reshape(-1, 2).T
+        order  = np.lexsort((xs, ys))
+        xs, ys = xs[order], ys[order]
+        labels, n = Raster.connected_components(xs, ys)
 
-        return maxy, xs 
+        groups = [[] for _ in range(n)]
+        for xy, label in zip(zip(xs.tolist(), ys.tolist()), labels.tolist()):
+            groups[label].append(xy)
+
+        return groups
 
 
-    def _check_room_continuity(self, rid, plan):
-        """ Check whether the xys in given room are still continuous. If yes,
-        keep it, else, split it into new rooms and set it to None.
+    def _check_room_continuity(self, rid, xys_left, plan, move):
+        """ Check whether the xys left in given room are still continuous. If 
+        yes, keep it, else, record them split into new rooms in the move. The
+        old room will be set to None when applying.
 
         Args:
             rid (int): the rid of room to check
+            xys_left (list): the xys left in this room after the move
             plan (Plan): the plan contains this given room
+            move (Move): the move taking xys from this room
         """
-        groups = self._group_xys_by_adjacency(plan.rooms[rid].xys)
+        groups = self._group_xys_by_adjacency(xys_left)
         if len(groups) == 1:
-            if not self.silent:
-                print("Room %d is still a whole piece" % rid)
+            self.log.debug("Room %d is still a whole piece", rid)
         else:
-            if not self.silent:
-                print("Room %d is divided into %d pieces" % (rid, len(groups)))
+            self.log.debug("Room %d is divided into %d pieces", rid, len(groups))
             # create new rooms and set old room to None
             for group in groups:
-                # add new room to self.rooms
-                room_new = Room(
-                    function=plan.rooms[rid].function, 
-                    rid=plan.room_count,
-                    xys=group
-                )
-                plan.rooms.append(room_new)
-                if not self.silent:
-                    print("Room %d is split out" % room_new.rid)
-                # update the rid of xys
-                for xy in group:
-                    plan.grids[xy].rid = plan.room_count
-
-                plan.room_count += 1
-
-            plan.rooms[rid] = None
-            if not self.silent:
-                print("Room %d is reset to None" % rid)
+                # add new room and relabel its xys
+                rid_new = move.new_room(plan.rooms[rid].function)
+                move.relabel(group, rid_new)
+                self.log.debug("Room %d is split out", rid_new)
+
+            self.log.debug("Room %d is reset to None", rid)
 
 
     def _random_pick_walls_to_expand(self, walls):
@@ -290,15 +450,15 @@ class Transition(object):
         # of picking 1 is 0.9, and the rest 0.1 prob is evenly distributed 
         # among 2 to n_walls.
         n_walls = len(walls)
-        pr_pick = [0.9]+[0.1/(n_walls-1) for i in range(n_walls-1)]
+        if n_walls == 1: pr_pick = [1.]
+        else: pr_pick = [0.9]+[0.1/(n_walls-1) for i in range(n_walls-1)]
         n_pick  = random_pick(range(n_walls), p=pr_pick)
 
         # if we select multiple walls to expand:
         if n_pick > 1:
             outward_xys = flatten(random_choice(walls, n=n_pick))
-            if not self.silent: 
-                print("Selected number of walls to expand:", n_pick)
-                print("Surrounding xys to be taken: ", outward_xys)
+            self.log.debug("Selected number of walls to expand: %d", n_pick)
+            self.log.debug("Surrounding xys to be taken: %s", outward_xys)
 
         # if we select 1 wall to expand, we further choose whether to expand
         # the whole wall or a portion of wall. The prob to select whole wall
@@ -307,14 +467,12 @@ class Transition(object):
             n_pick = random_pick(["portion", "whole"], p=[0.3, 0.7])
             if n_pick == "whole":
                 outward_xys = random_choice(walls)
-                if not self.silent: 
-                    print("Selected number of walls to expand:", 1)
-                    print("Surrounding xys to be taken: ", outward_xys)
+                self.log.debug("Selected number of walls to expand: %d", 1)
+                self.log.debug("Surrounding xys to be taken: %s", outward_xys)
             else:
                 outward_xys = self._slice_a_subsequence(random_choice(walls))
-                if not self.silent: 
-                    print("A portion of 1 wall to expand.")
-                    print("Surrounding xys to be taken: ", outward_xys)
+                self.log.debug("A portion of 1 wall to expand.")
+                self.log.debug("Surrounding xys to be taken: %s", outward_xys)
 
         return outward_xys
 
@@ -341,14 +499,26 @@ class Transition(object):
     def swap(self, plan):
         """ Swap the functions of 2 random picked rooms
         """
+        self.apply(plan, self._propose_swap(plan))
+
+
+    def _propose_swap(self, plan):
+        """ Propose to swap the functions of 2 random picked rooms
+        """
+        if len(plan._purge_room()) < 2:
+            self.log.debug("There is only 1 room to swap.")
+            return None
+
         room_1 = plan._pick_a_room()
         room_2 = plan._pick_a_room()
         while room_2 is room_1: room_2 = plan._pick_a_room()
 
-        if not self.silent:
-            print("Pick 2 rooms: %d and %d" % (room_1.rid, room_2.rid))
-            print("Swap functions: %s and %s" % (room_1.function, room_2.function))
-        room_1.function, room_2.function = room_2.function, room_1.function
+        self.log.debug("Pick 2 rooms: %d and %d", room_1.rid, room_2.rid)
+        self.log.debug("Swap functions: %s and %s", room_1.function, room_2.function)
+        move = Move('swap', plan.room_count)
+        move.functions = {room_1.rid:room_2.function, room_2.rid:room_1.function}
+
+        return move
 
 
 # ---------------------------- split -----------------------------------------
@@ -356,127 +526,175 @@ class Transition(object):
         """ Split a room into 2 same-function rooms by a random x or y axis
         inside this room's x, y ranges. 
 
+        """
+        self.apply(plan, self._propose_split(plan))
+
+
+    def _propose_split(self, plan):
+        """ Propose to split a room into 2 same-function rooms by a random x or
+        y axis inside this room's x, y ranges. 
+
         """
         room = plan._pick_a_room()
         axis = random_pick(['x', 'y'])
-        if not self.silent:
-            print("Split room:", room.rid)
+        self.log.debug("Split room: %d", room.rid)
 
         # randomly pick a split line
         left  = room.stats["min_"+axis] + 0.5
         right = room.stats["max_"+axis] - 0.5
         if right - left == 0: 
-            if not self.silent:
-                print("This room has width 1 at axis %s" % axis)
-            return
+            self.log.debug("This room has width 1 at axis %s", axis)
+            return None
         split_line = random_pick(np.arange(left, right))
 
-        # split the grids
-        xys_1, xys_2 = [], []
-        for xy in room.xys:
-            if getattr(plan.grids[xy], axis) <= split_line: 
-                xys_1.append(xy)
-            else: 
-                xys_2.append(xy)
+        return self._split_move(plan, room, axis, split_line)
 
-        # create 2 new rooms based on split 2 groups of xys
-        # append the new rooms to self.rooms and set original room to None
-        room_1 = Room(function=room.function, xys=xys_1, rid=plan.room_count)
-        room_2 = Room(function=room.function, xys=xys_2, rid=plan.room_count + 1)
-        plan.rooms += [room_1, room_2]
-        plan.rooms[room.rid] = None
 
-        plan.room_count += 2
+    def _split_move(self, plan, room, axis, split_line):
+        """ Make the move of splitting given room by given line. The grids
+        with coordinate not greater than the line are on one side.
 
-        # update the rids of split xys 
-        for xy in xys_1: plan.grids[xy].rid = room_1.rid
-        for xy in xys_2: plan.grids[xy].rid = room_2.rid
+        Args:
+            plan (Plan): the plan we are operating on.
+            room (Room): the room to split
+            axis (str): 'x' or 'y'
+            split_line (float): the coordinate of split line along the axis
+        """
+        # split the grids
+        xys   = room.xys
+        side  = (np.array(xys)[:, ['x', 'y'].index(axis)] <= split_line).tolist()
+        xys_1 = [xy for xy, left in zip(xys, side) if left]
+        xys_2 = [xy for xy, left in zip(xys, side) if not left]
+
+        # create new rooms based on split 2 groups of xys. a side of a non-
+        # convex room can be in several pieces, each piece is a new room.
+        # the original room will be set to None when applying
+        move = Move('split', plan.room_count)
+        for group in self._group_xys_by_adjacency(xys_1) + \
+                self._group_xys_by_adjacency(xys_2):
+            move.relabel(group, move.new_room(room.function))
 
-        if not self.silent:
-            print("Into 2 rooms: %d and %d" % (room_1.rid, room_2.rid))
+        self.log.debug("Into %d rooms: %s", len(move.created), move.created)
+
+        return move
 
 
 # ---------------------------- merge -----------------------------------------
     def merge(self, plan):
         """ Merge 2 same-function, adjacent rooms together.
 
+        """
+        self.apply(plan, self._propose_merge(plan))
+
+
+    def _propose_merge(self, plan):
+        """ Propose to merge 2 same-function, adjacent rooms together.
+
         """
         # find all pairs of adjacent, same-function rooms keyed by function
-        groups = self._group_rooms_by_function(plan)
+        # from the adjacency graph of plan
         pairs  = {function:[] for function in plan.functions}
-        for function in plan.functions:
-            for rid in groups[function]:
-                for adjacent_rid in plan.rooms[rid].find_adjacent_rids(plan.grids):
-                    if adjacent_rid in groups[function]:
-                        pairs[function].append((rid, adjacent_rid))
+        for rid_1, rid_2, _ in plan.adjacency.pairs():
+            function = plan.rooms[rid_1].function
+            if plan.rooms[rid_2].function == function:
+                pairs[function].append((rid_1, rid_2))
 
         # purge the function without adjacent pairs
         # if no function contains adjacent pairs, exit this action.
         pairs = purge_dict(pairs)
         if not pairs: 
-            if not self.silent:
-                print("No pairs of adjacent same-function rooms found.")
-            return
+            self.log.debug("No pairs of adjacent same-function rooms found.")
+            return None
 
         # randomly pick a function by weighting. (we may want to using weights
         # to control the chance of merge for different room function)
-        # redo picking if the picked function has no adjacent pairs
-        picked_function = ""
-        while picked_function not in pairs.keys():
-            picked_function = random_pick(plan.functions, p=plan.pr_merge)
+        # only the functions having adjacent pairs can be picked.
+        functions = [f for f in plan.functions if f in pairs]
+        pr_merge  = np.array([plan.pr_merge[plan.functions.index(f)] \
+            for f in functions], dtype=float)
+        if pr_merge.sum() == 0: pr_merge[:] = 1
+        picked_function = random_pick(functions, p=pr_merge / pr_merge.sum())
 
         # randomly pick a pair of adjacent rooms
         # create a new room with same function and merged xys
         picked_pair = random_choice(pairs[picked_function])
-        room_new    = Room(
-            function=picked_function, 
-            rid = plan.room_count,
-            xys=plan.rooms[picked_pair[0]].xys + plan.rooms[picked_pair[1]].xys
-        )
-        plan.room_count += 1
-        if not self.silent:
-            print("Merge rooms %d and %d" % (plan.rooms[picked_pair[0]].rid,
-                plan.rooms[picked_pair[1]].rid))
-
-        # update self.rooms
-        plan.rooms[picked_pair[0]] = None
-        plan.rooms[picked_pair[1]] = None
-        plan.rooms.append(room_new)
-        if not self.silent:
-            print("into room %d" % room_new.rid)
-
-        # update the rid of merged xys
-        for xy in room_new.xys:
-            plan.grids[xy].rid = room_new.rid
-
-
-    def _group_rooms_by_function(self, plan):
-        """ Group the valid rooms(not None) by their functions. The result is 
-        a dictionary.
 
+        return self._merge_move(plan, *picked_pair)
+
+
+    def _merge_move(self, plan, rid_1, rid_2):
+        """ Make the move of merging 2 given same-function, adjacent rooms.
+
+        Args:
+            plan (Plan): the plan we are operating on.
+            rid_1, rid_2 (int): the rids of rooms to merge
         """
-        rooms = plan._purge_room()
-        groups = {function:[] for function in plan.functions}
-        for room in rooms:
-            groups[room.function].append(room.rid)
-            
-        return groups
+        self.log.debug("Merge rooms %d and %d", rid_1, rid_2)
+
+        # record the new room and the rid of merged xys. the 2 old rooms will
+        # be set to None when applying.
+        move    = Move('merge', plan.room_count)
+        rid_new = move.new_room(plan.rooms[rid_1].function)
+        move.relabel(plan.rooms[rid_1].xys, rid_new)
+        move.relabel(plan.rooms[rid_2].xys, rid_new)
+        self.log.debug("into room %d", rid_new)
+
+        return move
 
 
 # ---------------------------- move door -------------------------------------
-    def _move_door(self,):
-        """ Move the location of door on the boundary. 
+    def _move_door(self, plan):
+        """ Move the location of a random door or entrance along its wall. 
+        The opening is 1 grid wide, so it's centered at a half grid from the
+        first end. The same wall in the other room moves along with it.
+
+        Args:
+            plan (Plan): the plan we are operating on.
+
+        Returns:
+            wall (Wall): the wall whose opening moved, None if no door found
         """
+        doors = [wall for wall in plan.walls.walls.values() \
+            if wall.opening[1] in (Wall.TYPES['door'], Wall.TYPES['entrance']) \
+            and (wall.ngbr is None or wall.rid < wall.ngbr)]
+        if not doors:
+            self.log.debug("No doors to move.")
+            return None
 
-        pass
+        wall = random_choice(doors)
+        plan.walls.set_opening(wall, [random_pick(int(wall.length)) + .5,
+            wall.opening[1]])
+        self.log.debug("Move door of wall %d to %.1f", wall.wid, wall.opening[0])
+
+        return wall
 
 
 # ---------------------------- change wall -----------------------------------
-    def _change_wall(self,):
-        """ Change the wall type
+    def _change_wall(self, plan):
+        """ Change the opening type of a random wall of a random room to
+        another type. The exterior walls can be wall, window or entrance and
+        the interior walls can be wall or door. The new opening is centered on
+        the wall and the same wall in the other room gets the same opening.
+
+        Args:
+            plan (Plan): the plan we are operating on.
+
+        Returns:
+            wall (Wall): the wall changed
         """
-        
-        pass
+        room = random_choice(plan._purge_room())
+        wall = random_choice(room.walls)
+        if wall.ngbr is None: types = ('wall', 'window', 'entrance')
+        else: types = ('wall', 'door')
+        types = [Wall.TYPES[t] for t in types if Wall.TYPES[t] != \
+            wall.opening[1]]
+
+        plan.walls.set_opening(wall, [wall.length / 2,
+            int(random_pick(types))])
+        self.log.debug("Change wall %d of room %d to type %d", wall.wid, room.rid,
+            wall.opening[1])
+
+        return wall
 
 
 
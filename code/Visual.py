@@ -2,7 +2,8 @@
 # -*- coding: utf-8 -*-
 """ 
 This script implements the visualization class to plot the intermediate or
-final plan.
+final plan. It's only imported when plotting is asked for, so the searching
+without plotting never touches matplotlib.
 
 Author: Xian Lai
 Date: Jan.23, 2017
@@ -15,7 +16,6 @@ from descartes import PolygonPatch
 
 from matplotlib import gridspec
 from matplotlib.colors import ListedColormap, Normalize
-from matplotlib import cm
 
 # import seaborn as sns; sns.set()
 # %matplotlib inline 
@@ -51,7 +51,7 @@ grey = {
 }
 DC   = {'blue':'#448afc', 'red':'#ed6a6a', 'green':'#80f442'}
 DCM  = ListedColormap(DC.values())
-CM   = cm.get_cmap('Spectral')
+CM   = mpl.colormaps['Spectral']
 
 
 class _BasePlot():
@@ -95,7 +95,7 @@ class _BasePlot():
 
         # show or hide the grid
         if show_grid: ax.grid(color=grey['median'], linewidth=2, alpha=0.3)
-        else:         ax.grid(b=None)
+        else:         ax.grid(False)
 
 
     def _set_axTitle(self, ax, title):
@@ -124,7 +124,7 @@ class _BasePlot():
         """
         """
         bbox_props = dict(boxstyle="square,pad=0.3", fc="w", lw=0, alpha=0.2)
-        ax.text(point.x, point.y, label, fontdict=font['small'], bbox=bbox_props)
+        ax.text(point[0], point[1], label, fontdict=font['small'], bbox=bbox_props)
 
         return ax
 
@@ -155,7 +155,7 @@ class SingleAxPlot(_BasePlot):
         self.xlim, self.ylim = xy_lims
         self.fig, self.axes = self._plot_base(figsize, show_grid)
 
-        if not show_grid: self.axes.grid(b=None)
+        if not show_grid: self.axes.grid(False)
         
 
     def _plot_base(self, figsize, show_grid):
@@ -179,20 +179,72 @@ class SingleAxPlot(_BasePlot):
 
 
     def plot_plan_intermediate(self, centers, functions, patches, colors, 
-            title="intermediate plan", show=True):
+            title="intermediate plan", show=True, pause=2):
         """ Plot the intermediate plan in process of searching.
         This intermediate plan only includes color patch and room function 
         label for each room.
         """
-        self.axes.patches = []
-        self.axes.texts   = []
+        # the artist lists of axes are read-only, so the artists of last
+        # plotting are removed one by one
+        for artist in list(self.axes.patches) + list(self.axes.texts):
+            artist.remove()
 
         for patch, color in zip(patches, colors):
             self.axes = self._plot_patch(self.axes, patch, color)
         for function, center in zip(functions, centers):
             self.axes = self._plot_label(self.axes, function, center)
         
-        plt.pause(2)
+        if pause: plt.pause(pause)
+
+
+
+class PlanPlotter(object):
+
+    """ This class is the observer of plan plotting the intermediate plan on a
+    SingleAxPlot every time it's notified.
+
+    Inputs:
+    -------
+    - plan (Plan): the plan to observe
+    - pause (float): the seconds to pause after each plotting
+    """
+
+    def __init__(self, plan, pause=2):
+        """ 
+        """
+        self.pause    = pause
+        self.plot_fig = SingleAxPlot(xy_lims=plan._find_xy_lims())
+        self.colors   = {f:CM(i/plan.n_functions) for i, f in \
+            enumerate(plan.functions)}
+
+
+    def update(self, plan, i):
+        """ Plot the plan.
+
+        Args:
+            plan (Plan): the plan to plot
+            i (int): the iteration
+        """
+        rooms     = plan._purge_room()
+        centers   = [room.stats['center'] for room in rooms]
+        functions = [room.function for room in rooms]
+        patches   = [room.geom for room in rooms]
+        colors    = [self.colors[function] for function in functions]
+
+        self.plot_fig.plot_plan_intermediate(
+            centers=centers, 
+            functions=functions, 
+            patches=patches, 
+            colors=colors, 
+            title="plan_searching(round %d)" % i,
+            pause=self.pause
+        )
+
+
+    def close(self,):
+        """ Turn off the interactive mode and show the last plot.
+        """
+        self.plot_fig.ioff()
 
 
 
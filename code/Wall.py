@@ -1,39 +1,49 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
-""" 
+"""
 This script implements the Wall class.
 Author: Xian Lai
 Date: Oct.29, 2017
 """
 
-from shapely.geometry import Point, LineString, Polygon
 
-class Wall(LineString):
+class Wall(object):
 
     """
-    The wall class implements the real-world wall objects. It has states 
-    attributes including the id, 2 end points, the opening, 2 rooms it belongs  
-    to, thickness, material etc. In the searching process, we will abstract it 
-    into a line with 1 id, 2 end points, 1 opening and 2 owning rooms. The  
+    The wall class implements the real-world wall objects. It has states
+    attributes including the id, 2 end points, the opening, 2 rooms it belongs
+    to, thickness, material etc. In the searching process, we will abstract it
+    into a line with 1 id, 2 end points, 1 opening and 2 owning rooms. The
     other attributes will be implemented later when needed in other problems.
 
+    The wall only keeps its end points in slots. The shapely line is built
+    lazily when asked for, so the walls of many plan replicas stay small.
+
+    The walls of a plan are extracted from the label grid by Walls. A wall
+    shared by 2 rooms is a Wall for each room, linked by stats['same'].
+
     Inputs:
     -------
     - wid  : the id of this wall
     - ends : 2 end points, (left, right) or (upper, lower).
-    - rids : the list of ids of 2 rooms this wall belongs to
-    
+    - rid  : the id of room this wall belongs to
+    - ngbr : the id of room on the other side, None for exterior walls
+
     Attributes:
     -----------
     - wid    : wall id
     - ends   : 2 end points
     - rid    : the room it belongs to
-    - opening: the stats of opening it has: location, type
-    - stats  : The stats of this wall is encoded as a dictionary: 
+    - ngbr   : the room on the other side, None for exterior walls
+    - opening: the stats of opening it has: [location, type]. The location is
+        the distance of center of opening from the first end.
+    - length : the length of this wall
+    - geom   : the shapely LineString of this wall, built when asked for
+    - stats  : The stats of this wall is encoded as a dictionary:
         {
         normalDir: The normal direction of wall,
         same     : The same wall that belong to another room
-        thickness: (Not in use for now.) 
+        thickness: (Not in use for now.)
         material: (Not in use for now.)
         }
     - types: {"wall":0, "window":1, "door":2, "entrance":3}
@@ -43,37 +53,64 @@ class Wall(LineString):
     - parse: parse the states attributes to get stats attributes.
     """
 
-    def __init__(self, ends, wid, rid):
-        """ Init a wall object with the wall id, 2 end points and 2 owning 
+    __slots__ = ['wid', 'ends', 'rid', 'ngbr', 'opening', 'stats', '_geom']
+
+    TYPES = {"wall":0, "window":1, "door":2, "entrance":3}
+
+    def __init__(self, ends, wid, rid, ngbr=None):
+        """ Init a wall object with the wall id, 2 end points and 2 owning
         rooms. When initialize, the opening type and location is always 0.
         """
-        LineString.__init__(self, ends)
+        self.ends    = tuple(tuple(end) for end in ends)
         self.wid     = wid
         self.rid     = rid
+        self.ngbr    = ngbr
         self.opening = [0, 0]
+        self._geom   = None
         self.parse()
 
 
+    @property
+    def length(self):
+        """ The length of this wall. Walls are axis-aligned.
+        """
+        (x0, y0), (x1, y1) = self.ends
+
+        return abs(x1 - x0) + abs(y1 - y0)
+
+
+    @property
+    def geom(self):
+        """ The shapely LineString of this wall, built and cached when asked
+        for.
+        """
+        if self._geom is None:
+            from shapely.geometry import LineString
+            self._geom = LineString(self.ends)
+
+        return self._geom
+
+
     def parse(self,):
         """ parse the states attributes to get stats attributes.
         """
         # parse normal direction: x-axis:0, y-axis:1
-        if self.coords[0][0] == self.coords[1][0]: normal = 0
+        if self.ends[0][0] == self.ends[1][0]: normal = 0
         else: normal = 1
 
         self.stats = {
-            'normalDir':normal, 
+            'normalDir':normal,
             'same':None
         }
 
-    
+
 
 def main():
     wall_0 = Wall(wid=0, rid=1, ends=((0, 0), (0, 1)))
     wall_1 = Wall(wid=0, rid=1, ends=((0, 0), (0, 1)))
     print(wall_0.stats)
-    print(wall_0 == wall_1)
+    print(wall_0.ends == wall_1.ends)
     print(wall_0.length)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the Walls class for architectural_plan_generator.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import numpy as np
+
+import Raster
+from Grid import OUTSIDE
+from Wall import Wall
+
+
+class Walls(object):
+
+    """
+    The walls class extracts the walls of all rooms from the label grid. The
+    unit edges between grids of different labels are traced in one pass per
+    axis and the consecutive ones between the same 2 labels are merged into
+    one axis-aligned segment. A segment between 2 rooms makes a Wall for each
+    of them, linked to each other by stats['same']. A segment between a room
+    and the outside makes an exterior wall with no same wall.
+
+    The walls are traced lazily and incrementally: parsing only marks the
+    rooms touched by moves as stale, and when the walls are asked for, only
+    the walls of stale rooms and their same walls are removed and traced
+    again, inside the bounds of these rooms. So the searches not using walls
+    never pay for them.
+
+    The openings are kept by the place of wall: (rid, ngbr, ends). They are
+    put back on the walls traced again at the same place and dropped with
+    the walls gone.
+
+    Inputs:
+    -------
+    - grids (LabelGrid): the label grid of plan
+
+    Attributes:
+    -----------
+    - walls: all walls keyed by wid
+    - rooms: the walls of each room keyed by rid then by wid
+    - openings: the openings keyed by (rid, ngbr, ends) of walls
+    - stale: the rids of rooms whose walls are to be traced again
+
+    Methods:
+    --------
+    - of: The walls of given room as a list.
+    - mark: Mark the walls of given rooms as stale.
+    - sync: Trace the walls of stale rooms again.
+    - set_opening: Set the opening of a wall and its same wall.
+    - get_openings: Get the openings as JSON-serializable rows.
+    - clear: Remove all walls, to be traced again when asked for.
+    - rebuild: Trace all walls from the label grid again.
+    - update: Trace the walls of given rooms again.
+    - _trace: Trace the wall segments inside a window of the label grid.
+    - _add: Make the walls of traced segments.
+    """
+
+    def __init__(self, grids):
+        """
+        """
+        self.grids    = grids
+        self.openings = {}
+        self.clear()
+
+
+    @property
+    def walls(self):
+        """ All walls keyed by wid, traced again if stale.
+        """
+        self.sync()
+        return self._walls
+
+
+    @property
+    def rooms(self):
+        """ The walls of each room keyed by rid then by wid, traced again if
+        stale.
+        """
+        self.sync()
+        return self._rooms
+
+
+    def of(self, rid):
+        """ The walls of given room as a list in the order of wid.
+        """
+        return list(self.rooms.get(rid, {}).values())
+
+
+    def mark(self, rids, bounds):
+        """ Mark the walls of given rooms as stale. Nothing is traced until
+        the walls are asked for.
+
+        Args:
+            rids (set): the rids of rooms touched
+            bounds (tuple): the bounds of grids of these rooms now, None if
+                they have no grids
+        """
+        if self._full: return
+        self.stale.update(rids)
+        self._bounds = Raster.union_bounds(self._bounds, bounds)
+
+
+    def sync(self,):
+        """ Trace the walls of stale rooms again, or all walls after clear.
+
+        Returns:
+            changed (set): the rids of rooms whose walls changed
+        """
+        if self._full:
+            self.rebuild()
+            return set(self._rooms)
+        if not self.stale: return set()
+
+        rids, bounds = self.stale, self._bounds
+        self.stale, self._bounds = set(), None
+
+        return self.update(rids, bounds)
+
+
+    def set_opening(self, wall, opening):
+        """ Set the opening of given wall and its same wall in the other room.
+
+        Args:
+            wall (Wall): the wall
+            opening (list): [location, type], see Wall
+        """
+        for wall in (wall, wall.stats['same']):
+            if wall is None: continue
+            wall.opening = list(opening)
+            key = (wall.rid, wall.ngbr, wall.ends)
+            if opening[1]: self.openings[key] = wall.opening
+            else: self.openings.pop(key, None)
+
+
+    def get_openings(self,):
+        """ Get the openings as rows of [rid, ngbr, x0, y0, x1, y1, location,
+        type] with ngbr -1 for exterior walls, for saving with plan states.
+        """
+        return [[rid, OUTSIDE if ngbr is None else ngbr, x0, y0, x1, y1] + \
+            list(opening) for (rid, ngbr, ((x0, y0), (x1, y1))), opening \
+            in self.openings.items()]
+
+
+    def clear(self, openings=None):
+        """ Remove all walls. They are all traced again when asked for, and
+        the openings kept are put back on the walls at the same places.
+
+        Args:
+            openings (list): the rows from get_openings to keep instead of the
+                current openings
+        """
+        self._walls  = {}
+        self._rooms  = {}
+        self._wid    = 0
+        self._full   = True
+        self.stale   = set()
+        self._bounds = None
+        if openings is not None:
+            self.openings = {(int(rid), None if ngbr == OUTSIDE else int(ngbr),
+                ((x0, y0), (x1, y1))):[location, int(kind)] for rid, ngbr, x0,
+                y0, x1, y1, location, kind in openings}
+        self._unconfirmed = set(self.openings)
+
+
+    def rebuild(self,):
+        """ Trace all walls from the label grid again.
+        """
+        self.clear()
+        self._full = False
+        self._add(*self._trace())
+        self._drop_unconfirmed()
+
+
+    def update(self, rids, bounds=None):
+        """ Trace the walls of given rooms again. The walls of these rooms and
+        their same walls in other rooms are removed first.
+
+        Args:
+            rids (set): the rids of rooms touched
+            bounds (tuple): the bounds of grids of these rooms now. If not
+                given, these rooms have no grids and nothing is traced.
+
+        Returns:
+            changed (set): the rids of rooms whose walls changed
+        """
+        rids, changed = set(rids), set(rids)
+        for rid in rids:
+            for wall in self._rooms.pop(rid, {}).values():
+                for old in (wall, wall.stats['same']):
+                    if old is None: continue
+                    if old.opening[1]:
+                        self._unconfirmed.add((old.rid, old.ngbr, old.ends))
+                    self._walls.pop(old.wid, None)
+                    if old.rid not in rids:
+                        del self._rooms[old.rid][old.wid]
+                        changed.add(old.rid)
+
+        if bounds is not None:
+            changed.update(self._add(*self._trace(bounds, rids)))
+        self._drop_unconfirmed()
+
+        return changed
+
+
+    def _drop_unconfirmed(self,):
+        """ Drop the openings of walls removed and not traced again.
+        """
+        for key in self._unconfirmed: self.openings.pop(key, None)
+        self._unconfirmed = set()
+
+
+    def _trace(self, bounds=None, rids=None):
+        """ Trace the wall segments inside the window of given bounds with a
+        border of 1 grid. The unit edges between different labels are found
+        along both axes, and the consecutive edges between the same labels
+        are merged by finding the breaks in their sorted order.
+
+        Args:
+            bounds (tuple): the bounds of grids to trace around
+            rids (set): only trace the edges touching these rooms if given
+
+        Returns:
+            ends (np.ndarray): the n by 4 array of (x0, y0, x1, y1) of each
+                segment in plan coordinates
+            sides (np.ndarray): the n by 2 array of the labels on both sides
+        """
+        window, (i0, j0) = self.grids._window(bounds)
+        labels = self.grids.labels[window]
+        x0, y0 = self.grids.origin[0] + i0, self.grids.origin[1] + j0
+        if rids is not None:
+            # the grids of given rooms by a lookup table, OUTSIDE is the last
+            rids    = np.fromiter(rids, dtype=int)
+            touched = np.zeros(max(rids.max(initial=0), labels.max()) + 2,
+                dtype=bool)
+            touched[rids] = True
+            touched = touched[labels]
+
+        ends, sides = [], []
+        for axis in (0, 1):
+            # the edges between (f, s) and the next grid along the axis, with
+            # f the index along the axis and s the index across it.
+            a = labels[:-1, :] if axis == 0 else labels[:, :-1].T
+            b = labels[1:, :] if axis == 0 else labels[:, 1:].T
+            edge = a != b
+            if rids is not None:
+                t = touched if axis == 0 else touched.T
+                edge &= t[:-1, :] | t[1:, :]
+            f, s = np.nonzero(edge)
+            if len(f) == 0: continue
+            la, lb = a[f, s], b[f, s]
+
+            # a segment breaks where the line, the labels or the continuity
+            # change
+            breaks = np.flatnonzero((np.diff(f) != 0) | (np.diff(s) != 1) | \
+                (np.diff(la) != 0) | (np.diff(lb) != 0)) + 1
+            starts = np.r_[0, breaks]
+            stops  = np.r_[breaks, len(f)] - 1
+
+            line  = f[starts] + .5
+            lo    = s[starts] - .5
+            hi    = s[stops] + .5
+            if axis == 0:
+                seg = np.stack([line + x0, lo + y0, line + x0, hi + y0], axis=1)
+            else:
+                seg = np.stack([lo + x0, line + y0, hi + x0, line + y0], axis=1)
+            ends.append(seg)
+            sides.append(np.stack([la[starts], lb[starts]], axis=1))
+
+        if not ends: return np.empty((0, 4)), np.empty((0, 2), dtype=int)
+
+        return np.concatenate(ends), np.concatenate(sides)
+
+
+    def _add(self, ends, sides):
+        """ Make the walls of traced segments and link the walls of the same
+        segment. The openings kept at the same places are put back.
+
+        Returns:
+            changed (set): the rids of rooms getting walls
+        """
+        changed, openings = set(), self.openings
+        for (x0, y0, x1, y1), (r, s) in zip(ends.tolist(), sides.tolist()):
+            pair = []
+            for rid, ngbr in ((r, s), (s, r)):
+                if rid == OUTSIDE: continue
+                ngbr = None if ngbr == OUTSIDE else ngbr
+                wall = Wall(((x0, y0), (x1, y1)), self._wid, rid, ngbr)
+                if openings:
+                    key = (rid, ngbr, wall.ends)
+                    if key in openings:
+                        wall.opening = openings[key]
+                        self._unconfirmed.discard(key)
+                self._wid += 1
+                self._walls[wall.wid] = wall
+                self._rooms.setdefault(rid, {})[wall.wid] = wall
+                changed.add(rid)
+                pair.append(wall)
+            if len(pair) == 2:
+                pair[0].stats['same'], pair[1].stats['same'] = pair[1], pair[0]
+
+        return changed
+
+
+
+def main():
+    pass
+
+if __name__ == "__main__":
+    main()
@@ -8,43 +8,145 @@ initial state assigned by human designer. Then we instruct the agent to
 perform searching algorithm to find better plan state that satisfies a certain
 objective score threshold.
 
+The commands:
+
+    python architectural_plan_generator.py [walk]
+        random walk from the initial state in data/ with plotting
+    python architectural_plan_generator.py search [--checkpoint PATH]
+        search from a random state with checkpoints
+    python architectural_plan_generator.py resume [--checkpoint PATH]
+        resume a search from its last checkpoint
+    python architectural_plan_generator.py batch MANIFEST [--out-dir DIR]
+            [--jsonl PATH] [--workers N]
+        run the jobs of a manifest in a pool of workers, see Batch.py
+
+Every command takes --log-level LEVEL and --log-rate N to set the level of
+logging and the messages per second allowed for each message, see Log.py.
+
 Author: Xian Lai
 Date: Feb.03, 2017
 """
 
 
+import argparse
 from pprint import pprint
 import pickle
+import Log
 from Transition import Transition
 from Plan import Plan
+from Search import SimulatedAnnealing
+from Batch import BatchRunner, load_manifest
 
 
-def main():
-    # read in functional requirements from a pickle file.
-    with open('../data/function_params.pickle', 'rb') as handle:
-        fn_params = pickle.load(handle)
-    print("Functional requirements:")
-    pprint(fn_params)
+# the search settings shared by a new search and a resumed one
+CHECKPOINT    = '../data/search.ckpt'
+SEARCH_PARAMS = {
+    'schedule':'exponential',
+    'max_iters':100000,
+    'checkpoint_every':1000,
+}
+
+
+def search(fn_params, grid_coords, checkpoint=CHECKPOINT):
+    """ Search from a random plan on given grids by simulated annealing and
+    write checkpoints periodically.
+    """
+    plan = Plan(function_params=fn_params, grid_coords=grid_coords, 
+        silent=True)
+    annealing = SimulatedAnnealing(checkpoint=checkpoint, silent=False,
+        **SEARCH_PARAMS)
+    annealing.run(plan)
+
+    return plan
+
+
+def resume(checkpoint=CHECKPOINT):
+    """ Resume the search from the last checkpoint. It continues exactly 
+    where the search stopped.
+    """
+    annealing = SimulatedAnnealing(checkpoint=checkpoint, silent=False,
+        **SEARCH_PARAMS)
+    plan = annealing.resume(checkpoint)
+    print("Resumed search stopped at iteration %d by %s" % (
+        annealing.i, annealing.stats['stop']))
+
+    return plan
 
+
+def load_pickle(path):
+    """ Load the trusted pickle files in data/.
     """
-    # init with boundary grids
-    with open('../data/grid_coords.pickle', 'rb') as handle:
-        grid_coords = pickle.load(handle)
+    with open(path, 'rb') as handle:
+        return pickle.load(handle)
+
+
+def walk():
+    """ Random walk from the initial state in data/ with plotting.
     """
+    # read in functional requirements from a pickle file.
+    fn_params = load_pickle('../data/function_params.pickle')
+    print("Functional requirements:")
+    pprint(fn_params)
 
     # read in initial state from a pickle file. 
-    with open('../data/initial_state.pickle', 'rb') as handle:
-        init_state = pickle.load(handle)
+    init_state = load_pickle('../data/initial_state.pickle')
     print("\nGiven initial plan state:")
     pprint(init_state)
 
     # init an architectural plan generator agent with initial state.
     plan = Plan(function_params=fn_params, grid_coords=None, 
-        init_state=init_state, silent=False
+        init_state=init_state, silent=False, plot=True
     )
     plan.random_walk(iters=20)
 
 
+def batch(manifest, out_dir='results', jsonl=None, n_workers=None):
+    """ Run the jobs of a manifest in a pool of workers and stream the 
+    results.
+    """
+    runner = BatchRunner(load_manifest(manifest), out_dir=out_dir, 
+        jsonl=jsonl, n_workers=n_workers)
+    for summary in runner.run().values():
+        print("%s: best objective %s (seed %s) -> %s" % (summary['job'],
+            summary['objective'], summary['best_seed'], summary['plan']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="architectural plan generator")
+    parser.add_argument('--log-level', default=None, 
+        help="DEBUG, INFO, WARNING or ERROR")
+    parser.add_argument('--log-rate', type=float, default=50.,
+        help="the messages per second allowed for each message")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('walk', help="random walk from the initial state")
+
+    for name, help in (('search', "search from a random state"),
+            ('resume', "resume a search from its checkpoint")):
+        command = commands.add_parser(name, help=help)
+        command.add_argument('--checkpoint', default=CHECKPOINT)
+
+    command = commands.add_parser('batch', help="run the jobs of a manifest")
+    command.add_argument('manifest')
+    command.add_argument('--out-dir', default='results',
+        help="the directory of plan files and results.jsonl")
+    command.add_argument('--jsonl', default=None,
+        help="stream the records to this file instead, '-' for stdout")
+    command.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    if args.log_level:
+        Log.configure(level=args.log_level.upper(), rate=args.log_rate)
+
+    if args.command == 'search':
+        search(load_pickle('../data/function_params.pickle'),
+            load_pickle('../data/grid_coords.pickle'), args.checkpoint)
+    elif args.command == 'resume':
+        resume(args.checkpoint)
+    elif args.command == 'batch':
+        batch(args.manifest, args.out_dir, args.jsonl, args.workers)
+    else:
+        walk()
+
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script implements the helpers shared by the tests of
+architectural_plan_generator. The test modules import them directly:
+
+    from conftest import make_plan, fuzz
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import numpy as np
+
+from Plan import Plan
+from Transition import Transition
+
+
+def make_plan(size=20, seed=0):
+    """ Make a plan on a size by size square plate with 4 functions of 2 
+    rooms each, initialized by given seed.
+    """
+    function_params = {'function_%d' % k:{'n_room':2, 'area':2, 
+        'pr_merge':.2} for k in range(4)}
+    np.random.seed(seed)
+
+    return Plan(function_params, silent=True,
+        grid_coords=[(x, y) for x in range(size) for y in range(size)])
+
+
+def fuzz(plan, n, seed=0):
+    """ Apply n random moves to plan and undo about half of them right away.
+    It yields the iteration and the transition after each move with the plan
+    parsed, so the caller can check the plan or change it further.
+    """
+    np.random.seed(seed)
+    transition = Transition(silent=True)
+    for i in range(n):
+        move = transition.propose(plan)
+        transition.apply(plan, move)
+        if np.random.rand() < .5: transition.undo(plan, move)
+        plan._parse()
+        plan._evaluate()
+        yield i, transition
@@ -0,0 +1,54 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests the boundary index of LabelGrid and the room adjacency 
+graph. Both are updated locally while grids change owner, so after random
+moves applied and undone they must equal the ones rebuilt from the labels.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import copy
+
+from Grid import LabelGrid, OUTSIDE
+from Adjacency import Adjacency
+from conftest import make_plan, fuzz
+
+
+# ---------------------------- helpers ---------------------------------------
+def check_boundary(plan):
+    ref = copy.deepcopy(plan.grids)
+    ref.reindex()
+    assert plan.grids.boundary == ref.boundary
+    assert (plan.grids._member == ref._member).all()
+
+
+def check_adjacency(plan):
+    strip = lambda edges: {k:v for k, v in edges.items() if v}
+    assert strip(plan.adjacency.edges) == strip(Adjacency(plan.grids).edges)
+
+
+# ---------------------------- tests -----------------------------------------
+def test_reindex_finds_boundary():
+    grids = LabelGrid([(x, y) for x in range(4) for y in range(3)])
+    grids.assign([(x, y) for x in range(4) for y in range(3)], 0)
+    grids.assign([(3, 0), (3, 1), (3, 2)], 1)
+    assert grids.boundary == {0:{(2, 0), (2, 1), (2, 2)},
+        1:{(3, 0), (3, 1), (3, 2)}}
+    assert grids.find_boundary_xys(1)[1] == [[(2, 0)], [(2, 1)], [(2, 2)]]
+
+    # the unassigned grids inside boundary still bound the room next to them
+    grids.assign([(3, 0), (3, 1), (3, 2)], OUTSIDE)
+    assert grids.boundary == {0:{(2, 0), (2, 1), (2, 2)}}
+
+
+def test_boundary_equals_reindex_after_moves():
+    plan = make_plan()
+    for _ in fuzz(plan, 200): check_boundary(plan)
+
+
+def test_adjacency_equals_rebuild_after_moves():
+    plan = make_plan(seed=1)
+    for _ in fuzz(plan, 200, seed=1): check_adjacency(plan)
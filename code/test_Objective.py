@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests the Objective class: the running totals equal the sums 
+over rooms, and the changes scored without applying moves equal the real
+changes of objective value after applying them.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import numpy as np
+import pytest
+
+from Objective import Objective
+from Room import calc_convex_aspect
+from Transition import Transition
+from conftest import make_plan, fuzz
+
+
+# ---------------------------- helpers ---------------------------------------
+def objective_from_scratch(plan):
+    """ The objective value of plan averaged over its rooms from their grids.
+    """
+    rooms   = plan._purge_room()
+    areas   = [len(room.xys) for room in rooms]
+    aspects = [calc_convex_aspect((min(xs) - .5, min(ys) - .5, max(xs) + .5,
+        max(ys) + .5)) for xs, ys in (zip(*room.xys) for room in rooms)]
+
+    return 2 * np.mean(areas) + 3 * np.mean(aspects) + 4
+
+
+# ---------------------------- tests -----------------------------------------
+def test_room_terms():
+    objective = Objective(total_area=100)
+    assert objective.room_terms(6, (0, 0, 2, 1), 'bedroom') == \
+        (1, 6, 1.5, 0)
+    assert objective.room_terms(6, (0, 0, 2, 1), 'hall_way')[3] == 6
+
+
+def test_totals_follow_updates():
+    objective = Objective(total_area=10)
+    objective.update(0, (1, 4, 1., 0))
+    objective.update(1, (1, 6, 2., 6))
+    objective.update(0, (1, 3, 1.5, 0))
+    objective.update(2, (1, 1, 1., 0))
+    objective.update(2, None)
+
+    assert list(objective.totals) == [2, 9, 3.5, 6]
+    assert objective.value == pytest.approx(2 * 4.5 + 3 * 1.75 + 4 * .4)
+    objective.resum()
+    assert list(objective.totals) == [2, 9, 3.5, 6]
+
+
+def test_objective_equals_scratch_after_moves():
+    plan = make_plan()
+    for _ in fuzz(plan, 100):
+        assert plan.objective == pytest.approx(objective_from_scratch(plan))
+
+
+@pytest.mark.parametrize('action', ['expand', 'swap', 'split', 'merge'])
+def test_score_change_equals_applied_change(action):
+    plan = make_plan(seed=1)
+    transition = Transition(silent=True)
+    np.random.seed(1)
+    n_scored = 0
+    for _ in range(50):
+        move = transition.propose(plan, action)
+        if move is None: continue
+        before = plan.objective
+        scored = transition.score(plan, move)
+
+        transition.apply(plan, move)
+        plan._parse()
+        plan._evaluate()
+        assert plan.objective - before == pytest.approx(scored, abs=1e-9)
+        n_scored += 1
+
+        # keep about half of moves so the plan keeps changing
+        if np.random.rand() < .5:
+            transition.undo(plan, move)
+            plan._parse()
+            plan._evaluate()
+            assert plan.objective == pytest.approx(before, abs=1e-9)
+    assert n_scored
+
+
+def test_score_delta_does_not_change_totals():
+    plan   = make_plan(seed=2)
+    fn     = plan.objective_fn
+    totals = fn.totals.copy()
+    rid    = plan._purge_room()[0].rid
+
+    delta = fn.score_delta({rid:None})
+    assert (fn.totals == totals).all()
+    fn.update(rid, None)
+    assert fn.value - plan.objective == pytest.approx(delta)
+
+
+def test_score_batch_equals_score_delta():
+    plan  = make_plan(seed=3)
+    fn    = plan.objective_fn
+    rooms = plan._purge_room()
+    new   = (1, 7, 1.25, 0)
+
+    changes = [{room.rid:new} for room in rooms] + [{room.rid:None} for room 
+        in rooms]
+    deltas  = [np.subtract(new, fn.terms[room.rid]) for room in rooms] + \
+        [-np.asarray(fn.terms[room.rid]) for room in rooms]
+    assert fn.score_batch(deltas) == pytest.approx(
+        [fn.score_delta(change) for change in changes])
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests the parallel searching classes MultiStart and 
+ParallelTempering on a small plate.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import pytest
+
+from Parallel import MultiStart, ParallelTempering
+from conftest import make_plan
+
+
+# ---------------------------- helpers ---------------------------------------
+def plan_inputs(size=10):
+    """ The function params and grid coordinates of a small plan.
+    """
+    plan = make_plan(size=size)
+
+    return plan.function_params, plan.grids.coords.tolist()
+
+
+# ---------------------------- tests -----------------------------------------
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_multi_start(n_workers):
+    function_params, grid_coords = plan_inputs()
+    multi = MultiStart(function_params, grid_coords, n_workers=n_workers,
+        pr_actions=[.25] * 4, max_iters=30)
+    results = multi.run(3)
+
+    assert sorted(r['seed'] for r in results) == [0, 1, 2]
+    objectives = [r['objective'] for r in results]
+    assert objectives == sorted(objectives, reverse=True)
+    assert multi.best_plan().objective == pytest.approx(objectives[0])
+
+
+def test_multi_start_is_reproducible():
+    function_params, grid_coords = plan_inputs()
+    runs = [MultiStart(function_params, grid_coords, n_workers=1,
+        max_iters=30).run([5]) for _ in range(2)]
+    assert runs[0][0]['objective'] == runs[1][0]['objective']
+    assert (runs[0][0]['state']['labels'] == \
+        runs[1][0]['state']['labels']).all()
+
+
+def test_parallel_tempering():
+    function_params, grid_coords = plan_inputs()
+    tempering = ParallelTempering(function_params, grid_coords,
+        temperatures=(.1, 1.), n_workers=2, pr_actions=[.25] * 4)
+    best = tempering.run(n_rounds=3, steps_per_round=20)
+
+    assert tempering.stats['rounds'] == 3
+    assert tempering.stats['iters'] == 3 * 2 * 20
+    assert 0 <= tempering.stats['exchange_rate'] <= 1
+    assert best >= max(tempering.objectives)
+    assert tempering.best_plan().objective == pytest.approx(best)
+
+
+@pytest.mark.parametrize('key, value', [('max_iters', 10), 
+    ('schedule', 'exponential')])
+def test_parallel_tempering_rejects_controlled_kwargs(key, value):
+    function_params, grid_coords = plan_inputs()
+    with pytest.raises(ValueError, match=key):
+        ParallelTempering(function_params, grid_coords, **{key:value})
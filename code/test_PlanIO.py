@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests the binary plan file format: the plan states and arrays
+saved are loaded back unchanged, and broken files are refused.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import os
+import numpy as np
+import pytest
+
+import PlanIO
+from Plan import Plan
+from Transition import Transition
+from conftest import make_plan
+
+
+# ---------------------------- helpers ---------------------------------------
+def make_merged_plan():
+    """ Make a small plan with a few merges applied, so some rids are 
+    deleted.
+    """
+    plan = make_plan()
+    transition = Transition(silent=True)
+    for _ in range(3):
+        transition.apply(plan, transition.propose(plan, 'merge'))
+        plan._parse()
+        plan._evaluate()
+
+    return plan
+
+
+# ---------------------------- tests -----------------------------------------
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_load_state_round_trip(tmp_path, mmap):
+    plan  = make_merged_plan()
+    state = plan.get_state()
+    path  = str(tmp_path / 'a.plan')
+    steps = np.arange(10, dtype=np.float64)
+    PlanIO.save_state(path, state, plan.function_params, plan.grids.coords,
+        extra={'seed':1}, arrays={'steps':steps})
+
+    loaded = PlanIO.load_state(path, mmap=mmap)
+    assert (loaded['state']['labels'] == state['labels']).all()
+    assert loaded['state']['labels'].dtype == state['labels'].dtype
+    assert loaded['state']['functions'] == state['functions']
+    assert None in loaded['state']['functions']
+    assert loaded['function_params'] == plan.function_params
+    assert (loaded['grid_coords'] == plan.grids.coords).all()
+    assert loaded['extra'] == {'seed':1}
+    assert (loaded['arrays']['steps'] == steps).all()
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_plan_save_load_round_trip(tmp_path):
+    plan = make_merged_plan()
+    path = str(tmp_path / 'a.plan')
+    plan.save(path)
+
+    loaded = Plan.load(path)
+    assert (loaded.grids.labels == plan.grids.labels).all()
+    assert loaded.room_count == plan.room_count
+    assert [room and room.function for room in loaded.rooms] == \
+        [room and room.function for room in plan.rooms]
+    assert loaded.objective == pytest.approx(plan.objective)
+
+    # the loaded plan is writable even if its file is memory-mapped
+    loaded.grids.assign([tuple(loaded.grids.coords[0])], 0)
+
+
+def test_load_state_refuses_broken_files(tmp_path):
+    plan = make_merged_plan()
+    path = str(tmp_path / 'a.plan')
+    plan.save(path)
+    with open(path, 'rb') as f: data = f.read()
+
+    with open(path, 'wb') as f: f.write(b'NOTAPLAN' + data[8:])
+    with pytest.raises(ValueError):
+        PlanIO.load_state(path)
+
+    magic, version, length = PlanIO.PREAMBLE.unpack(
+        data[:PlanIO.PREAMBLE.size])
+    with open(path, 'wb') as f:
+        f.write(PlanIO.PREAMBLE.pack(magic, PlanIO.VERSION + 1, length) + \
+            data[PlanIO.PREAMBLE.size:])
+    with pytest.raises(ValueError):
+        PlanIO.load_state(path)
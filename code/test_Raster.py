@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests grouping grids into connected components with Raster and
+Transition. The union-find grouping is checked against a flood fill and
+against the old row-bucket grouping on the shapes it handled.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+from collections import defaultdict
+from itertools import groupby
+import numpy as np
+
+import Raster
+from Transition import Transition
+
+
+# ---------------------------- references ------------------------------------
+def flood_fill_groups(xys):
+    """ Group given xys into 4-connected components by flood fill.
+    """
+    left, groups = set(xys), []
+    while left:
+        stack, group = [left.pop()], set()
+        while stack:
+            x, y = stack.pop()
+            group.add((x, y))
+            for xy in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if xy in left:
+                    left.remove(xy)
+                    stack.append(xy)
+        groups.append(frozenset(group))
+
+    return set(groups)
+
+
+def old_groups(xys):
+    """ The old row-bucket grouping of Transition. It's correct as long as
+    no group joins another one further up, like the 2 arms of a U.
+    """
+    rows = defaultdict(list)
+    for x, y in xys: rows[y].append((x, y))
+    for y, row in rows.items():
+        gb = groupby(enumerate(sorted(row)), lambda ixy: ixy[0] - ixy[1][0])
+        rows[y] = [[xy for _, xy in g] for _, g in gb]
+
+    ys = sorted(rows)
+    groups = list(rows[ys[0]])
+    for y in ys[1:]:
+        for component in rows[y]:
+            c_xs = {x for x, _ in component}
+            for group in groups:
+                if group[-1][1] == y - 1 and c_xs & {x for x, _ in group}:
+                    group += component
+                    break
+            else:
+                groups.append(component)
+
+    return {frozenset(group) for group in groups}
+
+
+def as_groups(xys, labels):
+    """ Convert the component labels of given xys into a set of groups.
+    """
+    groups = defaultdict(set)
+    for xy, label in zip(xys, labels): groups[label].add(xy)
+
+    return {frozenset(group) for group in groups.values()}
+
+
+def random_rectangles(rng, n=6, cell=6):
+    """ The xys of n random rectangles in separated cells of a grid.
+    """
+    xys = []
+    for k in rng.choice(25, size=n, replace=False):
+        x0, y0 = (k % 5) * cell, (k // 5) * cell
+        w, h   = rng.randint(1, cell, size=2)
+        xys += [(x0 + i, y0 + j) for i in range(w) for j in range(h)]
+
+    return xys
+
+
+# ---------------------------- tests -----------------------------------------
+def test_connected_components_match_flood_fill():
+    rng = np.random.RandomState(0)
+    for _ in range(50):
+        mask   = rng.rand(12, 12) < .55
+        xs, ys = np.nonzero(mask)
+        labels, n = Raster.connected_components(xs, ys)
+        xys = list(zip(xs.tolist(), ys.tolist()))
+        assert as_groups(xys, labels.tolist()) == flood_fill_groups(xys)
+        assert n == len(flood_fill_groups(xys))
+
+
+def test_connected_components_empty():
+    labels, n = Raster.connected_components(np.array([]), np.array([]))
+    assert n == 0 and len(labels) == 0
+
+
+def test_group_xys_by_adjacency_matches_old_grouping():
+    rng = np.random.RandomState(1)
+    transition = Transition(silent=True)
+    for _ in range(50):
+        xys    = random_rectangles(rng)
+        groups = transition._group_xys_by_adjacency(xys)
+        assert {frozenset(group) for group in groups} == old_groups(xys)
+
+
+def test_group_xys_by_adjacency_joins_u_shape():
+    # the 2 arms only join at the top row, which the old grouping split
+    xys = [(0, y) for y in range(4)] + [(2, y) for y in range(4)] + [(1, 3)]
+    groups = Transition(silent=True)._group_xys_by_adjacency(xys)
+    assert len(old_groups(xys)) == 2
+    assert len(groups) == 1 and sorted(groups[0]) == sorted(xys)
+    assert groups[0] == sorted(xys, key=lambda xy: (xy[1], xy[0]))
@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests the FrameRecorder observer: the frames are rendered in
+the background, and a failed renderer never blocks closing or the search
+closing it.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import os
+import threading
+import multiprocessing
+import pytest
+
+import Recorder
+from Recorder import FrameRecorder
+from Search import SimulatedAnnealing
+from conftest import make_plan
+
+
+# ---------------------------- helpers ---------------------------------------
+def fail_rendering(frames, *args):
+    raise RuntimeError("renderer failed")
+
+
+def close_in_time(recorder, timeout=10):
+    """ Close given recorder in a thread and return the exception raised, 
+    failing the test if closing does not return in time.
+    """
+    result = {}
+    def close():
+        try: recorder.close()
+        except Exception as error: result['error'] = error
+    closer = threading.Thread(target=close, daemon=True)
+    closer.start()
+    closer.join(timeout)
+    assert not closer.is_alive(), "close() did not return"
+
+    return result.get('error')
+
+
+# ---------------------------- tests -----------------------------------------
+def test_records_png_frames(tmp_path):
+    plan = make_plan(size=10)
+    recorder = FrameRecorder(plan, str(tmp_path), every=2)
+    for i in range(4): recorder.update(plan, i)
+    assert close_in_time(recorder) is None
+    assert recorder.stats == {'recorded':2, 'dropped':0}
+    assert sorted(os.listdir(str(tmp_path))) == \
+        ['frame_000000.png', 'frame_000002.png']
+
+
+@pytest.mark.parametrize('use_process', [False, pytest.param(True, 
+    marks=pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+    reason="the renderer process only inherits the patch when forked"))])
+def test_close_returns_when_renderer_fails(tmp_path, monkeypatch,
+        use_process):
+    monkeypatch.setattr(Recorder, '_render_frames', fail_rendering)
+    plan = make_plan(size=10)
+    recorder = FrameRecorder(plan, str(tmp_path), max_queue=4,
+        use_process=use_process)
+    for i in range(20): recorder.update(plan, i)
+
+    error = close_in_time(recorder)
+    assert isinstance(error, RuntimeError) and "renderer failed" in str(error)
+
+
+def test_search_raises_when_renderer_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(Recorder, '_render_frames', fail_rendering)
+    plan = make_plan(size=10)
+    plan.add_observer(FrameRecorder(plan, str(tmp_path), max_queue=4))
+    with pytest.raises(RuntimeError, match="renderer failed"):
+        SimulatedAnnealing(pr_actions=[.25] * 4, max_iters=200,
+            notify_every=1).run(plan)
+
+
+def test_mp4_without_ffmpeg_fails_fast(tmp_path, monkeypatch):
+    monkeypatch.setattr(Recorder.shutil, 'which', lambda name: None)
+    with pytest.raises(RuntimeError, match="ffmpeg"):
+        FrameRecorder(make_plan(size=10), str(tmp_path), fmt='mp4')
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        FrameRecorder(make_plan(size=10), '.', fmt='avi')
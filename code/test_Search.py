@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests the searching classes: simulated annealing, tabu search 
+and steepest descent run within their budgets, keep the best state found 
+and are reproducible by seed.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import numpy as np
+import pytest
+
+from Plan import Plan
+from Search import SimulatedAnnealing, TabuSearch, SteepestDescent
+from Transition import Transition
+from conftest import make_plan
+
+
+# ---------------------------- helpers ---------------------------------------
+def best_plan(plan, search):
+    """ Build a plan from the best state of given search.
+    """
+    return Plan(plan.function_params, grid_coords=plan.grids.coords,
+        state=search.best_state, silent=True)
+
+
+# ---------------------------- tests -----------------------------------------
+@pytest.mark.parametrize('make_search', [
+    lambda: SimulatedAnnealing(pr_actions=[.25] * 4, max_iters=300),
+    lambda: SimulatedAnnealing(schedule='linear', max_iters=300),
+    lambda: TabuSearch(tenure=5, max_iters=10),
+    lambda: SteepestDescent(max_iters=10),
+])
+def test_search_keeps_best_state(make_search):
+    plan   = make_plan()
+    start  = plan.objective
+    search = make_search()
+    best   = search.run(plan)
+
+    assert best == search.best_objective >= start
+    assert best >= plan.objective
+    assert best_plan(plan, search).objective == pytest.approx(best)
+    assert search.stats['iters'] <= search.max_iters
+    assert search.stats['accepted'] <= search.stats['iters']
+    assert search.stats['stop'] in ('max_iters', 'local_optimum')
+
+
+def test_simulated_annealing_is_reproducible():
+    results = []
+    for _ in range(2):
+        plan = make_plan(seed=1)
+        np.random.seed(1)
+        search = SimulatedAnnealing(max_iters=300)
+        search.run(plan)
+        results.append((search.best_objective, search.accepted, 
+            plan.grids.labels.tobytes()))
+    assert results[0] == results[1]
+
+
+def test_steepest_descent_only_improves():
+    plan = make_plan(seed=2)
+    objectives = [plan.objective]
+    search = SteepestDescent(max_iters=1)
+    for _ in range(10):
+        search.run(plan)
+        objectives.append(plan.objective)
+        if search.stats['stop'] == 'local_optimum': break
+    assert all(b >= a for a, b in zip(objectives, objectives[1:]))
+
+
+def test_tabu_search_commits_every_step():
+    plan   = make_plan(seed=3)
+    search = TabuSearch(tenure=5, max_iters=10)
+    search.run(plan)
+    assert search.stats['accepted'] == search.stats['iters'] == 10
+
+
+def test_threshold_stops_search():
+    plan   = make_plan(seed=4)
+    search = SimulatedAnnealing(max_iters=1000, threshold=plan.objective)
+    search.run(plan)
+    assert search.stats['stop'] == 'threshold'
+    assert search.stats['iters'] == 0
+
+
+def test_pr_actions_with_transition_are_refused():
+    with pytest.raises(ValueError):
+        SimulatedAnnealing(transition=Transition(silent=True),
+            pr_actions=[.25] * 4)
+
+
+@pytest.mark.parametrize('interrupt_at', [100, 250])
+def test_resume_continues_like_uninterrupted_run(tmp_path, interrupt_at):
+    # both runs write checkpoints every 50 iterations, so they sum the
+    # objective totals again at the same iterations
+    make_search = lambda max_iters, path: SimulatedAnnealing(
+        pr_actions=[.4, .2, .2, .2], max_iters=max_iters, checkpoint=path,
+        checkpoint_every=50)
+
+    plan = make_plan(seed=5)
+    full = make_search(400, str(tmp_path / 'full.plan'))
+    full.run(plan)
+
+    path = str(tmp_path / 'part.plan')
+    make_search(interrupt_at, path).run(make_plan(seed=5))
+    # a resumed search starts in a new process with another random state
+    np.random.seed(123)
+    resumed = make_search(400, path)
+    resumed_plan = resumed.resume(path)
+
+    assert (resumed_plan.grids.labels == plan.grids.labels).all()
+    assert resumed_plan.objective == plan.objective
+    assert resumed.best_objective == full.best_objective
+    assert (resumed.best_state['labels'] == full.best_state['labels']).all()
+    assert resumed.accepted == full.accepted
+    assert resumed.stats['iters'] == full.stats['iters'] == 400
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests the move API of Transition: proposing leaves the plan
+unchanged, and undoing applied moves restores the plan exactly.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import numpy as np
+import pytest
+
+from Transition import Transition, Move
+from conftest import make_plan, fuzz
+
+
+# ---------------------------- helpers ---------------------------------------
+def snapshot(plan):
+    """ The state and the running stats of plan that moves change.
+    """
+    return {
+        'labels':plan.grids.labels.tobytes(),
+        'room_count':plan.room_count,
+        'rooms':[None if room is None else (room.rid, room.function,
+            list(room.sums), room.grid_bounds, dict(room.stats)) \
+            for room in plan.rooms],
+        'boundary':{rid:set(xys) for rid, xys in plan.grids.boundary.items()},
+        'adjacency':{(a, b):n for a, ngbrs in plan.adjacency.edges.items() \
+            for b, n in ngbrs.items() if n},
+        'objective':round(plan.objective, 9),
+    }
+
+
+def parse(plan):
+    plan._parse()
+    plan._evaluate()
+
+
+# ---------------------------- tests -----------------------------------------
+@pytest.mark.parametrize('action', ['expand', 'swap', 'split', 'merge'])
+def test_propose_does_not_change_plan(action):
+    plan = make_plan()
+    transition = Transition(silent=True)
+    before = snapshot(plan)
+    for _ in range(20): transition.propose(plan, action)
+    assert snapshot(plan) == before
+
+
+@pytest.mark.parametrize('action', ['expand', 'swap', 'split', 'merge'])
+def test_undo_restores_plan(action):
+    plan = make_plan(seed=1)
+    transition = Transition(silent=True)
+    np.random.seed(1)
+    for _ in range(30):
+        before = snapshot(plan)
+        move   = transition.propose(plan, action)
+        transition.apply(plan, move)
+        parse(plan)
+        transition.undo(plan, move)
+        parse(plan)
+        assert snapshot(plan) == before
+
+        # keep some moves so the next ones start from other states
+        transition.apply(plan, transition.propose(plan, action))
+        parse(plan)
+
+
+def test_undo_stacked_moves_in_reverse_order():
+    plan = make_plan(seed=2)
+    for _ in fuzz(plan, 20, seed=2): pass
+    before = snapshot(plan)
+
+    transition, moves = Transition(silent=True), []
+    for _ in range(10):
+        moves.append(transition.propose(plan))
+        transition.apply(plan, moves[-1])
+        parse(plan)
+    for move in reversed(moves):
+        transition.undo(plan, move)
+    parse(plan)
+    assert snapshot(plan) == before
+
+
+def test_apply_refuses_stale_move():
+    plan = make_plan(seed=3)
+    transition = Transition(silent=True)
+    move = Move('split', plan.room_count + 1)
+    with pytest.raises(ValueError):
+        transition.apply(plan, move)
+
+    # a move of an action not applicable is None and changes nothing
+    before = snapshot(plan)
+    transition.apply(plan, None)
+    transition.undo(plan, None)
+    assert snapshot(plan) == before
@@ -0,0 +1,39 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script smoke tests the PlanPlotter observer with the Agg backend, so 
+no display is needed.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import pytest
+
+matplotlib = pytest.importorskip('matplotlib')
+pytest.importorskip('descartes')
+matplotlib.use('Agg')
+
+import Visual
+from Search import SimulatedAnnealing
+from conftest import make_plan
+
+
+def test_plan_plotter_plots_search():
+    plan    = make_plan(size=10)
+    plotter = Visual.PlanPlotter(plan, pause=0)
+    plan.add_observer(plotter)
+    SimulatedAnnealing(pr_actions=[.25] * 4, max_iters=50,
+        notify_every=5).run(plan)
+
+    # only the rooms of last plotting are left on the axes
+    axes = plotter.plot_fig.axes
+    assert len(axes.patches) == len(plan._purge_room())
+    assert len(axes.texts) == len(plan._purge_room())
+
+
+def test_plan_plotter_plots_random_walk():
+    plan = make_plan(size=10)
+    plan.add_observer(Visual.PlanPlotter(plan, pause=0))
+    plan.random_walk(5)
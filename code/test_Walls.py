@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+This script tests the walls traced by Walls. The walls traced again lazily
+and incrementally after random moves must equal the ones traced from the 
+whole label grid, and the openings must stay on their walls.
+
+Author: Xian Lai
+Date: Mar.01, 2018
+"""
+
+
+import numpy as np
+
+from Grid import LabelGrid
+from Plan import Plan
+from Transition import Transition
+from Wall import Wall
+from Walls import Walls
+from conftest import make_plan, fuzz
+
+
+# ---------------------------- helpers ---------------------------------------
+def wall_key(wall):
+    return (wall.rid, -1 if wall.ngbr is None else wall.ngbr, wall.ends)
+
+
+def check_walls(plan):
+    ref = Walls(plan.grids)
+    ref.rebuild()
+    walls = plan.walls.walls
+    assert sorted(map(wall_key, walls.values())) == \
+        sorted(map(wall_key, ref.walls.values()))
+    assert set(plan.walls.rooms) == {room.rid for room in plan._purge_room()}
+
+    for wall in walls.values():
+        same = wall.stats['same']
+        if wall.ngbr is None: assert same is None
+        else:
+            assert same.stats['same'] is wall and same.rid == wall.ngbr
+            assert same.ends == wall.ends and same.opening == wall.opening
+        assert plan.walls.rooms[wall.rid][wall.wid] is wall
+
+    for room in plan._purge_room():
+        assert room.walls == plan.walls.of(room.rid)
+
+
+def check_openings(plan):
+    walls = {(wall.rid, wall.ngbr, wall.ends):wall for wall in \
+        plan.walls.walls.values() if wall.opening[1]}
+    assert set(walls) == set(plan.walls.openings)
+    for key, wall in walls.items():
+        assert plan.walls.openings[key] == wall.opening
+
+
+def fuzz_openings(plan, n, seed=0):
+    """ Apply random moves like fuzz, change some openings and check the 
+    walls every few moves.
+    """
+    for i, transition in fuzz(plan, n, seed):
+        if np.random.rand() < .3: transition._change_wall(plan)
+        if np.random.rand() < .2: transition._move_door(plan)
+        if i % 5 == 0:
+            check_walls(plan)
+            check_openings(plan)
+
+
+# ---------------------------- tests -----------------------------------------
+def test_trace_merges_segments():
+    grids = LabelGrid([(x, y) for x in range(3) for y in range(2)])
+    grids.assign([(x, y) for x in range(3) for y in range(2)], 0)
+    grids.assign([(2, 0), (2, 1)], 1)
+    walls = Walls(grids)
+
+    keys = sorted(map(wall_key, walls.walls.values()))
+    assert keys == sorted([
+        (0, -1, ((-.5, -.5), (-.5, 1.5))), (0, -1, ((-.5, -.5), (1.5, -.5))),
+        (0, -1, ((-.5, 1.5), (1.5, 1.5))), (0, 1, ((1.5, -.5), (1.5, 1.5))),
+        (1, -1, ((1.5, -.5), (2.5, -.5))), (1, -1, ((1.5, 1.5), (2.5, 1.5))),
+        (1, -1, ((2.5, -.5), (2.5, 1.5))), (1, 0, ((1.5, -.5), (1.5, 1.5))),
+    ])
+
+
+def test_walls_equal_rebuild_after_moves():
+    plan = make_plan()
+    fuzz_openings(plan, 200)
+    check_walls(plan)
+    check_openings(plan)
+
+
+def test_walls_are_traced_when_asked_for():
+    plan = make_plan(seed=1)
+    plan.walls.sync()
+    transition = Transition(silent=True)
+    transition.apply(plan, transition.propose(plan, 'expand'))
+    plan._parse()
+    assert plan.walls.stale
+
+    check_walls(plan)
+    assert not plan.walls.stale
+
+
+def test_openings_survive_set_state_and_save(tmp_path):
+    plan = make_plan(seed=2)
+    fuzz_openings(plan, 50, seed=2)
+    wall = plan._purge_room()[0].walls[0]
+    plan.walls.set_opening(wall, [.5, Wall.TYPES['window'] if wall.ngbr is \
+        None else Wall.TYPES['door']])
+    openings = dict(plan.walls.openings)
+    assert openings
+
+    state = plan.get_state()
+    plan.set_state(state)
+    assert plan.walls.openings == openings
+    check_walls(plan)
+    check_openings(plan)
+
+    # a state without openings keeps the current ones
+    plan.set_state({'labels':state['labels'], 'functions':state['functions']})
+    assert plan.walls.openings == openings
+
+    path = str(tmp_path / 'a.plan')
+    plan.save(path)
+    loaded = Plan.load(path)
+    assert loaded.walls.openings == openings
+    check_openings(loaded)
+
+
+def test_openings_dropped_with_walls():
+    plan = make_plan(seed=3)
+    wall = [wall for wall in plan.walls.walls.values() if wall.ngbr][0]
+    plan.walls.set_opening(wall, [.5, Wall.TYPES['door']])
+    assert len(plan.walls.openings) == 2
+
+    # all interior walls are gone when the plan becomes 1 room
+    labels = plan.grids.labels.copy()
+    labels[plan.grids.inside] = 0
+    plan.set_state({'labels':labels, 'functions':[plan.rooms[0].function]})
+    check_openings(plan)
+    assert plan.walls.openings == {}